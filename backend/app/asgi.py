@@ -0,0 +1,215 @@
+import asyncio
+
+from dotenv import load_dotenv
+
+# Before the app imports: services read their settings (API keys included) from the environment at import
+load_dotenv()
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from app.services.media_analysis import analyze_media_async, analyze_ingested_media
+from app.services.turn_ingest import add_ingest_chunk, ingest_available, check_chunk_size, IngestLimitExceeded
+from app.services.inference_pool import start_inference_backend, inference_ready, inference_error
+from app.services.assembly_ai import WEBHOOK_AUTH_HEADER
+from app.services.transcription_jobs import start_transcription, handle_transcription_webhook
+from app.utils.turn_handler import parse_turn_request, get_reply_kwargs, needs_scoring, \
+    build_turn_response, prepare_data_for_json, format_sse, SPECULATIVE_SCORING, COMBINED_REPLY_SCORING
+from app.services.openai_client import update_rolling_info_and_get_reply_async, \
+    stream_rolling_info_and_get_reply_async, get_current_question_score_async, pop_combined_score
+
+# asyncio-native serving mode: uvicorn app.asgi:app (see run_asgi.bat).
+# Same routes and payloads as app.main, but a single worker can hold many
+# in-flight turns while they wait on OpenAI/AssemblyAI.
+app = FastAPI()
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+@app.on_event("startup")
+async def warm_up():
+    start_inference_backend()
+
+@app.get("/", response_class=PlainTextResponse)
+async def home():
+    return "Capstone API is running!"
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: only healthy once the DeepFace models are loaded and warmed up."""
+    if inference_ready():
+        return JSONResponse({"status": "ready"}, status_code=200)
+    error = inference_error()
+    if error:
+        return JSONResponse({"status": "failed", "error": error}, status_code=503)
+    return JSONResponse({"status": "warming up"}, status_code=503)
+
+@app.post("/transcription/start")
+async def transcription_start(request: Request):
+    """Async version of app.main.transcription_start."""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    video_url = (data or {}).get("video_url")
+    if not video_url:
+        return JSONResponse({"error": "Missing video url"}, status_code=400)
+    try:
+        # Download, audio extraction and submission all block; keep them off the event loop
+        job = await asyncio.to_thread(start_transcription, video_url)
+    except Exception as e:
+        print(f"[ERROR] Could not start transcription: {e}")
+        return JSONResponse({"error": "Could not start transcription"}, status_code=502)
+    return JSONResponse({"transcript_id": job.transcript_id}, status_code=202)
+
+@app.post("/transcription/webhook")
+async def transcription_webhook(request: Request):
+    """AssemblyAI completion callback (TRANSCRIPTION_WEBHOOK_URL points here)."""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    try:
+        handled = handle_transcription_webhook(data, request.headers.get(WEBHOOK_AUTH_HEADER))
+    except PermissionError:
+        return JSONResponse({"error": "Invalid webhook secret"}, status_code=401)
+    return JSONResponse({"handled": handled}, status_code=200)
+
+@app.post("/ingest/{ingest_id}")
+async def ingest_chunk(ingest_id: str, request: Request):
+    """Async version of app.main.ingest_chunk."""
+    if not ingest_available():
+        return JSONResponse({"error": "Chunked ingestion is not available"}, status_code=501)
+    try:
+        # Refuse oversized chunks before reading the body
+        check_chunk_size(int(request.headers.get("content-length") or 0))
+        data = await request.body()
+        await asyncio.to_thread(
+            add_ingest_chunk, ingest_id, int(request.query_params["seq"]), data,
+            float(request.query_params.get("t", 0)), request.query_params.get("final") == "1"
+        )
+    except IngestLimitExceeded as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status_code)
+    except (KeyError, ValueError) as e:
+        return JSONResponse({"error": f"Invalid chunk: {e}"}, status_code=400)
+    return JSONResponse({"status": "accepted"}, status_code=202)
+
+@app.post("/analyze_turn")
+async def analyze_turn(request: Request):
+    """Async version of app.main.analyze_turn. Same input and output payloads."""
+    data = await request.json()
+    turn = parse_turn_request(data)
+    video_file = turn["video_url"]
+
+    print("\n" + "="*80)
+    print(f"[DEBUG] PROCESSING CURRENT QS ID: {turn['current_qid']}")
+    print("="*80 + "\n")
+
+    if not video_file:
+        return JSONResponse({"error": "Missing video url"}, status_code=400)
+
+    assembly_data, deepface_data, deepface_timeline = await _analyze_turn_media(turn)
+    if not assembly_data.get("transcript"):
+        return JSONResponse({"error": "Missing transcript"}, status_code=400)
+
+    speculative_score = _start_speculative_score(turn, assembly_data)
+
+    # Step 3a: Update rolling summary and user answers
+    model_output = await update_rolling_info_and_get_reply_async(
+        **get_reply_kwargs(turn, assembly_data, deepface_data), usage=turn["usage"])
+
+    response_payload = await _score_and_build_response(
+        turn, assembly_data, deepface_data, deepface_timeline, model_output, speculative_score)
+    return JSONResponse(response_payload, status_code=200)
+
+@app.post("/analyze_turn/stream")
+async def analyze_turn_stream(request: Request):
+    """Async version of app.main.analyze_turn_stream. Same events."""
+    data = await request.json()
+    turn = parse_turn_request(data)
+    if not turn["video_url"]:
+        return JSONResponse({"error": "Missing video url"}, status_code=400)
+
+    assembly_data, deepface_data, deepface_timeline = await _analyze_turn_media(turn)
+    if not assembly_data.get("transcript"):
+        return JSONResponse({"error": "Missing transcript"}, status_code=400)
+
+    speculative_score = _start_speculative_score(turn, assembly_data)
+
+    async def _events():
+        model_output = None
+        async for kind, value in stream_rolling_info_and_get_reply_async(
+                **get_reply_kwargs(turn, assembly_data, deepface_data), usage=turn["usage"]):
+            if kind == "bot_reply":
+                yield format_sse("bot_reply", {"text": value})
+            else:
+                model_output = value
+
+        response_payload = await _score_and_build_response(
+            turn, assembly_data, deepface_data, deepface_timeline, model_output, speculative_score)
+        yield format_sse("turn_complete", response_payload)
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _analyze_turn_media(turn):
+    """Steps 1-2: audio and video analysis of the turn's clip, JSON-ready."""
+    # A turn ingested while recording is mostly analyzed already (its wait is thread-based);
+    # otherwise analyze audio and video concurrently, DeepFace in an executor
+    media_results = None
+    if turn["ingest_id"]:
+        media_results = await asyncio.to_thread(analyze_ingested_media, turn["ingest_id"])
+    assembly_data, deepface_data, deepface_timeline = media_results or await analyze_media_async(turn["video_url"])
+    return prepare_data_for_json(assembly_data), prepare_data_for_json(deepface_data), \
+        prepare_data_for_json(deepface_timeline)
+
+def _start_speculative_score(turn, assembly_data):
+    """Async version of app.main._start_speculative_score: returns a Task or None."""
+    if not SPECULATIVE_SCORING or COMBINED_REPLY_SCORING:
+        return None
+    return asyncio.ensure_future(get_current_question_score_async(
+        assembly_data.get("transcript"),
+        turn["rolling_summary"],
+        turn["current_question_text"],
+        turn["score_range"],
+        usage=turn["usage"]
+    ))
+
+async def _score_and_build_response(turn, assembly_data, deepface_data, deepface_timeline, model_output,
+                                    speculative_score=None):
+    """Steps 3b-7, once the step 3a reply is known. speculative_score is the Task of an early 3b call."""
+    # Step 3b: Get score for current question (already in the reply in combined mode)
+    combined_score = pop_combined_score(model_output)
+    score_output = {}
+    if needs_scoring(model_output):
+        if combined_score is not None:
+            score_output = combined_score
+        elif speculative_score is not None:
+            score_output = await speculative_score
+        else:
+            score_output = await get_current_question_score_async(
+                assembly_data.get("transcript"),
+                model_output.get("updated_summary") or "",
+                turn["current_question_text"],
+                turn["score_range"],
+                usage=turn["usage"]
+            )
+    else:
+        if speculative_score is not None:
+            # Cancels the in-flight request
+            speculative_score.cancel()
+            print(f"[DEBUG] Discarding speculative score")
+        print(f"[DEBUG] Skipping scoring because needs_followup or contradiction is TRUE")
+
+    # Steps 4-7: scores, tracker, guardrails and Firestore payload
+    response_payload = build_turn_response(
+        turn, assembly_data, deepface_data, model_output, score_output,
+        deepface_timeline=deepface_timeline)
+
+    print("\n" + "."*80)
+    print("[DEBUG] RETURNING FINAL PAYLOAD:")
+    print(response_payload)
+    print("."*80 + "\n")
+    return response_payload
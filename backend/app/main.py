@@ -1,49 +1,103 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from dotenv import load_dotenv
-import numpy as np
-import re
 
-from app.services.assembly_ai import analyze_audio
-from app.services.deepface_service import analyze_video
-from app.utils.safety_check import check_trigger_words
-from app.utils.load_symptom_overlap_mapping import SYMPTOM_OVERLAP_DF
-from app.utils.questionnaire_handler import \
-    get_question_data, \
-    get_questionnaire_score_range, append_question_to_unanswered_list, \
-    mark_question_answered, get_overlapping_updates, \
-    update_question_tracker, deduplicate_user_answers
-from app.services.openai_client import update_rolling_info_and_get_reply, get_current_question_score
-from app.utils.response_guardrails import get_natural_question
+# Before the app imports: services read their settings (API keys included) from the environment at import
+load_dotenv()
+
+from app.services.media_analysis import analyze_media, analyze_ingested_media
+from app.services.turn_ingest import add_ingest_chunk, ingest_available, check_chunk_size, IngestLimitExceeded
+from app.services.inference_pool import start_inference_backend, inference_ready, inference_error
+from app.services.assembly_ai import WEBHOOK_AUTH_HEADER
+from app.services.transcription_jobs import start_transcription, handle_transcription_webhook
+from app.utils.turn_handler import parse_turn_request, get_reply_kwargs, needs_scoring, \
+    build_turn_response, prepare_data_for_json, format_sse, SPECULATIVE_SCORING, COMBINED_REPLY_SCORING
+from app.services.openai_client import update_rolling_info_and_get_reply, stream_rolling_info_and_get_reply, \
+    get_current_question_score, submit_question_score, pop_combined_score
 from flask_cors import CORS
 
-load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
-def prepare_data_for_json(data):
-    """Recursively converts NumPy/custom numeric types to standard Python types."""
-    if isinstance(data, dict):
-        return {k: prepare_data_for_json(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [prepare_data_for_json(v) for v in data]
-    elif isinstance(data, np.floating):
-        return float(data)
-    elif isinstance(data, np.integer):
-        return int(data)
-    elif isinstance(data, np.ndarray):
-        return data.tolist()
-    return data
+def create_app():
+    """
+    App factory: starts the DeepFace backend, then returns the app
+    (flask --app "app.main:create_app()" run, see run.bat).
+    Starting it at import would also run in every spawned inference worker,
+    which re-imports this module while bootstrapping and breaks the pool.
+    """
+    start_inference_backend()
+    return app
 
 @app.route("/")
 def home():
     return "Capstone API is running!"
 
+@app.route("/ready")
+def ready():
+    """Readiness probe: only healthy once the DeepFace models are loaded and warmed up."""
+    if inference_ready():
+        return jsonify({"status": "ready"}), 200
+    error = inference_error()
+    if error:
+        return jsonify({"status": "failed", "error": error}), 503
+    return jsonify({"status": "warming up"}), 503
+
+@app.route("/transcription/start", methods=["POST"])
+def transcription_start():
+    """
+    Starts transcribing a clip as soon as it is uploaded, so /analyze_turn only has to await it.
+    @input { "video_url": <uploaded clip url> }
+    @return 202 { "transcript_id": <AssemblyAI transcript id> }
+    """
+    video_url = (request.get_json(silent=True) or {}).get("video_url")
+    if not video_url:
+        return jsonify({"error": "Missing video url"}), 400
+    try:
+        job = start_transcription(video_url)
+    except Exception as e:
+        print(f"[ERROR] Could not start transcription: {e}")
+        return jsonify({"error": "Could not start transcription"}), 502
+    return jsonify({"transcript_id": job.transcript_id}), 202
+
+@app.route("/transcription/webhook", methods=["POST"])
+def transcription_webhook():
+    """AssemblyAI completion callback (TRANSCRIPTION_WEBHOOK_URL points here)."""
+    try:
+        handled = handle_transcription_webhook(request.get_json(silent=True), request.headers.get(WEBHOOK_AUTH_HEADER))
+    except PermissionError:
+        return jsonify({"error": "Invalid webhook secret"}), 401
+    return jsonify({"handled": handled}), 200
+
+@app.route("/ingest/<ingest_id>", methods=["POST"])
+def ingest_chunk(ingest_id):
+    """
+    Receives one chunk of a turn while the user is still recording, so analysis
+    can start before the clip is finished. /analyze_turn then passes the same ingest_id.
+    @input raw chunk bytes; query args seq=<0-based chunk number>,
+        t=<seconds recorded so far>, final=1 on the last request (body may be empty)
+    """
+    if not ingest_available():
+        return jsonify({"error": "Chunked ingestion is not available"}), 501
+    try:
+        # Refuse oversized chunks before reading the body
+        check_chunk_size(request.content_length)
+        add_ingest_chunk(
+            ingest_id, int(request.args["seq"]), request.get_data(),
+            float(request.args.get("t", 0)), request.args.get("final") == "1"
+        )
+    except IngestLimitExceeded as e:
+        return jsonify({"error": str(e)}), e.status_code
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid chunk: {e}"}), 400
+    return jsonify({"status": "accepted"}), 202
+
 @app.route("/analyze_turn", methods=["POST"])
 def analyze_turn():
     """
     @input JSON payload from Firestore.
         {
             "video_file": <video file>,
+            "session_id": <Firestore session id, for the per-session token usage>,
             "session_status": <active/resumed>,
             "user_answers": < [ {Q_ID: user answer} ] >,
             "rolling summary": <summary of user answers for context>,
@@ -59,7 +113,11 @@ def analyze_turn():
                 "conversation_type": <diagnostic/free talk/crisis>,
                 "crisis_detected": <true/false>,
                 "audio_video_alignment": <aligned/mismatched>,
-                "confidence_level": <low/medium/high>
+                "confidence_level": <low/medium/high>,
+                "token_usage": {
+                    "turn": { "stages": { "3a"/"3b": <calls, tokens, seconds, cost_usd> }, "total": {...} },
+                    "session": <same plus "turns", totals of this server process; null without session_id>
+                }
             },
             "user_answers": < [ {Q_ID: user answer} ] >,
             "rolling_summary": <summary of user answers for context>,
@@ -76,240 +134,131 @@ def analyze_turn():
 
     # TODO: (nice to have) add a JSON Scehma to make sure we always return the above formatted JSON payload
     data = request.get_json()
-    video_file = data.get("video_url", "")
-    rolling_summary = data.get("rolling_summary") or ""
-    user_answers = data.get("user_answers") or []
-    existing_scores = data.get("diagnostic_scores") or {}
-    session_status = data.get("session_status", "active")
-    last_bot_reply = data.get("last_bot_reply", None)
-    previously_in_crisis = data.get('crisis_detected', False)
-
-    # Retrieval of session-specific state from payload
-    incoming_tracker = data.get("question_tracker") or {}
-    incoming_unanswered = data.get("unanswered_question_ids") or []
+    turn = parse_turn_request(data)
+    video_file = turn["video_url"]
 
     print("\n" + "="*80)
-    print(f"[DEBUG] PROCESSING CURRENT QS ID: {incoming_tracker.get('current_qs_id')}")
+    print(f"[DEBUG] PROCESSING CURRENT QS ID: {turn['current_qid']}")
     print("="*80 + "\n")
 
     if not video_file:
         return jsonify({"error": "Missing video url"}), 400
 
-    # Analyze audio and video
-    assembly_data = prepare_data_for_json(analyze_audio(video_file))
-    deepface_data = prepare_data_for_json(analyze_video(video_file))
-
-    transcript = assembly_data.get("transcript")
-    if not transcript:
+    assembly_data, deepface_data, deepface_timeline = _analyze_turn_media(turn)
+    if not assembly_data.get("transcript"):
         return jsonify({"error": "Missing transcript"}), 400
 
-    # Step 2: Get current and next questions
-    current_qid = incoming_tracker.get("current_qs_id")
-    next_qid = incoming_tracker.get("next_qs_id")
-    current_question_text = get_question_data(current_qid)
-    next_question_text = get_question_data(incoming_tracker.get("next_qs_id"))
-
-    crisis_detected = previously_in_crisis
+    speculative_score = _start_speculative_score(turn, assembly_data)
 
     # Step 3a: Update rolling summary and user answers
     model_output = update_rolling_info_and_get_reply(
-        assembly_data, deepface_data, rolling_summary,
-        user_answers, current_qid, get_questionnaire_score_range(current_qid),
-        current_question_text, next_question_text, 
-        previous_bot_reply=last_bot_reply,
-        session_status=session_status)
-
-    updated_summary = model_output.get("updated_summary") or ""
-    updated_answers = model_output.get("updated_user_answers") or []
-    
-    rolling_summary = updated_summary
-    user_answers = deduplicate_user_answers(user_answers, updated_answers)
+        **get_reply_kwargs(turn, assembly_data, deepface_data), usage=turn["usage"])
 
-    bot_reply = model_output.get("bot_reply", "")
+    response_payload = _score_and_build_response(
+        turn, assembly_data, deepface_data, deepface_timeline, model_output, speculative_score)
+    return jsonify(response_payload), 200
 
-    is_emergency = model_output.get("is_emergency") or False
-    trigger_word = model_output.get("trigger_word") or ""
-    if not previously_in_crisis and is_emergency:
-        bot_reply = "It sounds like you might be in distress. Please reach out to immediate help:\n\nNational Suicide Prevention Lifeline: 988 (US)\nCrisis Text Line: Text HOME to 741741\n\nYou're not alone."
-        crisis_detected = True
+@app.route("/analyze_turn/stream", methods=["POST"])
+def analyze_turn_stream():
+    """
+    Same input as /analyze_turn, answered as Server-Sent Events so the reply can be
+    shown while gpt-4o is still writing it:
+        event: bot_reply      data: {"text": <next piece of the reply>}   (repeated)
+        event: turn_complete  data: <the /analyze_turn JSON payload>
+    The final payload's "text" is authoritative (guardrails may replace the streamed reply).
+    A turn the model flags as an emergency sends no bot_reply events, only the final payload.
+    Request errors are returned as plain JSON with a 400 status before any event is sent.
+    """
+    data = request.get_json()
+    turn = parse_turn_request(data)
+    if not turn["video_url"]:
+        return jsonify({"error": "Missing video url"}), 400
 
-    contradictions = model_output.get("contradictions") or {}
-    is_contradictory = contradictions.get("contradictory") or False
-    contradicting_ids = contradictions.get("contradicting_question_ids") or []
+    assembly_data, deepface_data, deepface_timeline = _analyze_turn_media(turn)
+    if not assembly_data.get("transcript"):
+        return jsonify({"error": "Missing transcript"}), 400
 
-    # Step 3b: Get score for current question
-    needs_followup = model_output.get("needs_followup", False)
-    is_answered = False
-    current_score = 0
+    speculative_score = _start_speculative_score(turn, assembly_data)
+
+    def _events():
+        model_output = None
+        for kind, value in stream_rolling_info_and_get_reply(
+                **get_reply_kwargs(turn, assembly_data, deepface_data), usage=turn["usage"]):
+            if kind == "bot_reply":
+                yield format_sse("bot_reply", {"text": value})
+            else:
+                model_output = value
+
+        response_payload = _score_and_build_response(
+            turn, assembly_data, deepface_data, deepface_timeline, model_output, speculative_score)
+        yield format_sse("turn_complete", response_payload)
+
+    return Response(
+        stream_with_context(_events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _analyze_turn_media(turn):
+    """Steps 1-2: audio and video analysis of the turn's clip, JSON-ready."""
+    # A turn ingested while recording is mostly analyzed already; otherwise analyze the
+    # uploaded clip (audio and video concurrently unless MEDIA_ANALYSIS_MODE=sequential)
+    media_results = analyze_ingested_media(turn["ingest_id"]) or analyze_media(turn["video_url"])
+    assembly_data, deepface_data, deepface_timeline = media_results
+    return prepare_data_for_json(assembly_data), prepare_data_for_json(deepface_data), \
+        prepare_data_for_json(deepface_timeline)
+
+def _start_speculative_score(turn, assembly_data):
+    """
+    With SPECULATIVE_SCORING=1, starts step 3b right away instead of after 3a.
+    It can't see 3a's updated summary, so it is scored against the incoming one.
+    """
+    if not SPECULATIVE_SCORING or COMBINED_REPLY_SCORING:
+        return None
+    return submit_question_score(
+        assembly_data.get("transcript"),
+        turn["rolling_summary"],
+        turn["current_question_text"],
+        turn["score_range"],
+        usage=turn["usage"]
+    )
+
+def _score_and_build_response(turn, assembly_data, deepface_data, deepface_timeline, model_output,
+                              speculative_score=None):
+    """Steps 3b-7, once the step 3a reply is known. speculative_score is the Future of an early 3b call."""
+    # Step 3b: Get score for current question (already in the reply in combined mode)
+    combined_score = pop_combined_score(model_output)
     score_output = {}
-    if not needs_followup and not is_contradictory:
-        score_output = get_current_question_score(
-            transcript, 
-            updated_summary,
-            current_question_text, 
-            get_questionnaire_score_range(current_qid)
-        )
-        is_answered = score_output.get("is_question_answered", False)
-        current_score = score_output.get("score", 0)
-    else:
-        print(f"[DEBUG] Skipping scoring because needs_followup or contradiction is TRUE")
-
-    # Step 4: update scores
-    score_updates_for_firestore = {}
-    current_unanswered = list(incoming_unanswered)
-    current_tracker = dict(incoming_tracker)
-
-    # RULE 1: Progress only if answered, NO follow-up needed, AND NO contradictions detected.
-    if is_answered and not needs_followup and not is_contradictory:
-        current_unanswered = mark_question_answered(current_qid, current_unanswered)
-        score_updates_for_firestore[current_qid] = current_score
-    
-        # Handle overlaps
-        overlaps, current_unanswered = get_overlapping_updates(current_qid, current_score, current_unanswered)
-        if isinstance(overlaps, dict):
-            score_updates_for_firestore.update(overlaps)       
-        current_tracker = update_question_tracker(current_unanswered)
-        print(f"[DEBUG] Question {current_qid} marked as answered. Moving to next.")
-    else:
-        # RULE 2: If unanswered, contradictory, or needs follow-up, stay on current question.
-        print(f"[DEBUG] STAYING ON QUESTION {current_qid} FOR FOLLOW-UP/CONTRADICTION")
-
-    # RULE 3: Handle contradictory question IDs
-    for q_id in contradicting_ids:
-        # If it's the current question, we've already handled staying on it via RULE 2.
-        # If it's a DIFFERENT question that was contradicted, move it to the unanswered queue.
-        if q_id != current_qid:
-            current_unanswered = append_question_to_unanswered_list(q_id, current_unanswered)
-            print(f"[DEBUG] Question {q_id} was contradicted. Moving back to unanswered queue.")
-            
-            # Reset existing score in Firestore for the contradicted question
-            prev_val = existing_scores.get(q_id, 0)
-            if prev_val != 0:
-                score_updates_for_firestore[q_id] = -prev_val
-
-    # Final Check: Are we out of questions?
-    current_qid = current_tracker.get("current_qs_id")
-    if not current_qid and session_status != "resumed" and (len(incoming_unanswered)-1) <= 0:
-        final_session_status = "ended-complete"
-        sufficient_data = True
-        end_rsp = "We've covered all the specific areas I wanted to check on today. Thank you for being so open with me. You can now view your session summary."
-        if is_emergency:
-            bot_reply = end_rsp + "It sounds like you might be in distress. Please reach out to immediate help:\n\nNational Suicide Prevention Lifeline: 988 (US)\nCrisis Text Line: Text HOME to 741741\n\nYou're not alone.\n\n"
+    if needs_scoring(model_output):
+        if combined_score is not None:
+            score_output = combined_score
+        elif speculative_score is not None:
+            score_output = speculative_score.result()
         else:
-            bot_reply = end_rsp
-    else:
-        final_session_status = session_status
-        sufficient_data = data.get("sufficientDataCollected", False)
-
-    # Step 5: Mode indicator
-    mode_indicator = "free talk" if session_status == "resumed" else "diagnostic"
-
-    #TODO: Need to use openAI to check this, the hard-coded trauma keywords are missing a lot of loopholes and it's dangerous.
-    # Step 7: Format response for Firestore
-    # Trauma detection logic
-    transcript_lower = transcript.lower()
-    trauma_keywords = [
-        'died', 'death', 'passed away', 'funeral', 'lost my', 'lost a', 'killed', 'kill myself'
-        'abuse', 'abused', 'assault', 'assaulted', 'rape', 'raped', 'molest',
-        'accident', 'crash', 'injured', 'hurt badly', 'hospitalized',
-        'attacked', 'violence', 'witnessed', 'saw someone die', 'saw someone get',
-        'war', 'combat', 'deployed', 'shot at', 'explosion',
-        'disaster', 'hurricane', 'earthquake', 'fire', 'flood', 'tornado',
-        'trauma', 'traumatic', 'ptsd', 'traumatized',
-        'overdose', 'suicide attempt', 'tried to kill', 'attempted suicide'
-    ]
-    
-    trauma_mentioned = any(keyword in transcript_lower for keyword in trauma_keywords)
-    has_pcl5_scores = any('PCL5' in key for key in score_updates_for_firestore.keys())
-    trauma_detected = trauma_mentioned or has_pcl5_scores
-
-    # Sentiment and Alignment
-    audio_sentiment = assembly_data.get("sentiment", "NEUTRAL").lower()
-    audio_confidence = assembly_data.get("sentiment_confidence", 0)
-    emotions = deepface_data if isinstance(deepface_data, dict) else {}
-    dominant_emotion = max(emotions.items(), key=lambda x: x[1])[0] if emotions else "neutral"
-    
-    negative_emotions = {"sad", "angry", "fear", "disgust"}
-    positive_emotions = {"happy", "surprise"}
-    
-    if audio_confidence < 0.6:
-        alignment = "mismatched"
-    elif (audio_sentiment == "negative" and dominant_emotion in negative_emotions) or \
-         (audio_sentiment == "positive" and dominant_emotion in positive_emotions):
-        alignment = "aligned"
+            score_output = get_current_question_score(
+                assembly_data.get("transcript"),
+                model_output.get("updated_summary") or "",
+                turn["current_question_text"],
+                turn["score_range"],
+                usage=turn["usage"]
+            )
     else:
-        alignment = "neutral" if audio_sentiment == "neutral" else "mismatched"
-    
-    confidence_level = "high" if audio_confidence >= 0.8 else "medium" if audio_confidence >= 0.6 else "low"
-
-    # GUARDRAIL AGAINST BOT HALLUCINATION REPLIES
-    # When to force the next question
-    # If needs_followup is False and it's not the end of the session, we MUST have a question.
-    if not needs_followup and not is_contradictory and not is_emergency and final_session_status != "ended-complete":
-        bot_reply_lower = bot_reply.lower()
-        # 1.Get the core symptom text and split into words longer than 3 chars
-        raw_symptom_text = next_question_text.split(":")[-1].strip().lower()
-        keywords = [word for word in re.sub(r'[^\w\s]', '', raw_symptom_text).split() if len(word) > 3]
-        
-        # 2. Check how many keywords matched (Need at least 2 for a 'Positive Match')
-        match_count = sum(1 for word in keywords if word in bot_reply_lower)
-        
-        # 3. Identify stalling phrases
-        stalling_phrases = ["explore this further", "clear picture", "ensure we have", "understand better"]
-        has_stalling_phrase = any(p in bot_reply_lower for p in stalling_phrases)
-
-        # 4. Only override if:
-        # -The bot didn't mention the core topic (low match_count)
-        # -OR it used a known stalling phrase
-        # -OR it didn't end with a question mark
-        ends_with_question = bot_reply.strip().endswith("?")
-        if (match_count < 2 and len(keywords) >= 2) or has_stalling_phrase or not ends_with_question:
-            print(f"[GUARDRAIL] Intervention needed. Keywords found: {match_count}/{len(keywords)}")
-
-            perfect_question = get_natural_question(next_qid, next_question_text)
-            if next_qid == None:
-                final_session_status = "ended-complete"
-                sufficient_data = True
-            sentences = re.split(r'(?<=[.!?]) +', bot_reply)
-            empathy_part = sentences[0] if sentences else "I understand."
-            bot_reply = f"{empathy_part} {perfect_question}"
-        else:
-            print(f"[GUARDRAIL] Pass. AI correctly transitioned.")
-
-    if is_contradictory:
-        # If the bot tried to move on during a contradiction, force it back
-        if next_question_text.lower() in bot_reply_lower:
-            print(f"[GUARDRAIL] Bot tried to move on during contradiction. Forcing resolution.")
-            bot_reply = f"I want to make sure I'm following you correctly. {model_output.get('contradictions', {}).get('reason', 'Earlier we discussed something different.')} Which of these feels more accurate for you lately?"
+        if speculative_score is not None:
+            # Too late to stop the request if it already started; its result is just ignored
+            speculative_score.cancel()
+            print(f"[DEBUG] Discarding speculative score")
+        print(f"[DEBUG] Skipping scoring because needs_followup or contradiction is TRUE")
 
-    response_payload = {
-        "text": bot_reply,
-        "diagnostic_scores": score_updates_for_firestore,
-        "metadata": {
-            "conversation_type": mode_indicator,
-            "crisis_detected": crisis_detected,
-            "audio_video_alignment": alignment,
-            "confidence_level": confidence_level
-        },
-        "user_answers": user_answers,
-        "rolling_summary": rolling_summary,
-        "assemblyAI_output": assembly_data,
-        "deepface_output": deepface_data,
-        "diagnostic_match": len(score_updates_for_firestore) > 0,
-        "emergency": True if (is_emergency and not previously_in_crisis) else False,
-        "trauma_detected": trauma_detected,
-        "session_status": final_session_status,
-        "sufficientDataCollected": sufficient_data,
-        "question_tracker": current_tracker,
-        "unanswered_question_ids": current_unanswered
-    }
+    # Steps 4-7: scores, tracker, guardrails and Firestore payload
+    response_payload = build_turn_response(
+        turn, assembly_data, deepface_data, model_output, score_output,
+        deepface_timeline=deepface_timeline)
 
     print("\n" + "."*80)
     print("[DEBUG] RETURNING FINAL PAYLOAD:")
     print(response_payload)
     print("."*80 + "\n")
-
-    return jsonify(response_payload), 200
+    return response_payload
 
 if __name__ == "__main__":
-    app.run(debug=True, port=8000)
+    create_app().run(debug=True, port=8000)
@@ -1,53 +1,196 @@
 import os
+import time
+import asyncio
+import httpx
 import assemblyai as aai
 
 # Set API key
 aai.settings.api_key = os.getenv("ASSEMBLYAI_API_KEY")
 
+# REST settings for the async path (the SDK only offers thread-based async)
+ASSEMBLYAI_BASE_URL = os.getenv("ASSEMBLYAI_BASE_URL", "https://api.assemblyai.com")
+ASSEMBLYAI_POLL_INTERVAL = float(os.getenv("ASSEMBLYAI_POLL_INTERVAL", "1.0"))
+# Header AssemblyAI sends back with webhook calls when a webhook secret is set
+WEBHOOK_AUTH_HEADER = "X-Webhook-Secret"
+
+class _ApiKeyAuth(httpx.Auth):
+    """Sets the API key on every request, so a key loaded after this module was imported still applies."""
+
+    def auth_flow(self, request):
+        request.headers["authorization"] = os.getenv("ASSEMBLYAI_API_KEY") or ""
+        yield request
+
+_async_http = httpx.AsyncClient(
+    base_url=ASSEMBLYAI_BASE_URL,
+    auth=_ApiKeyAuth(),
+    timeout=httpx.Timeout(60.0, connect=10.0)
+)
+# Blocking client for the transcription job endpoints (transcription_jobs.py)
+_http = httpx.Client(
+    base_url=ASSEMBLYAI_BASE_URL,
+    auth=_ApiKeyAuth(),
+    timeout=httpx.Timeout(60.0, connect=10.0)
+)
+
+EMPTY_AUDIO_RESULT = {
+    "transcript": "",
+    "sentiment": "NEUTRAL",
+    "sentiment_confidence": 0.0,
+    "sentiment_analysis": []
+}
+
+def _build_audio_result(text, sentiment_list):
+    """Picks the most confident sentiment segment as the overall sentiment."""
+    if sentiment_list:
+        overall_sentiment = max(sentiment_list, key=lambda x: x["confidence"])
+        sentiment = overall_sentiment["sentiment"]
+        sentiment_confidence = overall_sentiment["confidence"]
+    else:
+        sentiment = "NEUTRAL"
+        sentiment_confidence = 0.0
+
+    return {
+        "transcript": text or "",
+        "sentiment": sentiment,
+        "sentiment_confidence": sentiment_confidence,
+        "sentiment_analysis": sentiment_list
+    }
+
+def merge_audio_results(results):
+    """Joins the analyze_audio results of consecutive segments of one clip, in order."""
+    text = " ".join(result["transcript"] for result in results if result.get("transcript"))
+    sentiment_list = [sentiment for result in results for sentiment in (result.get("sentiment_analysis") or [])]
+    return _build_audio_result(text, sentiment_list)
+
+def _transcript_request(audio_url, webhook_url=None, webhook_secret=None):
+    body = {"audio_url": audio_url, "sentiment_analysis": True}
+    if webhook_url:
+        body["webhook_url"] = webhook_url
+        if webhook_secret:
+            body["webhook_auth_header_name"] = WEBHOOK_AUTH_HEADER
+            body["webhook_auth_header_value"] = webhook_secret
+    return body
+
+def audio_result_from_transcript(result):
+    """
+    Builds the analyze_audio result from a REST transcript object (GET /v2/transcript/<id>).
+    Raises if the transcription failed.
+    """
+    if result["status"] == "error":
+        raise Exception(f"Transcription failed: {result.get('error')}")
+
+    sentiment_list = [
+        {
+            "text": sentiment_result["text"],
+            "sentiment": sentiment_result["sentiment"],
+            "confidence": sentiment_result["confidence"]
+        }
+        for sentiment_result in (result.get("sentiment_analysis_results") or [])
+    ]
+    return _build_audio_result(result.get("text"), sentiment_list)
+
+def upload_file(path):
+    """Uploads a local file to AssemblyAI and returns the private upload_url."""
+    response = _http.post("/v2/upload", content=_read_file(path))
+    response.raise_for_status()
+    return response.json()["upload_url"]
+
+def submit_transcript(audio_url, webhook_url=None, webhook_secret=None):
+    """Queues a transcription without waiting for it. Returns the transcript id."""
+    response = _http.post("/v2/transcript", json=_transcript_request(audio_url, webhook_url, webhook_secret))
+    response.raise_for_status()
+    return response.json()["id"]
+
+def get_transcript(transcript_id):
+    """Returns the REST transcript object, whatever its status."""
+    response = _http.get(f"/v2/transcript/{transcript_id}")
+    response.raise_for_status()
+    return response.json()
+
+def poll_transcript(transcript_id):
+    """Blocks until the transcript is completed or failed and returns the analyze_audio result."""
+    while True:
+        result = get_transcript(transcript_id)
+        if result["status"] in ("completed", "error"):
+            return audio_result_from_transcript(result)
+        time.sleep(ASSEMBLYAI_POLL_INTERVAL)
+
+async def poll_transcript_async(transcript_id):
+    """Async counterpart of poll_transcript, yielding to other requests between polls."""
+    while True:
+        response = await _async_http.get(f"/v2/transcript/{transcript_id}")
+        response.raise_for_status()
+        result = response.json()
+        if result["status"] in ("completed", "error"):
+            return audio_result_from_transcript(result)
+        await asyncio.sleep(ASSEMBLYAI_POLL_INTERVAL)
+
+def transcribe_audio(video_url):
+    """
+    Transcribes a clip with sentiment analysis and returns the analyze_audio result.
+    Unlike analyze_audio, failures are raised so the caller can fall back to something else.
+    """
+    config = aai.TranscriptionConfig(
+        sentiment_analysis=True
+    )
+    
+    transcriber = aai.Transcriber(config=config)
+    assembly_result = transcriber.transcribe(video_url)
+    
+    # Wait for completion
+    if assembly_result.status == aai.TranscriptStatus.error:
+        raise Exception(f"Transcription failed: {assembly_result.error}")
+    
+    # Build sentiment analysis list
+    sentiment_list = []
+    if assembly_result.sentiment_analysis is not None:
+        for sentiment_result in assembly_result.sentiment_analysis:
+            sentiment_list.append({
+                "text": sentiment_result.text,
+                "sentiment": sentiment_result.sentiment,
+                "confidence": sentiment_result.confidence
+            })
+    
+    # Calculate overall sentiment
+    return _build_audio_result(assembly_result.text, sentiment_list)
+
 def analyze_audio(video_url):
+    """
+    Transcribes a clip with sentiment analysis.
+    video_url may be a remote URL or a local file path; local files are uploaded
+    as bytes so AssemblyAI doesn't fetch the clip from storage a second time.
+    """
     try:
-        config = aai.TranscriptionConfig(
-            sentiment_analysis=True
-        )
-        
-        transcriber = aai.Transcriber(config=config)
-        assembly_result = transcriber.transcribe(video_url)
-        
-        # Wait for completion
-        if assembly_result.status == aai.TranscriptStatus.error:
-            raise Exception(f"Transcription failed: {assembly_result.error}")
-        
-        # Build sentiment analysis list
-        sentiment_list = []
-        if assembly_result.sentiment_analysis is not None:
-            for sentiment_result in assembly_result.sentiment_analysis:
-                sentiment_list.append({
-                    "text": sentiment_result.text,
-                    "sentiment": sentiment_result.sentiment,
-                    "confidence": sentiment_result.confidence
-                })
-        
-        # Calculate overall sentiment
-        if sentiment_list:
-            overall_sentiment = max(sentiment_list, key=lambda x: x["confidence"])
-            sentiment = overall_sentiment["sentiment"]
-            sentiment_confidence = overall_sentiment["confidence"]
-        else:
-            sentiment = "NEUTRAL"
-            sentiment_confidence = 0.0
-        
-        return {
-            "transcript": assembly_result.text or "",
-            "sentiment": sentiment,
-            "sentiment_confidence": sentiment_confidence,
-            "sentiment_analysis": sentiment_list
-        }
-        
+        return transcribe_audio(video_url)
+    except Exception as e:
+        print(f"[ERROR] AssemblyAI failed: {e}")
+        return dict(EMPTY_AUDIO_RESULT)
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _upload_file_async(path):
+    """Uploads a local clip to AssemblyAI and returns the private upload_url."""
+    data = await asyncio.to_thread(_read_file, path)
+    response = await _async_http.post("/v2/upload", content=data)
+    response.raise_for_status()
+    return response.json()["upload_url"]
+
+async def analyze_audio_async(video_url):
+    """
+    Async version of analyze_audio for the ASGI app, using the AssemblyAI REST API
+    directly so polling doesn't hold a thread. Same return shape as analyze_audio.
+    """
+    try:
+        audio_url = await _upload_file_async(video_url) if os.path.exists(video_url) else video_url
+
+        response = await _async_http.post("/v2/transcript", json=_transcript_request(audio_url))
+        response.raise_for_status()
+
+        # Poll until AssemblyAI finishes, yielding to other requests in between
+        return await poll_transcript_async(response.json()["id"])
+
     except Exception as e:
         print(f"[ERROR] AssemblyAI failed: {e}")
-        return {
-            "transcript": "",
-            "sentiment": "NEUTRAL", 
-            "sentiment_confidence": 0.0,
-            "sentiment_analysis": []
-        }
\ No newline at end of file
+        return dict(EMPTY_AUDIO_RESULT)
\ No newline at end of file
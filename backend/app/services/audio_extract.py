@@ -0,0 +1,63 @@
+import os
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+from app.services.stream_decoder import FFMPEG_BINARY, ffmpeg_available
+
+# Send only a compact mono audio track to transcription instead of the whole video
+AUDIO_EXTRACTION = os.getenv("AUDIO_EXTRACTION", "1") == "1"
+# 16 kHz mono is what speech models use internally; Opus keeps it around 3 KB/s
+AUDIO_EXTRACT_SAMPLE_RATE = int(os.getenv("AUDIO_EXTRACT_SAMPLE_RATE", "16000"))
+AUDIO_EXTRACT_BITRATE = os.getenv("AUDIO_EXTRACT_BITRATE", "24k")
+AUDIO_EXTRACT_TIMEOUT = float(os.getenv("AUDIO_EXTRACT_TIMEOUT", "30"))
+
+def extract_audio(video_path, start=None, end=None):
+    """
+    Transcodes the audio track of a local clip into a mono Opus file in the temp dir.
+    start/end (seconds) limit it to one segment of the clip.
+    Returns the new file's path, or None if ffmpeg is missing or the clip has no usable audio.
+    """
+    if not ffmpeg_available():
+        return None
+
+    fd, audio_path = tempfile.mkstemp(suffix=".ogg")
+    os.close(fd)
+    try:
+        subprocess.run(
+            [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-y",
+             "-i", video_path,
+             *(["-ss", f"{start:.3f}"] if start else []),
+             *(["-to", f"{end:.3f}"] if end is not None else []),
+             "-vn", "-ac", "1", "-ar", str(AUDIO_EXTRACT_SAMPLE_RATE),
+             "-c:a", "libopus", "-b:a", AUDIO_EXTRACT_BITRATE,
+             audio_path],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            timeout=AUDIO_EXTRACT_TIMEOUT, check=True
+        )
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        stderr = getattr(e, "stderr", None)
+        detail = stderr.decode(errors="replace").strip() if stderr else e
+        print(f"[WARNING] Audio extraction failed, transcribing the full clip: {detail}")
+        os.remove(audio_path)
+        return None
+
+    if os.path.getsize(audio_path) == 0:
+        os.remove(audio_path)
+        return None
+    print(f"[DEBUG] Extracted audio track: {os.path.getsize(video_path)} -> {os.path.getsize(audio_path)} bytes")
+    return audio_path
+
+@contextmanager
+def audio_track(video_path):
+    """
+    Yields the file to transcribe for a local clip: the extracted audio track when
+    AUDIO_EXTRACTION is on and extraction worked, otherwise the clip itself.
+    The extracted file is deleted afterwards.
+    """
+    audio_path = extract_audio(video_path) if AUDIO_EXTRACTION and os.path.exists(video_path) else None
+    try:
+        yield audio_path or video_path
+    finally:
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
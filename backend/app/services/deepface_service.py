@@ -3,11 +3,26 @@ import cv2
 import tempfile
 import requests
 from deepface import DeepFace
+from app.services.media_fetch import DOWNLOAD_CHUNK_SIZE
+from app.services.frame_sampler import sample_frames
+from app.services.stream_decoder import stream_frames
+from app.services.frame_pipeline import pipelined_frames, VIDEO_PIPELINE
+from app.services.emotion_model import detect_faces, downscale_frame, preprocess_face, predict_emotions, \
+    EMOTION_BATCH_SIZE, DETECTOR_BACKEND
+from app.services.emotion_series import emotion_rows, summarize_emotions, EarlyStopMonitor, \
+    VIDEO_ADAPTIVE_SAMPLING, VIDEO_CONVERGENCE_CHECK_EVERY
+from app.services.face_tracker import FaceTracker, VIDEO_FACE_TRACKING
+
+# "batched" detects faces per frame and runs the emotion model once over all crops,
+# "per_frame" calls DeepFace.analyze on every sampled frame
+VIDEO_EMOTION_MODE = os.getenv("VIDEO_EMOTION_MODE", "batched").lower()
 
 def download_remote_video(video_url: str) -> str:
     """
     Downloads a remote video URL to a temporary file and returns the file path.
     Supports Google Drive direct links.
+    /analyze_turn goes through media_fetch instead, so this is only used when
+    analyze_video is called with a URL directly.
     """
     try:
         response = requests.get(video_url, stream=True, timeout=30)
@@ -16,16 +31,112 @@ def download_remote_video(video_url: str) -> str:
         raise RuntimeError(f"Failed to download video: {e}")
 
     temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-    for chunk in response.iter_content(chunk_size=8192):
+    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
         temp_file.write(chunk)
     temp_file.close()
     return temp_file.name
 
-def analyze_video(video_url: str):
+def analyze_frames(frames, adaptive=None):
+    """
+    Runs emotion analysis over an iterable of (frame_index, timestamp, frame)
+    from frame_sampler.sample_frames or stream_decoder.stream_frames.
+    In adaptive mode (VIDEO_ADAPTIVE_SAMPLING=1) faceless frames are skipped and
+    sampling stops early once the emotions converge or the face is gone.
+    Returns: (emotions, timeline) from emotion_series.summarize_emotions, with
+    "frames_used" and "stop_reason" added to the timeline. When no face was
+    analyzed the timeline holds only those two and "faces_analyzed": 0.
+    """
+    adaptive = VIDEO_ADAPTIVE_SAMPLING if adaptive is None else adaptive
+    monitor = EarlyStopMonitor() if adaptive else None
+    # Adaptive mode scores faces in small batches so it can check convergence in between
+    flush_size = VIDEO_CONVERGENCE_CHECK_EVERY if monitor else EMOTION_BATCH_SIZE
+
+    score_rows = []
+    timestamps = []
+    pending_inputs = []
+    pending_timestamps = []
+    frames_used = 0
+
+    def _flush():
+        rows = predict_emotions(pending_inputs)
+        score_rows.extend(rows.tolist())
+        timestamps.extend(pending_timestamps)
+        pending_inputs.clear()
+        pending_timestamps.clear()
+        return rows
+
+    # With VIDEO_FACE_TRACKING=1 batched mode detects once and tracks afterwards
+    tracker = FaceTracker() if VIDEO_FACE_TRACKING else None
+    try:
+        for frame_index, timestamp, frame in frames:
+            frames_used += 1
+            try:
+                if VIDEO_EMOTION_MODE == "batched":
+                    faces = tracker.faces(frame) if tracker else detect_faces(frame)
+                    if monitor:
+                        # A confidence of 0 is DeepFace's whole-frame stand-in for "no face"
+                        faces = [face for face in faces if face.get("confidence", 0) > 0]
+                        if not faces:
+                            if monitor.add_faceless_frame():
+                                break
+                            continue
+                        monitor.add_face_frame()
+
+                    for face in faces:
+                        pending_inputs.append(preprocess_face(face["face"]))
+                        pending_timestamps.append(timestamp)
+                    # Vectorized forward pass per batch of faces
+                    if len(pending_inputs) >= flush_size:
+                        rows = _flush()
+                        if monitor and monitor.add_scores(rows):
+                            break
+                else:
+                    small_frame, _ = downscale_frame(frame)
+                    result = DeepFace.analyze(
+                        small_frame, actions=["emotion"], detector_backend=DETECTOR_BACKEND, enforce_detection=False
+                    )
+                    faces = result if isinstance(result, list) else [result]
+                    if monitor:
+                        faces = [face for face in faces if face.get("face_confidence", 1) > 0]
+                        if not faces:
+                            if monitor.add_faceless_frame():
+                                break
+                            continue
+                        monitor.add_face_frame()
+
+                    rows = emotion_rows(faces)
+                    score_rows.extend(rows)
+                    timestamps.extend([timestamp] * len(rows))
+                    if monitor and monitor.add_scores(rows):
+                        break
+            except Exception as e:
+                print(f"Frame {frame_index} ({timestamp:.1f}s) DeepFace warning: {e}")
+                continue
+    finally:
+        # Stop the decoder (thread or ffmpeg) right away when we break out early
+        close = getattr(frames, "close", None)
+        if close:
+            close()
+
+    if pending_inputs:
+        _flush()
+
+    # Aggregate emotions across frames: one (faces x emotions) matrix, reduced with NumPy
+    emotions, timeline = summarize_emotions(timestamps, score_rows)
+    # Kept even without faces, so a "no_face" early stop still reports how far it got
+    timeline = timeline or {"faces_analyzed": 0}
+    timeline["frames_used"] = frames_used
+    timeline["stop_reason"] = monitor.stop_reason if monitor else None
+    if monitor and monitor.stop_reason:
+        print(f"[DEBUG] Video analysis stopped early ({monitor.stop_reason}) after {frames_used} frames")
+    return emotions, timeline
+
+def analyze_video(video_url: str, include_timeline=False):
     """
     Analyze emotions in a video using DeepFace.
     Supports both local file paths and remote URLs.
-    Returns: dictionary of emotion probabilities.
+    Returns: dictionary of emotion probabilities,
+    or (emotions, timeline) when include_timeline is True.
     """
     # Step 1: Determine if input is local file or URL
     temp_file_path = None
@@ -42,22 +153,13 @@ def analyze_video(video_url: str):
         if not cap.isOpened():
             raise RuntimeError(f"Cannot open video file: {video_path}")
 
-        frame_results = []
-        frame_count = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            frame_count += 1
-            if frame_count % 30 == 0:  # analyze every 30th frame
-                try:
-                    result = DeepFace.analyze(
-                        frame, actions=["emotion"], enforce_detection=False
-                    )
-                    frame_results.append(result)
-                except Exception as e:
-                    print(f"Frame {frame_count} DeepFace warning: {e}")
-                    continue
+        # Time-based sampling: skipped frames are grab()bed (or seeked past), never converted.
+        # Browser WebM reports no frame count; the probed duration keeps the frame budget spread over the clip
+        frames = sample_frames(cap, video_path=video_path)
+        if VIDEO_PIPELINE:
+            # Decode the next frames on another thread while this one runs inference
+            frames = pipelined_frames(frames)
+        emotions, timeline = analyze_frames(frames)
         cap.release()
     except Exception as e:
         raise RuntimeError(f"DeepFace failed to analyze video: {e}")
@@ -66,23 +168,17 @@ def analyze_video(video_url: str):
         if temp_file_path and os.path.exists(temp_file_path):
             os.remove(temp_file_path)
 
-    # Step 3: Aggregate emotions across frames
-    # TODO: Will optimize code after
-    emotions = {}
-    if frame_results:
-        for frame in frame_results:
-            if isinstance(frame, list):
-                for face in frame:
-                    for k, v in face['emotion'].items():
-                        emotions[k] = emotions.get(k, 0) + v
-            elif isinstance(frame, dict):
-                for k, v in frame.get('emotion', {}).items():
-                    emotions[k] = emotions.get(k, 0) + v
-
-        total_frames = sum(len(f) if isinstance(f, list) else 1 for f in frame_results)
-        emotions = {k: round(v / total_frames, 4) for k, v in emotions.items()}
-    else:
-        emotions = {}
+    return (emotions, timeline) if include_timeline else emotions
 
-
-    return emotions
+def analyze_video_stream(chunks, include_timeline=False):
+    """
+    Analyze emotions while the clip is still downloading.
+    chunks is an iterable of raw bytes (e.g. fed by media_fetch.download_media's on_chunk);
+    frames are decoded by ffmpeg and analyzed as they arrive.
+    Returns: same as analyze_video.
+    """
+    try:
+        emotions, timeline = analyze_frames(stream_frames(chunks))
+    except Exception as e:
+        raise RuntimeError(f"DeepFace failed to analyze video stream: {e}")
+    return (emotions, timeline) if include_timeline else emotions
@@ -0,0 +1,204 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+from deepface import DeepFace
+
+from app.services.emotion_runtime import EMOTION_RUNTIME, load_runtime_model
+
+# Same label order as DeepFace's Emotion model output
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+# Face detector for video analysis: opencv, ssd, mtcnn, retinaface, ...
+# Stays opencv (what DeepFace.analyze used before) until benchmarks/detector_backends
+# has been run on real recordings; see benchmarks/RESULTS.md
+DETECTOR_BACKEND = os.getenv("VIDEO_DETECTOR_BACKEND", "opencv").lower()
+
+# Frames are downscaled so their longest side is at most this before detection.
+# Off (0, full resolution) until benchmarks/detection_resolution has been run on real
+# recordings; see benchmarks/RESULTS.md
+VIDEO_DETECTION_MAX_SIDE = int(os.getenv("VIDEO_DETECTION_MAX_SIDE", "0"))
+# Re-crop detected faces from the full-resolution frame instead of the downscaled one
+VIDEO_CROP_FROM_ORIGINAL = os.getenv("VIDEO_CROP_FROM_ORIGINAL", "0") == "1"
+
+# Faces per forward pass in the batched path
+EMOTION_BATCH_SIZE = int(os.getenv("EMOTION_BATCH_SIZE", "32"))
+
+# Build and warm the models at startup instead of on the first turn
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "1") == "1"
+
+_emotion_model = None
+_emotion_predictor = None
+_emotion_model_lock = threading.Lock()
+_models_ready = threading.Event()
+_warm_up_error = None
+
+def get_emotion_model():
+    """Builds (once) and returns DeepFace's Emotion model client."""
+    global _emotion_model
+    if _emotion_model is None:
+        with _emotion_model_lock:
+            if _emotion_model is None:
+                try:
+                    from deepface.modules.modeling import build_model
+                    _emotion_model = build_model(task="facial_attribute", model_name="Emotion")
+                except (ImportError, TypeError):
+                    # Older DeepFace releases build models by name only
+                    _emotion_model = DeepFace.build_model("Emotion")
+    return _emotion_model
+
+def get_emotion_predictor():
+    """
+    Returns the model predict_emotions runs: DeepFace's Keras model, or the exported
+    ONNX/TFLite model when EMOTION_RUNTIME selects a CPU runtime.
+    """
+    global _emotion_predictor
+    if EMOTION_RUNTIME == "keras":
+        return get_emotion_model().model
+    if _emotion_predictor is None:
+        with _emotion_model_lock:
+            if _emotion_predictor is None:
+                _emotion_predictor = load_runtime_model()
+    return _emotion_predictor
+
+def downscale_frame(frame, max_side=None):
+    """
+    Shrinks a frame so its longest side is at most max_side.
+    Returns (frame, scale) where scale is small/original (1.0 if untouched).
+    """
+    max_side = VIDEO_DETECTION_MAX_SIDE if max_side is None else max_side
+    height, width = frame.shape[:2]
+    longest = max(height, width)
+    if not max_side or longest <= max_side:
+        return frame, 1.0
+
+    scale = max_side / longest
+    small = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+    return small, scale
+
+def _scale_point(point, scale):
+    if point is None:
+        return None
+    return tuple(int(round(v / scale)) for v in point)
+
+def detect_faces(frame, max_side=None, crop_from_original=None, detector_backend=None):
+    """
+    Runs face detection on one BGR frame and returns DeepFace face objects
+    ({"face": RGB float crop, "facial_area": {...}, "confidence": ...}).
+    With enforce_detection=False a faceless frame comes back as the whole image,
+    exactly like DeepFace.analyze treats it.
+    Detection runs on a copy downscaled to max_side; facial_area is mapped back to
+    original-frame coordinates, and the crop is only re-taken from the original
+    frame when crop_from_original is set.
+    detector_backend defaults to VIDEO_DETECTOR_BACKEND.
+    """
+    crop_from_original = VIDEO_CROP_FROM_ORIGINAL if crop_from_original is None else crop_from_original
+    small, scale = downscale_frame(frame, max_side)
+    faces = DeepFace.extract_faces(
+        img_path=small, detector_backend=detector_backend or DETECTOR_BACKEND, enforce_detection=False, align=True
+    )
+    if scale == 1.0:
+        return faces
+
+    for face in faces:
+        area = face["facial_area"]
+        mapped = {key: int(round(area[key] / scale)) for key in ("x", "y", "w", "h")}
+        for key in ("left_eye", "right_eye"):
+            if key in area:
+                mapped[key] = _scale_point(area[key], scale)
+        face["facial_area"] = mapped
+
+        if crop_from_original and face.get("confidence", 0) > 0:
+            x, y, w, h = mapped["x"], mapped["y"], mapped["w"], mapped["h"]
+            face["face"] = frame[y:y + h, x:x + w][:, :, ::-1].astype(np.float32) / 255.0
+    return faces
+
+def _resize_image(img, target_size):
+    """Letterboxes an image into target_size, mirroring deepface's preprocessing.resize_image."""
+    factor = min(target_size[0] / img.shape[0], target_size[1] / img.shape[1])
+    dsize = (max(1, int(img.shape[1] * factor)), max(1, int(img.shape[0] * factor)))
+    img = cv2.resize(img, dsize)
+
+    diff_0 = target_size[0] - img.shape[0]
+    diff_1 = target_size[1] - img.shape[1]
+    img = np.pad(
+        img,
+        ((diff_0 // 2, diff_0 - diff_0 // 2), (diff_1 // 2, diff_1 - diff_1 // 2), (0, 0)),
+        "constant"
+    )
+    if img.shape[0:2] != target_size:
+        img = cv2.resize(img, (target_size[1], target_size[0]))
+
+    img = img.astype(np.float32)
+    if img.max() > 1:
+        img /= 255.0
+    return img
+
+def preprocess_face(face):
+    """
+    Turns a DeepFace face crop (RGB) into the 48x48 grayscale input of the
+    Emotion model, following the same steps DeepFace.analyze takes.
+    """
+    img = _resize_image(np.ascontiguousarray(face[:, :, ::-1]), (224, 224))  # rgb to bgr
+    img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    img_gray = cv2.resize(img_gray, (48, 48))
+    return img_gray[:, :, np.newaxis]
+
+def predict_emotions(face_inputs):
+    """
+    Runs the Emotion model (on EMOTION_RUNTIME) over preprocessed faces in batches of EMOTION_BATCH_SIZE.
+    Returns an (N, 7) array of percentages in EMOTION_LABELS order.
+    """
+    if len(face_inputs) == 0:
+        return np.zeros((0, len(EMOTION_LABELS)), dtype=np.float32)
+
+    model = get_emotion_predictor()
+    batch = np.asarray(face_inputs, dtype=np.float32)
+    predictions = np.concatenate([
+        np.asarray(model.predict_on_batch(batch[start:start + EMOTION_BATCH_SIZE]))
+        for start in range(0, len(batch), EMOTION_BATCH_SIZE)
+    ])
+
+    # DeepFace reports each emotion as a percentage of the prediction sum
+    return 100 * predictions / predictions.sum(axis=1, keepdims=True)
+
+def warm_up_models():
+    """
+    Builds the face detector and the Emotion model and runs one dummy inference
+    through both the batched path and DeepFace.analyze, so the first real turn
+    doesn't pay for TensorFlow graph construction.
+    With a CPU runtime only the exported model is loaded; the Keras Emotion model
+    is then built lazily, if VIDEO_EMOTION_MODE=per_frame ever needs it.
+    """
+    dummy_frame = np.zeros((224, 224, 3), dtype=np.uint8)
+    get_emotion_predictor()
+    faces = detect_faces(dummy_frame)
+    predict_emotions([preprocess_face(face["face"]) for face in faces])
+    if EMOTION_RUNTIME == "keras":
+        DeepFace.analyze(dummy_frame, actions=["emotion"], detector_backend=DETECTOR_BACKEND, enforce_detection=False)
+    _models_ready.set()
+
+def start_model_warm_up():
+    """Warms the models in a background thread so the server can bind while TensorFlow loads."""
+    def _run():
+        global _warm_up_error
+        try:
+            warm_up_models()
+            print("[DEBUG] DeepFace models loaded and warmed up")
+        except Exception as e:
+            _warm_up_error = str(e) or type(e).__name__
+            print(f"[ERROR] DeepFace warm-up failed: {e}")
+
+    if not PRELOAD_MODELS:
+        _models_ready.set()
+        return
+    threading.Thread(target=_run, name="deepface-warm-up", daemon=True).start()
+
+def models_ready():
+    """True once the detector and Emotion model are resident in this process."""
+    return _models_ready.is_set()
+
+def model_warm_up_error():
+    """Why the background warm-up failed, or None."""
+    return _warm_up_error
@@ -0,0 +1,104 @@
+import os
+import threading
+
+import numpy as np
+
+# Which runtime scores the 48x48 face crops: "keras" (DeepFace's TensorFlow model),
+# "onnx" (ONNX Runtime) or "tflite" (TFLite interpreter). The last two need an exported model.
+EMOTION_RUNTIME = os.getenv("EMOTION_RUNTIME", "keras").lower()
+# Exported model for the onnx/tflite runtimes (see tools/export_emotion_model.py).
+# Their packages are optional: pip install -r requirements-emotion-runtimes.txt
+EMOTION_MODEL_PATH = os.getenv("EMOTION_MODEL_PATH", "")
+# CPU threads per inference session (0 lets the runtime decide)
+EMOTION_RUNTIME_THREADS = int(os.getenv("EMOTION_RUNTIME_THREADS", "0"))
+
+class OnnxEmotionModel:
+    """Emotion model exported to ONNX, run on the CPU execution provider."""
+
+    def __init__(self, model_path, threads=None):
+        import onnxruntime as ort
+
+        threads = EMOTION_RUNTIME_THREADS if threads is None else threads
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_on_batch(self, batch):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+class TFLiteEmotionModel:
+    """
+    Emotion model converted to TFLite. Uses the standalone tflite_runtime package
+    when installed, so the API process doesn't have to import TensorFlow for it.
+    An Interpreter isn't thread-safe (its tensors are resized and overwritten on
+    every call), so each thread that scores faces gets its own.
+    """
+
+    def __init__(self, model_path, threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self.interpreter_class = Interpreter
+        self.model_path = model_path
+        self.threads = EMOTION_RUNTIME_THREADS if threads is None else threads
+        self.local = threading.local()
+        # Built right away so a bad model file fails at load time, not on the first turn
+        self._interpreter()
+
+    def _interpreter(self):
+        """This thread's interpreter, with its input/output details and current batch size."""
+        state = getattr(self.local, "state", None)
+        if state is None:
+            interpreter = self.interpreter_class(model_path=self.model_path, num_threads=self.threads or None)
+            state = self.local.state = {
+                "interpreter": interpreter,
+                "input": interpreter.get_input_details()[0],
+                "output": interpreter.get_output_details()[0],
+                "batch_size": None
+            }
+        return state
+
+    def predict_on_batch(self, batch):
+        state = self._interpreter()
+        interpreter, input_details, output_details = state["interpreter"], state["input"], state["output"]
+        batch = np.asarray(batch, dtype=np.float32)
+        if batch.shape[0] != state["batch_size"]:
+            # Interpreter tensors have a fixed shape; only resized when the batch size changes
+            interpreter.resize_tensor_input(input_details["index"], batch.shape)
+            interpreter.allocate_tensors()
+            state["batch_size"] = batch.shape[0]
+
+        # Fully int8-quantized models take and return quantized tensors
+        scale, zero_point = input_details["quantization"]
+        if input_details["dtype"] != np.float32 and scale:
+            limits = np.iinfo(input_details["dtype"])
+            batch = np.clip(np.round(batch / scale + zero_point), limits.min, limits.max).astype(input_details["dtype"])
+        interpreter.set_tensor(input_details["index"], batch)
+        interpreter.invoke()
+
+        output = interpreter.get_tensor(output_details["index"])
+        scale, zero_point = output_details["quantization"]
+        if output_details["dtype"] != np.float32 and scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+def load_runtime_model(runtime=None, model_path=None):
+    """
+    Loads the exported emotion model for a CPU runtime. The returned object has
+    predict_on_batch(batch) like the Keras model: (N, 48, 48, 1) floats in, (N, 7) out.
+    """
+    runtime = (runtime or EMOTION_RUNTIME).lower()
+    model_path = model_path or EMOTION_MODEL_PATH
+    if not model_path or not os.path.exists(model_path):
+        raise RuntimeError(f"EMOTION_RUNTIME={runtime} needs EMOTION_MODEL_PATH to point to an exported model")
+
+    if runtime == "onnx":
+        return OnnxEmotionModel(model_path)
+    if runtime == "tflite":
+        return TFLiteEmotionModel(model_path)
+    raise ValueError(f"Unknown emotion runtime: {runtime}")
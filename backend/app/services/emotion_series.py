@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+
+from app.services.emotion_model import EMOTION_LABELS
+
+# Moving-average window (in analyzed faces) for the smoothed emotion trajectory
+EMOTION_SMOOTHING_WINDOW = int(os.getenv("EMOTION_SMOOTHING_WINDOW", "3"))
+
+def emotion_rows(result):
+    """
+    Converts one DeepFace.analyze result (a dict, or a list with one dict per face)
+    into rows of scores in EMOTION_LABELS order.
+    """
+    faces = result if isinstance(result, list) else [result]
+    return [[face.get("emotion", {}).get(label, 0.0) for label in EMOTION_LABELS] for face in faces]
+
+def _moving_average(scores, window):
+    """Trailing moving average along the frame axis, computed with one cumulative sum."""
+    if window <= 1 or len(scores) < 2:
+        return scores
+    cumulative = np.cumsum(np.vstack([np.zeros((1, scores.shape[1])), scores]), axis=0)
+    counts = np.minimum(np.arange(1, len(scores) + 1), window)[:, np.newaxis]
+    upper = np.arange(1, len(scores) + 1)
+    return (cumulative[upper] - cumulative[upper - counts[:, 0]]) / counts
+
+def summarize_emotions(timestamps, scores, smoothing_window=None):
+    """
+    Reduces a (faces x emotions) score matrix to the averaged emotion dict analyze_video
+    has always returned, plus a timeline with the per-face series.
+
+    @return (emotions, timeline)
+        emotions: { "angry": 1.23, ... } averaged over every face, rounded to 4 places
+        timeline: {
+            "labels": [...], "timestamps": [...], "scores": [[...]], "smoothed": [[...]],
+            "dominant_emotion": "sad", "dominant_share": 0.6, "faces_analyzed": 12
+        }
+        Both are empty/None when no face was analyzed.
+    """
+    scores = np.asarray(scores, dtype=np.float64).reshape(-1, len(EMOTION_LABELS))
+    if len(scores) == 0:
+        return {}, None
+
+    smoothing_window = EMOTION_SMOOTHING_WINDOW if smoothing_window is None else smoothing_window
+    means = np.round(scores.mean(axis=0), 4)
+    dominant_index = int(np.argmax(means))
+    # Share of faces whose own top emotion agrees with the clip-level dominant emotion
+    dominant_share = float(np.mean(np.argmax(scores, axis=1) == dominant_index))
+
+    emotions = {label: float(value) for label, value in zip(EMOTION_LABELS, means)}
+    timeline = {
+        "labels": list(EMOTION_LABELS),
+        "timestamps": [round(float(t), 3) for t in timestamps],
+        "scores": np.round(scores, 4).tolist(),
+        "smoothed": np.round(_moving_average(scores, smoothing_window), 4).tolist(),
+        "dominant_emotion": EMOTION_LABELS[dominant_index],
+        "dominant_share": round(dominant_share, 4),
+        "faces_analyzed": len(scores)
+    }
+    return emotions, timeline
+
+# Adaptive mode: stop sampling once the running estimate settles or the face is gone
+VIDEO_ADAPTIVE_SAMPLING = os.getenv("VIDEO_ADAPTIVE_SAMPLING", "0") == "1"
+# Largest change (in percentage points) of any running mean that still counts as "stable"
+VIDEO_CONVERGENCE_TOLERANCE = float(os.getenv("VIDEO_CONVERGENCE_TOLERANCE", "1.5"))
+# Consecutive stable checks needed before stopping
+VIDEO_CONVERGENCE_PATIENCE = int(os.getenv("VIDEO_CONVERGENCE_PATIENCE", "3"))
+# Never stop on convergence before this many faces were scored
+VIDEO_MIN_FACES = int(os.getenv("VIDEO_MIN_FACES", "6"))
+# Faces scored between two convergence checks
+VIDEO_CONVERGENCE_CHECK_EVERY = int(os.getenv("VIDEO_CONVERGENCE_CHECK_EVERY", "2"))
+# Stop after this many consecutive sampled frames without a detected face
+VIDEO_MAX_FACELESS_FRAMES = int(os.getenv("VIDEO_MAX_FACELESS_FRAMES", "5"))
+
+class EarlyStopMonitor:
+    """
+    Tracks the running mean of the emotion scores of one clip and decides when
+    sampling more frames is no longer worth it. stop_reason is set once it says stop.
+    """
+
+    def __init__(self, tolerance=None, patience=None, min_faces=None, max_faceless_frames=None):
+        self.tolerance = VIDEO_CONVERGENCE_TOLERANCE if tolerance is None else tolerance
+        self.patience = VIDEO_CONVERGENCE_PATIENCE if patience is None else patience
+        self.min_faces = VIDEO_MIN_FACES if min_faces is None else min_faces
+        self.max_faceless_frames = VIDEO_MAX_FACELESS_FRAMES if max_faceless_frames is None else max_faceless_frames
+        self.total = np.zeros(len(EMOTION_LABELS))
+        self.count = 0
+        self.last_mean = None
+        self.stable_checks = 0
+        self.faceless_streak = 0
+        self.stop_reason = None
+
+    def add_faceless_frame(self):
+        """Records a sampled frame with no face. Returns True when sampling should stop."""
+        self.faceless_streak += 1
+        if self.max_faceless_frames and self.faceless_streak >= self.max_faceless_frames:
+            self.stop_reason = "no_face"
+        return self.stop_reason is not None
+
+    def add_face_frame(self):
+        self.faceless_streak = 0
+
+    def add_scores(self, rows):
+        """Adds newly scored faces. Returns True once the running mean has converged."""
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(EMOTION_LABELS))
+        if len(rows) == 0:
+            return False
+        self.total += rows.sum(axis=0)
+        self.count += len(rows)
+        mean = self.total / self.count
+
+        if self.last_mean is not None and np.max(np.abs(mean - self.last_mean)) <= self.tolerance:
+            self.stable_checks += 1
+        else:
+            self.stable_checks = 0
+        self.last_mean = mean
+
+        if self.count >= self.min_faces and self.stable_checks >= self.patience:
+            self.stop_reason = "converged"
+        return self.stop_reason is not None
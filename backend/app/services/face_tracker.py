@@ -0,0 +1,93 @@
+import os
+
+import cv2
+import numpy as np
+
+from app.services.emotion_model import detect_faces
+
+# Detect once, then follow the face with template matching between sampled frames.
+# Off (detect on every frame) until benchmarks/face_tracking shows the dominant emotion
+# still agrees with per-frame detection; see benchmarks/RESULTS.md
+VIDEO_FACE_TRACKING = os.getenv("VIDEO_FACE_TRACKING", "0") == "1"
+# Normalized cross-correlation below this means we lost the face and must re-detect
+TRACKING_MIN_SCORE = float(os.getenv("TRACKING_MIN_SCORE", "0.6"))
+# Force a full detection every N tracked frames even if tracking looks fine (0 disables)
+TRACKING_REDETECT_EVERY = int(os.getenv("TRACKING_REDETECT_EVERY", "10"))
+# How far around the last box to search, as a fraction of the box size
+TRACKING_SEARCH_MARGIN = 0.5
+
+class FaceTracker:
+    """
+    Tracks the user's face across the sampled frames of one clip.
+    Full DeepFace detection runs on the first good frame; later frames reuse the
+    box, refined by template matching in a small window around it. Detection runs
+    again when the match score drops below min_score or every redetect_every frames.
+    Only the largest detected face is tracked (the user in a therapy recording).
+    """
+
+    def __init__(self, min_score=None, redetect_every=None):
+        self.min_score = TRACKING_MIN_SCORE if min_score is None else min_score
+        self.redetect_every = TRACKING_REDETECT_EVERY if redetect_every is None else redetect_every
+        self.box = None
+        self.template = None
+        self.frames_since_detect = 0
+        self.detections = 0
+
+    def faces(self, frame):
+        """Returns DeepFace-style face objects for this frame, like detect_faces does."""
+        if self.template is not None and (not self.redetect_every or self.frames_since_detect < self.redetect_every):
+            tracked = self._track(frame)
+            if tracked is not None:
+                self.frames_since_detect += 1
+                return [tracked]
+
+        return self._detect(frame)
+
+    def _detect(self, frame):
+        self.detections += 1
+        self.frames_since_detect = 0
+        faces = detect_faces(frame)
+
+        # A confidence of 0 means DeepFace found nothing and returned the whole frame
+        found = [f for f in faces if f.get("confidence", 0) > 0]
+        if not found:
+            self.box = None
+            self.template = None
+            return faces
+
+        face = max(found, key=lambda f: f["facial_area"]["w"] * f["facial_area"]["h"])
+        area = face["facial_area"]
+        self.box = (area["x"], area["y"], area["w"], area["h"])
+        self._update_template(frame)
+        return [face]
+
+    def _track(self, frame):
+        x, y, w, h = self.box
+        frame_h, frame_w = frame.shape[:2]
+        margin_x, margin_y = int(w * TRACKING_SEARCH_MARGIN), int(h * TRACKING_SEARCH_MARGIN)
+        x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+        x1, y1 = min(frame_w, x + w + margin_x), min(frame_h, y + h + margin_y)
+
+        window = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        if window.shape[0] < self.template.shape[0] or window.shape[1] < self.template.shape[1]:
+            return None
+
+        result = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, location = cv2.minMaxLoc(result)
+        if score < self.min_score:
+            return None
+
+        self.box = (x0 + location[0], y0 + location[1], w, h)
+        self._update_template(frame)
+
+        x, y, w, h = self.box
+        crop = frame[y:y + h, x:x + w][:, :, ::-1].astype(np.float32) / 255.0  # bgr to rgb, like extract_faces
+        return {
+            "face": crop,
+            "facial_area": {"x": x, "y": y, "w": w, "h": h},
+            "confidence": float(score)
+        }
+
+    def _update_template(self, frame):
+        x, y, w, h = self.box
+        self.template = cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2GRAY)
@@ -0,0 +1,94 @@
+import os
+import queue
+import threading
+
+import numpy as np
+
+# Decode on a producer thread while the caller runs inference (0 keeps the strict alternating loop)
+VIDEO_PIPELINE = os.getenv("VIDEO_PIPELINE", "1") == "1"
+# Preallocated frame slots between decoder and inference; bounds memory regardless of clip length
+FRAME_BUFFER_SLOTS = int(os.getenv("FRAME_BUFFER_SLOTS", "8"))
+
+class FrameRingBuffer:
+    """
+    Fixed set of preallocated frame arrays shared by one decoder and one consumer.
+    put() blocks while every slot is in use, which gives the decoder backpressure.
+    """
+
+    def __init__(self, slots=None):
+        slots = slots or FRAME_BUFFER_SLOTS
+        self._arrays = [None] * slots
+        self._free = queue.Queue()
+        self._ready = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def put(self, frame_index, timestamp, frame):
+        slot = self._free.get()
+        array = self._arrays[slot]
+        if array is None or array.shape != frame.shape or array.dtype != frame.dtype:
+            # Only (re)allocated for the first frames or if the resolution changes mid-clip
+            array = self._arrays[slot] = np.empty_like(frame)
+        np.copyto(array, frame)
+        self._ready.put((slot, frame_index, timestamp))
+
+    def close(self):
+        self._ready.put(None)
+
+    def get(self):
+        """Returns (slot, frame_index, timestamp, frame), or None once the decoder is done."""
+        item = self._ready.get()
+        if item is None:
+            return None
+        slot, frame_index, timestamp = item
+        return slot, frame_index, timestamp, self._arrays[slot]
+
+    def release(self, slot):
+        self._free.put(slot)
+
+def pipelined_frames(frames, slots=None):
+    """
+    Runs the frame source (e.g. sample_frames) on a decoder thread and yields
+    its frames from the ring buffer. A yielded frame is only valid until the
+    next one is requested; its slot is then handed back to the decoder.
+    """
+    buffer = FrameRingBuffer(slots)
+    stop = threading.Event()
+    errors = []
+
+    def _produce():
+        try:
+            for frame_index, timestamp, frame in frames:
+                buffer.put(frame_index, timestamp, frame)
+                if stop.is_set():
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            buffer.close()
+
+    decoder = threading.Thread(target=_produce, name="frame-decoder", daemon=True)
+    decoder.start()
+
+    item = ()
+    try:
+        while True:
+            item = buffer.get()
+            if item is None:
+                break
+            slot, frame_index, timestamp, frame = item
+            try:
+                yield frame_index, timestamp, frame
+            finally:
+                buffer.release(slot)
+    finally:
+        # If the consumer stopped early, free every queued slot so the decoder can exit
+        stop.set()
+        while item is not None:
+            item = buffer.get()
+            if item is not None:
+                buffer.release(item[0])
+        decoder.join()
+
+    if errors:
+        raise errors[0]
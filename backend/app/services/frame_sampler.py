@@ -0,0 +1,166 @@
+import os
+import subprocess
+import cv2
+
+# How many frames per second of video go to DeepFace (1.0 == every 30th frame of a 30 fps clip)
+VIDEO_SAMPLES_PER_SECOND = float(os.getenv("VIDEO_SAMPLES_PER_SECOND", "1.0"))
+# Analyzed frames per clip (0 disables the budget). Caps clips of known length; for a clip
+# whose length can't be told it only thins sampling (see SampleClock)
+VIDEO_MAX_SAMPLED_FRAMES = int(os.getenv("VIDEO_MAX_SAMPLED_FRAMES", "60"))
+# "grab" skips frames without converting them, "seek" jumps straight to the next sample
+VIDEO_SAMPLER_MODE = os.getenv("VIDEO_SAMPLER_MODE", "grab").lower()
+
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+
+DEFAULT_FPS = 30.0
+
+def get_video_info(cap):
+    """
+    Returns (fps, total_frames, duration_seconds) for an opened capture.
+    Browser WebM recordings often report no frame count, so total_frames and
+    duration may be None.
+    """
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    # MediaRecorder clips can report the container timebase (1000) instead of a real rate
+    if not fps or fps <= 0 or fps > 240:
+        fps = DEFAULT_FPS
+
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total_frames <= 0:
+        return fps, None, None
+    return fps, total_frames, total_frames / fps
+
+def probe_duration(video_path):
+    """
+    Duration of a clip in seconds from ffprobe, or None if it can't be told.
+    MediaRecorder WebM has no duration in its header, so the last video packet's
+    timestamp is used then (demuxing only, nothing is decoded).
+    """
+    try:
+        completed = subprocess.run(
+            [FFPROBE_BINARY, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", video_path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=30
+        )
+        duration = completed.stdout.strip()
+        if duration and duration != "N/A":
+            return float(duration)
+
+        completed = subprocess.run(
+            [FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time",
+             "-of", "csv=p=0", video_path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=30
+        )
+        timestamps = [line.strip().rstrip(",") for line in completed.stdout.splitlines()]
+        timestamps = [float(t) for t in timestamps if t and t != "N/A"]
+        return max(timestamps) if timestamps else None
+    except (OSError, ValueError, subprocess.SubprocessError) as e:
+        print(f"[WARNING] Could not probe the clip duration: {e}")
+        return None
+
+def get_sample_interval(duration, samples_per_second=None, max_frames=None):
+    """
+    Seconds between two sampled frames. Uses the per-second rate, widened when
+    the clip is long enough that the rate would exceed the per-clip budget.
+    """
+    samples_per_second = samples_per_second or VIDEO_SAMPLES_PER_SECOND
+    max_frames = VIDEO_MAX_SAMPLED_FRAMES if max_frames is None else max_frames
+
+    interval = 1.0 / samples_per_second
+    if max_frames and duration:
+        interval = max(interval, duration / max_frames)
+    return interval
+
+class SampleClock:
+    """
+    Decides which timestamps get sampled. With a known duration the interval is
+    fixed and sampling stops at max_frames. With an unknown duration (open_ended)
+    there is no hard stop, so the end of a long answer is still analyzed: each
+    time the budget fills, the interval doubles and another max_frames / 2
+    samples are allowed. Frame count then grows with the log of the duration.
+    """
+
+    def __init__(self, interval, max_frames, open_ended=False):
+        self.interval = interval
+        self.max_frames = max_frames
+        self.open_ended = open_ended
+        self.limit = max_frames
+        self.next_sample_at = 0.0
+        self.sampled = 0
+
+    def due(self, timestamp):
+        return timestamp + 1e-6 >= self.next_sample_at
+
+    def done(self):
+        return bool(self.max_frames) and not self.open_ended and self.sampled >= self.max_frames
+
+    def taken(self, timestamp):
+        """Records a sample at timestamp and schedules the next one."""
+        self.sampled += 1
+        if self.open_ended and self.max_frames and self.sampled >= self.limit:
+            self.interval *= 2
+            self.limit += max(1, self.max_frames // 2)
+        self.next_sample_at += self.interval
+        # Catch up if the stream jumped (variable frame rate recordings)
+        while self.next_sample_at + 1e-6 < timestamp:
+            self.next_sample_at += self.interval
+
+def _frame_timestamp(cap, frame_index, fps):
+    """Position of the frame just grabbed, in seconds (falls back to index/fps if the backend reports 0)."""
+    pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if pos_msec > 0 or frame_index == 0:
+        return pos_msec / 1000.0
+    return frame_index / fps
+
+def _sample_by_grab(cap, clock, fps):
+    """Walks the stream with grab() and only retrieve()s (converts/copies) the frames we keep."""
+    frame_index = -1
+    while not clock.done():
+        if not cap.grab():
+            break
+        frame_index += 1
+        timestamp = _frame_timestamp(cap, frame_index, fps)
+        if not clock.due(timestamp):
+            continue
+
+        ret, frame = cap.retrieve()
+        if not ret:
+            continue
+        yield frame_index, timestamp, frame
+        clock.taken(timestamp)
+
+def _sample_by_seek(cap, interval, max_frames, fps, total_frames):
+    """Seeks directly to each sample position, skipping decode of the frames in between."""
+    sampled = 0
+    target_index = 0
+    while target_index < total_frames:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, target_index)
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield target_index, target_index / fps, frame
+
+        sampled += 1
+        if max_frames and sampled >= max_frames:
+            break
+        target_index += max(1, int(round(interval * fps)))
+
+def sample_frames(cap, samples_per_second=None, max_frames=None, mode=None, video_path=None):
+    """
+    Yields (frame_index, timestamp_seconds, frame) for the frames to analyze,
+    targeting samples_per_second of video and about max_frames per clip.
+    When the capture reports no frame count, the duration of video_path is probed;
+    if it is still unknown, max_frames thins sampling instead of stopping it.
+    Seek mode needs a known frame count and falls back to grab() otherwise.
+    """
+    max_frames = VIDEO_MAX_SAMPLED_FRAMES if max_frames is None else max_frames
+    mode = mode or VIDEO_SAMPLER_MODE
+
+    fps, total_frames, duration = get_video_info(cap)
+    if duration is None and video_path:
+        duration = probe_duration(video_path)
+    interval = get_sample_interval(duration, samples_per_second, max_frames)
+
+    if mode == "seek" and total_frames:
+        yield from _sample_by_seek(cap, interval, max_frames, fps, total_frames)
+    else:
+        yield from _sample_by_grab(cap, SampleClock(interval, max_frames, open_ended=not duration), fps)
@@ -0,0 +1,102 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app.services.emotion_model import warm_up_models, start_model_warm_up, models_ready, model_warm_up_error
+from app.services.deepface_service import analyze_video
+
+# Number of dedicated DeepFace processes (0 keeps inference in the API process)
+VIDEO_INFERENCE_WORKERS = int(os.getenv("VIDEO_INFERENCE_WORKERS", "0"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_ready = threading.Event()
+_pool_error = None
+_backend_started = False
+
+def _init_worker():
+    """Runs once in every inference process: loads and warms the models so they stay resident."""
+    warm_up_models()
+
+def _worker_pid():
+    return os.getpid()
+
+def get_inference_pool():
+    """Returns the shared process pool, creating it on first use. None when the pool is disabled."""
+    global _pool
+    if VIDEO_INFERENCE_WORKERS <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn, not fork: forking a process that already imported TensorFlow can deadlock
+                _pool = ProcessPoolExecutor(
+                    max_workers=VIDEO_INFERENCE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker
+                )
+    return _pool
+
+def start_inference_backend():
+    """
+    Starts whatever will run DeepFace: the process pool when VIDEO_INFERENCE_WORKERS > 0,
+    otherwise the in-process warm-up. Called from the app's startup (app.main.create_app,
+    the ASGI startup event), never at import: spawned workers re-import the main module.
+    Later calls do nothing.
+    """
+    global _backend_started
+    with _pool_lock:
+        if _backend_started:
+            return
+        _backend_started = True
+
+    pool = get_inference_pool()
+    if pool is None:
+        start_model_warm_up()
+        return
+
+    # One task per worker forces every process to spawn (and run _init_worker) now,
+    # because no worker is idle yet when the tasks are submitted
+    futures = [pool.submit(_worker_pid) for _ in range(VIDEO_INFERENCE_WORKERS)]
+    pending = [len(futures)]
+    lock = threading.Lock()
+
+    def _on_done(future):
+        global _pool_error
+        if future.exception() is not None:
+            # e.g. BrokenProcessPool when a worker dies while starting
+            _pool_error = f"{type(future.exception()).__name__}: {future.exception()}"
+            print(f"[ERROR] Inference worker failed to start: {_pool_error}")
+            return
+        with lock:
+            pending[0] -= 1
+            if pending[0] == 0:
+                print(f"[DEBUG] {VIDEO_INFERENCE_WORKERS} inference workers ready")
+                _pool_ready.set()
+
+    for future in futures:
+        future.add_done_callback(_on_done)
+
+def inference_ready():
+    """True once the models are resident wherever DeepFace will run."""
+    if VIDEO_INFERENCE_WORKERS > 0:
+        return _pool_ready.is_set()
+    return models_ready()
+
+def inference_error():
+    """Why the inference backend failed to start (so it will never be ready), or None."""
+    if VIDEO_INFERENCE_WORKERS > 0:
+        return _pool_error
+    return model_warm_up_error()
+
+def submit_video_analysis(video_path):
+    """
+    Submits analyze_video for a local clip to the process pool.
+    Returns a concurrent.futures.Future resolving to (emotions, timeline),
+    or None when the pool is disabled.
+    """
+    pool = get_inference_pool()
+    if pool is None:
+        return None
+    return pool.submit(analyze_video, video_path, True)
@@ -0,0 +1,282 @@
+import os
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from app.services.assembly_ai import analyze_audio, analyze_audio_async, merge_audio_results, EMPTY_AUDIO_RESULT
+from app.services.deepface_service import analyze_video, analyze_video_stream
+from app.services.stream_decoder import ffmpeg_available
+from app.services.audio_extract import audio_track, extract_audio, AUDIO_EXTRACTION
+from app.services.inference_pool import submit_video_analysis
+from app.services.turn_ingest import claim_ingest_session
+from app.services.transcription_jobs import claim_transcription, wait_for_transcription, \
+    wait_for_transcription_async
+from app.services.media_fetch import download_media, download_media_async, release_media, FetchedMedia
+
+# "concurrent" fans audio and video out together, "sequential" keeps the old behaviour
+MEDIA_ANALYSIS_MODE = os.getenv("MEDIA_ANALYSIS_MODE", "concurrent").lower()
+
+# Per-stage timeouts in seconds (0 disables the timeout)
+AUDIO_STAGE_TIMEOUT = float(os.getenv("AUDIO_STAGE_TIMEOUT", "120"))
+VIDEO_STAGE_TIMEOUT = float(os.getenv("VIDEO_STAGE_TIMEOUT", "120"))
+
+# Decode and analyze frames while the clip is still downloading (needs ffmpeg on PATH)
+VIDEO_STREAMING_DECODE = os.getenv("VIDEO_STREAMING_DECODE", "0") == "1"
+
+# Seconds /analyze_turn waits for the final chunk of a turn ingested during recording
+INGEST_FINAL_CHUNK_TIMEOUT = float(os.getenv("INGEST_FINAL_CHUNK_TIMEOUT", "15"))
+
+# Shared across requests so a turn doesn't pay thread start-up cost.
+# The ASGI app also uses it to keep DeepFace off the event loop.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("MEDIA_ANALYSIS_WORKERS", "8")),
+    thread_name_prefix="media-analysis"
+)
+
+def _wait_for_stage(future, started_at, timeout, stage_name, fallback):
+    """
+    Waits for a stage future and returns its result, or the fallback on timeout.
+    The timeout is measured from when the stage was submitted, not from when we start waiting.
+    """
+    remaining = max(0.0, timeout - (time.monotonic() - started_at)) if timeout else None
+    try:
+        return future.result(timeout=remaining)
+    except FutureTimeoutError:
+        # The worker thread keeps running, but the turn no longer waits on it
+        future.cancel()
+        print(f"[WARNING] {stage_name} stage timed out after {timeout}s, using fallback")
+        return fallback
+
+def _submit_video(video_path):
+    """
+    Sends DeepFace to the inference process pool if enabled, otherwise to a local thread.
+    The future resolves to (emotions, timeline).
+    """
+    return submit_video_analysis(video_path) or _executor.submit(analyze_video, video_path, True)
+
+def _transcribe(job, clip_path):
+    """
+    Awaits the transcription job started at upload time, or transcribes the local clip now.
+    Only the clip's extracted audio track is uploaded when extraction works.
+    """
+    if job is not None:
+        return wait_for_transcription(job)
+    with audio_track(clip_path) as audio_path:
+        return analyze_audio(audio_path)
+
+async def _transcribe_async(job, clip_path):
+    """Async counterpart of _transcribe."""
+    if job is not None:
+        return await wait_for_transcription_async(job)
+    audio_path = await asyncio.to_thread(extract_audio, clip_path) if AUDIO_EXTRACTION else None
+    try:
+        return await analyze_audio_async(audio_path or clip_path)
+    finally:
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+
+def _when_all_done(futures, callback):
+    """Calls callback() once every future has finished, whichever finishes last."""
+    pending = [len(futures)]
+    lock = threading.Lock()
+
+    def _on_done(_):
+        with lock:
+            pending[0] -= 1
+            if pending[0] > 0:
+                return
+        callback()
+
+    for future in futures:
+        future.add_done_callback(_on_done)
+
+def _release_when_done(media: FetchedMedia, futures):
+    """Releases the shared clip only after every stage reading it has finished (even timed-out ones)."""
+    _when_all_done(futures, lambda: release_media(media))
+
+def _use_streaming_decode(video_url):
+    return VIDEO_STREAMING_DECODE and not os.path.exists(video_url) and ffmpeg_available()
+
+def _local_media(video_url, job):
+    """
+    The clip already on disk for this turn: the one its transcription job downloaded,
+    or video_url itself when it is a local file. None means it still has to be downloaded.
+    """
+    if job is not None and job.media is not None:
+        return job.media
+    if os.path.exists(video_url):
+        return FetchedMedia(path=video_url, sha256=None, size=os.path.getsize(video_url), is_temporary=False)
+    return None
+
+def _iter_queue(chunk_queue):
+    while True:
+        chunk = chunk_queue.get()
+        if chunk is None:
+            return
+        yield chunk
+
+def _analyze_media_streaming(video_url, job=None):
+    """
+    Decode-while-downloading variant of analyze_media. Every downloaded chunk is
+    written to the shared file (for transcription) and fed to ffmpeg, so sampled
+    frames reach DeepFace while the rest of the clip is still in flight.
+    Runs in-process: the decoder consumes a live byte stream that can't be
+    handed to the inference process pool.
+    """
+    chunk_queue = queue.Queue()
+    download_future = Future()
+
+    # Dedicated thread so pool workers waiting on the download can never starve it
+    def _download():
+        try:
+            download_future.set_result(download_media(video_url, on_chunk=chunk_queue.put))
+        except Exception as e:
+            download_future.set_exception(e)
+        finally:
+            chunk_queue.put(None)
+
+    def _transcribe_download():
+        if job is not None:
+            return wait_for_transcription(job)
+        return _transcribe(None, download_future.result().path)
+
+    def _analyze_video():
+        emotions, timeline = analyze_video_stream(_iter_queue(chunk_queue), include_timeline=True)
+        if emotions:
+            return emotions, timeline
+        # Nothing decoded from the pipe (e.g. an MP4 with its index at the end): use the finished file
+        print("[WARNING] Streaming decode produced no frames, analyzing the downloaded file instead")
+        return analyze_video(download_future.result().path, include_timeline=True)
+
+    def _release():
+        if download_future.exception() is None:
+            release_media(download_future.result())
+
+    started_at = time.monotonic()
+    threading.Thread(target=_download, name="media-download", daemon=True).start()
+    video_future = _executor.submit(_analyze_video)
+    audio_future = _executor.submit(_transcribe_download)
+    _when_all_done([audio_future, video_future], _release)
+
+    assembly_data = _wait_for_stage(audio_future, started_at, AUDIO_STAGE_TIMEOUT, "Audio", dict(EMPTY_AUDIO_RESULT))
+    deepface_data, deepface_timeline = _wait_for_stage(video_future, started_at, VIDEO_STAGE_TIMEOUT, "Video", ({}, None))
+
+    return assembly_data, deepface_data, deepface_timeline
+
+def analyze_media(video_url):
+    """
+    Runs AssemblyAI (audio) and DeepFace (video) analysis for one turn.
+    The clip is downloaded once and both services read the same local file;
+    AssemblyAI receives only its extracted audio track (or the clip's bytes if
+    extraction fails) as an upload instead of fetching the URL again.
+    In concurrent mode both stages start together, so the turn waits for
+    max(audio, video) instead of audio + video.
+
+    @return (assembly_data, deepface_data, deepface_timeline): the first two exactly as
+    analyze_audio/analyze_video return them, plus the per-clip emotion timeline
+    (deepface_service.analyze_frames; it only has frames_used and stop_reason if no face was
+    analyzed), or None if the video stage failed or timed out.
+    Errors raised by analyze_video are re-raised, same as the sequential path.
+    If the clip's transcription was already started (POST /transcription/start),
+    the audio stage just waits for that job instead of transcribing again, and
+    the clip that job downloaded is reused.
+    """
+    job = claim_transcription(video_url)
+    media = _local_media(video_url, job)
+    if MEDIA_ANALYSIS_MODE != "concurrent":
+        media = media or download_media(video_url)
+        try:
+            assembly_data = _transcribe(job, media.path)
+            deepface_data, deepface_timeline = _submit_video(media.path).result()
+            return assembly_data, deepface_data, deepface_timeline
+        finally:
+            release_media(media)
+
+    if media is None and _use_streaming_decode(video_url):
+        return _analyze_media_streaming(video_url, job)
+
+    media = media or download_media(video_url)
+
+    started_at = time.monotonic()
+    audio_future = _executor.submit(_transcribe, job, media.path)
+    video_future = _submit_video(media.path)
+    _release_when_done(media, [audio_future, video_future])
+
+    assembly_data = _wait_for_stage(audio_future, started_at, AUDIO_STAGE_TIMEOUT, "Audio", dict(EMPTY_AUDIO_RESULT))
+    deepface_data, deepface_timeline = _wait_for_stage(video_future, started_at, VIDEO_STAGE_TIMEOUT, "Video", ({}, None))
+
+    return assembly_data, deepface_data, deepface_timeline
+
+def _transcribe_ingested(session):
+    """Joins the segment transcripts of an ingested turn, or transcribes the whole recording if a segment failed."""
+    try:
+        results = [future.result() for future in session.segment_futures]
+    except Exception as e:
+        print(f"[WARNING] Audio segment transcription failed, transcribing the whole recording: {e}")
+        return _transcribe(None, session.path)
+    if results and None not in results:
+        return merge_audio_results(results)
+    print("[WARNING] Audio segment extraction failed, transcribing the whole recording")
+    return _transcribe(None, session.path)
+
+def analyze_ingested_media(ingest_id):
+    """
+    analyze_media for a turn that was uploaded chunk by chunk while recording (turn_ingest).
+    Video frames and all but the last audio segment have been analyzed by the time the
+    final chunk arrives, so only the tail of the recording is left to wait for.
+
+    @return (assembly_data, deepface_data, deepface_timeline) like analyze_media,
+    or None when the turn has no complete ingest session (use analyze_media instead).
+    """
+    session = claim_ingest_session(ingest_id)
+    if session is None:
+        return None
+    if not session.finished.wait(INGEST_FINAL_CHUNK_TIMEOUT):
+        print(f"[WARNING] Final chunk of ingest session {ingest_id} never arrived, using the uploaded clip")
+        session.discard()
+        return None
+
+    started_at = time.monotonic()
+    audio_future = _executor.submit(_transcribe_ingested, session)
+    _when_all_done([audio_future, session.video_future], session.discard)
+
+    assembly_data = _wait_for_stage(audio_future, started_at, AUDIO_STAGE_TIMEOUT, "Audio", dict(EMPTY_AUDIO_RESULT))
+    deepface_data, deepface_timeline = _wait_for_stage(session.video_future, started_at, VIDEO_STAGE_TIMEOUT, "Video", ({}, None))
+
+    return assembly_data, deepface_data, deepface_timeline
+
+async def _wait_for_stage_async(awaitable, timeout, stage_name, fallback):
+    """Async counterpart of _wait_for_stage."""
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout or None)
+    except asyncio.TimeoutError:
+        print(f"[WARNING] {stage_name} stage timed out after {timeout}s, using fallback")
+        return fallback
+
+async def analyze_media_async(video_url):
+    """
+    Async version of analyze_media for the ASGI app. Transcription runs on the
+    event loop, DeepFace runs in the inference pool or the shared executor.
+
+    @return (assembly_data, deepface_data, deepface_timeline)
+    """
+    job = claim_transcription(video_url)
+    media = _local_media(video_url, job)
+    if media is None and _use_streaming_decode(video_url):
+        # The streaming pipeline is thread-based; keep it off the event loop and off _executor
+        return await asyncio.to_thread(_analyze_media_streaming, video_url, job)
+
+    media = media or await download_media_async(video_url)
+
+    audio_task = asyncio.ensure_future(_transcribe_async(job, media.path))
+    video_future = _submit_video(media.path)
+    _release_when_done(media, [audio_task, video_future])
+
+    # Both stages started together, so measuring each timeout from here matches the sync path
+    assembly_data, (deepface_data, deepface_timeline) = await asyncio.gather(
+        _wait_for_stage_async(audio_task, AUDIO_STAGE_TIMEOUT, "Audio", dict(EMPTY_AUDIO_RESULT)),
+        _wait_for_stage_async(asyncio.wrap_future(video_future), VIDEO_STAGE_TIMEOUT, "Video", ({}, None))
+    )
+    return assembly_data, deepface_data, deepface_timeline
@@ -0,0 +1,136 @@
+import os
+import asyncio
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse, unquote
+
+import httpx
+import requests
+
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "capstone_media")
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Files are named after their content hash, so two turns that upload the same
+# clip share one file. Refcounts decide when the last user can delete it.
+_refcounts = {}
+_refcounts_lock = threading.Lock()
+
+class FetchedMedia(NamedTuple):
+    path: str
+    sha256: Optional[str]
+    size: int
+    is_temporary: bool
+
+def _guess_suffix(video_url: str) -> str:
+    """Keeps the original container extension (.webm/.mp4) so decoders can sniff the format."""
+    suffix = os.path.splitext(unquote(urlparse(video_url).path))[1].lower()
+    return suffix if suffix in (".webm", ".mp4", ".mov", ".mkv", ".m4a", ".wav") else ".mp4"
+
+def download_media(video_url: str, on_chunk=None) -> FetchedMedia:
+    """
+    Downloads a remote clip once, hashing it while streaming, and stores it
+    under MEDIA_CACHE_DIR/<sha256><ext>. Call release_media() when done.
+    on_chunk, if given, receives every chunk as it arrives (for decode-while-downloading).
+    """
+    os.makedirs(MEDIA_CACHE_DIR, exist_ok=True)
+    try:
+        response = requests.get(video_url, stream=True, timeout=30)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise RuntimeError(f"Failed to download video: {e}")
+
+    hasher = hashlib.sha256()
+    size = 0
+    temp_file = tempfile.NamedTemporaryFile(delete=False, dir=MEDIA_CACHE_DIR, suffix=".part")
+    try:
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+            temp_file.write(chunk)
+            size += len(chunk)
+            if on_chunk:
+                on_chunk(chunk)
+    except Exception as e:
+        # Don't leave a partial download behind in MEDIA_CACHE_DIR
+        temp_file.close()
+        os.remove(temp_file.name)
+        if isinstance(e, requests.RequestException):
+            raise RuntimeError(f"Failed to download video: {e}") from e
+        raise
+    finally:
+        temp_file.close()
+
+    return _store_download(temp_file.name, hasher.hexdigest(), size, video_url)
+
+async def download_media_async(video_url: str) -> FetchedMedia:
+    """Async version of download_media for the ASGI app. Call release_media() when done."""
+    os.makedirs(MEDIA_CACHE_DIR, exist_ok=True)
+    hasher = hashlib.sha256()
+    size = 0
+    temp_file = tempfile.NamedTemporaryFile(delete=False, dir=MEDIA_CACHE_DIR, suffix=".part")
+    try:
+        async with httpx.AsyncClient(timeout=30, follow_redirects=True) as http:
+            async with http.stream("GET", video_url) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    hasher.update(chunk)
+                    # Disk writes run on a worker thread so they never stall the event loop
+                    await asyncio.to_thread(temp_file.write, chunk)
+                    size += len(chunk)
+    except BaseException as e:
+        # Also on cancellation: don't leave a partial download behind in MEDIA_CACHE_DIR
+        temp_file.close()
+        os.remove(temp_file.name)
+        if isinstance(e, httpx.HTTPError):
+            raise RuntimeError(f"Failed to download video: {e}") from e
+        raise
+    finally:
+        temp_file.close()
+
+    return _store_download(temp_file.name, hasher.hexdigest(), size, video_url)
+
+def _store_download(temp_path: str, sha256: str, size: int, video_url: str) -> FetchedMedia:
+    """Moves a finished download to its content-addressed path and takes a reference on it."""
+    path = os.path.join(MEDIA_CACHE_DIR, sha256 + _guess_suffix(video_url))
+
+    with _refcounts_lock:
+        if os.path.exists(path):
+            # Same content is already on disk for another turn
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+        _refcounts[path] = _refcounts.get(path, 0) + 1
+
+    return FetchedMedia(path=path, sha256=sha256, size=size, is_temporary=True)
+
+def release_media(media: FetchedMedia):
+    """Drops one reference to a downloaded clip and deletes it once nobody uses it."""
+    if not media.is_temporary:
+        return
+
+    with _refcounts_lock:
+        remaining = _refcounts.get(media.path, 1) - 1
+        if remaining > 0:
+            _refcounts[media.path] = remaining
+            return
+        _refcounts.pop(media.path, None)
+        if os.path.exists(media.path):
+            os.remove(media.path)
+
+@contextmanager
+def fetched_media(video_url: str):
+    """
+    Yields a FetchedMedia for the clip, downloading it only if it isn't already a local file.
+    Both the transcription and the DeepFace stage should read from media.path.
+    """
+    if os.path.exists(video_url):
+        yield FetchedMedia(path=video_url, sha256=None, size=os.path.getsize(video_url), is_temporary=False)
+        return
+
+    media = download_media(video_url)
+    try:
+        yield media
+    finally:
+        release_media(media)
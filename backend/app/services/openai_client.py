@@ -1,49 +1,109 @@
 import os
-from openai import OpenAI
+import time
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI, AsyncOpenAI
 from app.utils.open_ai_prompt_3a import OPENAI_PROMPT_3A
 from app.utils.open_ai_prompt_3b import GET_QS_SCORE
+from app.utils.open_ai_prompt_3a_3b import OPENAI_PROMPT_3A_3B
 from app.utils.free_talk_prompt import OPENAI_PROMPT_FREE_TALK
+from app.utils.questionnaire_handler import QUESTIONNAIRE_DEFINITIONS
+from app.utils.json_stream import JsonStringFieldStreamer, JsonLiteralFieldReader
+from app.utils.context_budget import fit_summary
+from app.utils.llm_schemas import ReplyOutput, CombinedReplyOutput, FreeTalkReplyOutput, ScoreOutput, \
+    response_format
 from dotenv import load_dotenv
-import re
-import json
-from json_repair import repair_json
+from pydantic import ValidationError
 
 load_dotenv()
 
-# Initialize OpenAI client
+# Initialize OpenAI clients (sync for Flask, async for the ASGI app)
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-def update_rolling_info_and_get_reply(
+async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Step 3a (reply) and step 3b (score) models
+REPLY_MODEL = "gpt-4o"
+SCORE_MODEL = "gpt-4o-mini"
+
+# Runs 3b calls started before 3a has returned (speculative scoring in app.main)
+_score_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SCORE_WORKERS", "8")),
+    thread_name_prefix="question-score"
+)
+
+# Output formats. They close the system prompts, so everything before the turn's own
+# data is byte-identical across turns and sessions and OpenAI can serve it from its
+# prompt cache (prefixes of 1024+ tokens). Volatile data goes last, in the user message.
+FREE_TALK_JSON_FORMAT = """
+Return JSON in this format:
+{
+    "is_emergency": boolean,
+    "trigger_word": string,
+    "bot_reply": "...",
+    "updated_summary": "..."
+}
+"""
+
+REPLY_JSON_FORMAT = """
+Return JSON in this format:
+{
+    "is_emergency": boolean,
+    "trigger_word": string,
+    "bot_reply": "...",
+    "updated_summary": "...",
+    "needs_followup": boolean,
+    "updated_user_answers": [
+        {
+            "question_id": "...",
+            "question": "...",
+            "evidence": "...",
+            "answer": "...",
+            "contradictory": false
+        }
+    ],
+    "contradictions": {
+        "contradictory": boolean,
+        "contradicting_question_ids": ["..."],
+        "reason": "..."
+    }
+}
+"""
+
+COMBINED_JSON_FORMAT = REPLY_JSON_FORMAT.replace(
+    '    }\n}\n',
+    '    },\n    "is_question_answered": boolean,\n    "score": int or null\n}\n'
+)
+
+SCORE_JSON_FORMAT = """
+Return JSON: {"is_question_answered": boolean, "score": int or null}
+"""
+
+# Static, so it belongs to the cached prefix. Without it the 3a system prompt stays under
+# the 1024 tokens OpenAI needs before it caches anything (tests/test_prompt_prefix.py).
+_QUESTIONNAIRE_SECTION = f"""
+=== QUESTIONNAIRES (question ids and texts) ===
+{QUESTIONNAIRE_DEFINITIONS}
+"""
+
+# Step 3a system prompts by mode, built once
+_REPLY_SYSTEM_PROMPTS = {
+    "resumed": OPENAI_PROMPT_FREE_TALK + FREE_TALK_JSON_FORMAT,
+    "active": OPENAI_PROMPT_3A + REPLY_JSON_FORMAT + _QUESTIONNAIRE_SECTION,
+    "active_with_score": OPENAI_PROMPT_3A_3B + COMBINED_JSON_FORMAT + _QUESTIONNAIRE_SECTION
+}
+
+def _build_reply_messages(
         assembly_data, deepface_data, rolling_summary, user_answers,
-        score_range, current_qid, current_question, next_question, 
-        previous_bot_reply=None, session_status="active"):
+        score_range, current_qid, current_question, next_question,
+        previous_bot_reply=None, session_status="active", include_score=False, summary_notes=None):
     """
-    @return
-    {
-        "bot_reply": "...",
-        "updated_summary": "...",
-        "updated_user_answers": [
-            {
-                "question_id": "...",
-                "answer": "...",
-                "contradictory": false
-            },
-        ],
-        "contradictions": {
-            "contradicting_question_ids": ["..."],
-            "reason": "..."
-        },
-        "is_emergency": boolean,
-        "trigger_word": string
-    }
+    Builds the chat messages for step 3a: the static system prompt first, the turn's data last.
+    include_score (active sessions only) asks for the step 3b score in the same completion.
+    summary_notes are the older rolling summary sentences (context_budget.summary_notes).
     """
-
-    print(f"[DEBUG] SESSION STATUS RECEIVED: '{session_status}'")
-    
     user_transcript = assembly_data.get("transcript", "")
     sentiment = assembly_data.get("sentiment", "")
     sentiment_confidence = assembly_data.get("sentiment_confidence", "")
-    
+
     # Handle deepface_data safely
     if isinstance(deepface_data, dict):
         emotions = deepface_data
@@ -51,179 +111,87 @@ def update_rolling_info_and_get_reply(
     else:
         dominant_emotion = "neutral"
 
+    current_message = f"""
+=== CURRENT USER MESSAGE ===
+User just said: "{user_transcript}"
+
+Audio: {sentiment} ({sentiment_confidence} confidence)
+Video: {dominant_emotion}
+"""
+
+    # Only there once the summary outgrew its token budget
+    notes_section = f"""
+EARLIER SUMMARY NOTES (older rolling summary sentences, shortened, by question):
+{summary_notes}
+""" if summary_notes else ""
+
     # Build task instructions based on mode
     if session_status == "resumed":
-        main_prompt = OPENAI_PROMPT_FREE_TALK
-        message = f"""
-            === CURRENT USER MESSAGE ===
-            User just said: "{user_transcript}"
-
-            Audio: {sentiment} ({sentiment_confidence} confidence)
-            Video: {dominant_emotion}
-
-            CURRENT ROLLING SUMMARY:
-            {rolling_summary}
-
-            Return JSON in this format:
-            {{
-                "updated_summary": "...",
-                "bot_reply": "...",
-                "is_emergency": boolean,
-                "trigger_word": string
-            }}
-        """
+        main_prompt = _REPLY_SYSTEM_PROMPTS["resumed"]
+        message = f"""{notes_section}
+CURRENT ROLLING SUMMARY:
+{rolling_summary}
+{current_message}"""
     else: # active
-        main_prompt = OPENAI_PROMPT_3A
+        main_prompt = _REPLY_SYSTEM_PROMPTS["active_with_score" if include_score else "active"]
+        # Slowest-changing first: the question stays the same across follow-up turns
         message = f"""
-            === CURRENT USER MESSAGE ===
-            User just said: "{user_transcript}"
-
-            Audio: {sentiment} ({sentiment_confidence} confidence)
-            Video: {dominant_emotion}
-
-            CURRENT ROLLING SUMMARY:
-            {rolling_summary}
-
-            USER ANSWERS SO FAR:
-            {user_answers}
-
-            CURRENT QUESTION ID:
-            {current_qid}
-
-            CURRENT QUESTION BEING ASKED:
-            {current_question}
-
-            METRICS TO SCORE USER'S ANSWER:
-            {score_range}
-
-            NEXT QUESTION TO BE ASKED:
-            {next_question}
-
-            Return JSON in this format:
-            {{
-                "bot_reply": "...",
-                "updated_summary": "...",
-                "needs_followup": boolean,
-                "updated_user_answers": [
-                    {{
-                        "question_id": "...",
-                        "question": "...",
-                        "evidence": "...",
-                        "answer": "...",
-                        "contradictory": false
-                    }}
-                ],
-                "contradictions": {{
-                    "contradicting_question_ids": ["..."],
-                    "reason": "..."
-                }},
-                "is_emergency": boolean,
-                "trigger_word": string
-            }}
-            """
+CURRENT QUESTION ID:
+{current_qid}
 
-    try:
-        print(f"[DEBUG] Calling OpenAI with transcript: {user_transcript[:100]}...")
-        
-        # Build message history with Assistant role for short-term memory
-        messages = [{"role": "system", "content": main_prompt}]
-        
-        if previous_bot_reply:
-            messages.append({"role": "assistant", "content": previous_bot_reply})
-            
-        messages.append({"role": "user", "content": message})
+CURRENT QUESTION BEING ASKED:
+{current_question}
 
-        # TODO: determine right temperature for 3a + remove max_tokens?
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            temperature=0.2,
-            messages=messages
-        )
+METRICS TO SCORE USER'S ANSWER:
+{score_range}
 
-        # CLEAN DATA
-        raw = response.choices[0].message.content.strip()
-        print("\n" + "."*80)
-        print("[DEBUG] FULL RAW RESPONSE FOR 3A:")
-        print(raw)
-        print("."*80 + "\n")
-
-        # Remove markdown code blocks if present
-        cleaned = raw
-        if "```json" in raw or "```" in raw:
-            print("[DEBUG] Removing markdown code blocks...")
-            cleaned = re.sub(r'```json\s*', '', raw)
-            cleaned = re.sub(r'```\s*', '', cleaned)
-            cleaned = cleaned.strip()
-
-        # Try to extract JSON
-        match = re.search(r'\{[\s\S]*\}', cleaned)
-
-        if match:
-            json_str = match.group(0)
-            print(f"[DEBUG] Extracted JSON length: {len(json_str)} chars")
-            
-            try:
-                parsed = json.loads(json_str)
-                print("[DEBUG] JSON parsed successfully")
-                
-                # Validate structure
-                if not parsed.get("is_emergency"):
-                    print("[WARNING] Missing is_emergency field")
-                    parsed["is_emergency"] = False
-
-                if not parsed.get("trigger_word"):
-                    print("[WARNING] Missing trigger_word field")
-                    parsed["trigger_word"] = ""
-
-                if not parsed.get("bot_reply"):
-                    print("[WARNING] Missing bot_reply field")
-                    if session_status == "resumed":
-                        parsed["bot_reply"] = "I'm here to listen. What's on your mind?"
-                    else:
-                        parsed["bot_reply"] = "Can you tell me more about how you've been feeling?"
-
-                if not parsed.get("updated_summary"):
-                    print("[WARNING] Missing updated summary, appending transcript as backup")
-                    parsed["updated_summary"] = user_transcript
-                
-                if session_status != "resumed":
-                    if not parsed.get("updated_user_answers"):
-                        print("[WARNING] Missing updated user answers, skipping for now")
-                        parsed["updated_user_answers"] = None
-                    
-                    if not parsed.get("contradictions"):
-                        print("[WARNING] Missing contradictions, skipping for now")
-                        parsed["contradictions"] = None
-
-                    if parsed.get("needs_followup") is None:
-                        parsed["needs_followup"] = False
-
-                return parsed
-                
-            except json.JSONDecodeError as e:
-                print(f"[DEBUG] JSON parse failed: {e}")
-                print(f"[DEBUG] Attempting json_repair...")
-                
-                try:
-                    repaired = repair_json(json_str)
-                    parsed = json.loads(repaired)
-                    print("[DEBUG] JSON repaired successfully")
-
-                    return parsed
-
-                except Exception as repair_error:
-                    print(f"[DEBUG] Repair failed: {repair_error}")
-        else:
-            print("[DEBUG] NO JSON found in response")
-        
-        # Fallback based on mode
-        print("[WARNING] Using fallback response")
+NEXT QUESTION TO BE ASKED:
+{next_question}
+
+USER ANSWERS SO FAR:
+{user_answers}
+{notes_section}
+CURRENT ROLLING SUMMARY:
+{rolling_summary}
+{current_message}"""
+
+    # Build message history with Assistant role for short-term memory
+    messages = [{"role": "system", "content": main_prompt}]
+
+    if previous_bot_reply:
+        messages.append({"role": "assistant", "content": previous_bot_reply})
+
+    messages.append({"role": "user", "content": message})
+    return messages
+
+def _reply_schema(session_status="active", include_score=False):
+    """Pydantic model the 3a completion has to follow."""
+    if session_status == "resumed":
+        return FreeTalkReplyOutput
+    return CombinedReplyOutput if include_score else ReplyOutput
+
+def _parse_reply_output(raw, user_transcript, session_status="active", include_score=False):
+    """
+    Validates the 3a completion against its schema. Structured outputs make a
+    mismatch rare (a refusal or a reply cut off at the token limit); it falls
+    back to a canned reply.
+    """
+    print("\n" + "."*80)
+    print("[DEBUG] FULL RAW RESPONSE FOR 3A:")
+    print(raw)
+    print("."*80 + "\n")
+
+    try:
+        parsed = _reply_schema(session_status, include_score).model_validate_json(raw).model_dump()
+    except ValidationError as e:
+        print(f"[WARNING] 3A response does not match its schema, using fallback response: {e}")
         if session_status == "resumed":
             return {
                 "bot_reply": "I'm here to listen. What would you like to talk about?",
                 "updated_summary": None,
                 "updated_user_answers": None,
                 "contradictions": {
+                    "contradictory": False,
                     "contradicting_question_ids": [],
                     "reason": ""
                 },
@@ -236,139 +204,403 @@ def update_rolling_info_and_get_reply(
                 "updated_summary": None,
                 "updated_user_answers": None,
                 "contradictions": {
+                    "contradictory": False,
                     "contradicting_question_ids": [],
                     "reason": ""
                 },
                 "is_emergency": False,
                 "trigger_word": ""
             }
-        
-    except Exception as e:
-        print(f"[ERROR] OpenAI API exception: {e}")
-        
+
+    # The schema guarantees the fields, not that the text fields are filled in
+    if not parsed["bot_reply"].strip():
+        print("[WARNING] Empty bot_reply field")
         if session_status == "resumed":
-            return {
-                "bot_reply": "I'm here for you. What's been on your mind?",
-                "updated_summary": None,
-                "updated_user_answers": None,
-                "contradictions": {
-                    "contradicting_question_ids": [],
-                    "reason": ""
-                },
-                "is_emergency": False,
-                "trigger_word": ""
-            }
+            parsed["bot_reply"] = "I'm here to listen. What's on your mind?"
         else:
-            return {
-                "bot_reply": "What about your energy levels?",
-                "updated_summary": None,
-                "updated_user_answers": None,
-                "contradictions": {
-                    "contradicting_question_ids": [],
-                    "reason": ""
-                },
-                "is_emergency": False,
-                "trigger_word": ""
-            }
-def get_current_question_score(transcript, rolling_summary, current_question, score_range):
+            parsed["bot_reply"] = "Can you tell me more about how you've been feeling?"
+
+    if not parsed["updated_summary"].strip():
+        print("[WARNING] Empty updated summary, appending transcript as backup")
+        parsed["updated_summary"] = user_transcript
+
+    return parsed
+
+def _reply_error_fallback(session_status="active"):
+    """Reply returned when the OpenAI call itself fails."""
+    if session_status == "resumed":
+        return {
+            "bot_reply": "I'm here for you. What's been on your mind?",
+            "updated_summary": None,
+            "updated_user_answers": None,
+            "contradictions": {
+                "contradictory": False,
+                "contradicting_question_ids": [],
+                "reason": ""
+            },
+            "is_emergency": False,
+            "trigger_word": ""
+        }
+    else:
+        return {
+            "bot_reply": "What about your energy levels?",
+            "updated_summary": None,
+            "updated_user_answers": None,
+            "contradictions": {
+                "contradictory": False,
+                "contradicting_question_ids": [],
+                "reason": ""
+            },
+            "is_emergency": False,
+            "trigger_word": ""
+        }
+
+def update_rolling_info_and_get_reply(
+        assembly_data, deepface_data, rolling_summary, user_answers,
+        score_range, current_qid, current_question, next_question,
+        previous_bot_reply=None, session_status="active", include_score=False, summary_notes=None, usage=None):
     """
+    include_score: combined mode, the output also carries "score" and
+    "is_question_answered" (split off with pop_combined_score)
+    summary_notes: older rolling summary sentences the rolling_summary no longer holds
+    usage: TurnUsage ledger the call's tokens and latency are recorded in (stage "3a")
+
     @return
     {
-        "score": ...,
-        "is_question_answered": True/False
+        "bot_reply": "...",
+        "updated_summary": "...",
+        "updated_user_answers": [
+            {
+                "question_id": "...",
+                "answer": "...",
+                "contradictory": false
+            },
+        ],
+        "contradictions": {
+            "contradictory": boolean,
+            "contradicting_question_ids": ["..."],
+            "reason": "..."
+        },
+        "is_emergency": boolean,
+        "trigger_word": string
     }
     """
 
+    print(f"[DEBUG] SESSION STATUS RECEIVED: '{session_status}'")
+    user_transcript = assembly_data.get("transcript", "")
+
     try:
-        message = f"""
-            QUESTION:
-            {current_question}
+        print(f"[DEBUG] Calling OpenAI with transcript: {user_transcript[:100]}...")
+        messages = _build_reply_messages(
+            assembly_data, deepface_data, rolling_summary, user_answers,
+            score_range, current_qid, current_question, next_question,
+            previous_bot_reply=previous_bot_reply, session_status=session_status,
+            include_score=include_score, summary_notes=summary_notes)
 
-            USER RESPONSE:
-            {transcript}
+        # TODO: determine right temperature for 3a + remove max_tokens?
+        started_at = time.perf_counter()
+        response = client.chat.completions.create(
+            model=REPLY_MODEL,
+            temperature=0.2,
+            messages=messages,
+            response_format=response_format(_reply_schema(session_status, include_score))
+        )
+        if usage is not None:
+            usage.record("3a", REPLY_MODEL, response.usage, time.perf_counter() - started_at)
+
+        # A refusal comes back without content; it fails validation like any other mismatch
+        raw = response.choices[0].message.content or ""
+        return _parse_reply_output(raw, user_transcript, session_status, include_score)
+
+    except Exception as e:
+        print(f"[ERROR] OpenAI API exception: {e}")
+        return _reply_error_fallback(session_status)
 
-            CONTEXT ON USER'S CONVERSATION SO FAR:
-            {rolling_summary}
+async def update_rolling_info_and_get_reply_async(
+        assembly_data, deepface_data, rolling_summary, user_answers,
+        score_range, current_qid, current_question, next_question,
+        previous_bot_reply=None, session_status="active", include_score=False, summary_notes=None, usage=None):
+    """Async version of update_rolling_info_and_get_reply for the ASGI app. Same return shape."""
 
-            SCORE RANGE:
-            {score_range}
+    print(f"[DEBUG] SESSION STATUS RECEIVED: '{session_status}'")
+    user_transcript = assembly_data.get("transcript", "")
 
-            
-            Return JSON: {{"is_question_answered": boolean, "score": int or null}}
-        """
-        
+    try:
+        print(f"[DEBUG] Calling OpenAI with transcript: {user_transcript[:100]}...")
+        messages = _build_reply_messages(
+            assembly_data, deepface_data, rolling_summary, user_answers,
+            score_range, current_qid, current_question, next_question,
+            previous_bot_reply=previous_bot_reply, session_status=session_status,
+            include_score=include_score, summary_notes=summary_notes)
+
+        started_at = time.perf_counter()
+        response = await async_client.chat.completions.create(
+            model=REPLY_MODEL,
+            temperature=0.2,
+            messages=messages,
+            response_format=response_format(_reply_schema(session_status, include_score))
+        )
+        if usage is not None:
+            usage.record("3a", REPLY_MODEL, response.usage, time.perf_counter() - started_at)
+
+        raw = response.choices[0].message.content or ""
+        return _parse_reply_output(raw, user_transcript, session_status, include_score)
+
+    except Exception as e:
+        print(f"[ERROR] OpenAI API exception: {e}")
+        return _reply_error_fallback(session_status)
+
+class _CrisisSafeReplyStreamer:
+    """
+    Decodes the streamed bot_reply, but only hands it out once the output has said
+    "is_emergency": false (the schemas put it before bot_reply). A reply to a turn
+    flagged as an emergency, or one whose flag never arrives, is never streamed:
+    the client only gets the final payload, where the guardrails apply.
+    """
+
+    def __init__(self):
+        self.reply = JsonStringFieldStreamer("bot_reply")
+        self.emergency = JsonLiteralFieldReader("is_emergency")
+        self.held = []
+
+    def feed(self, delta):
+        text = self.reply.feed(delta)
+        self.emergency.feed(delta)
+        if not self.emergency.done or self.emergency.value is not False:
+            if text:
+                self.held.append(text)
+            return ""
+        text = "".join(self.held) + text
+        self.held = []
+        return text
+
+def stream_rolling_info_and_get_reply(
+        assembly_data, deepface_data, rolling_summary, user_answers,
+        score_range, current_qid, current_question, next_question,
+        previous_bot_reply=None, session_status="active", include_score=False, summary_notes=None, usage=None):
+    """
+    Streaming version of update_rolling_info_and_get_reply.
+    Yields ("bot_reply", text) pieces while gpt-4o is still writing the bot_reply field
+    (none when the turn is flagged as an emergency), then exactly one ("result", output)
+    with the dict update_rolling_info_and_get_reply returns.
+    The result is authoritative: fallbacks and guardrails may replace the streamed text.
+    """
+
+    print(f"[DEBUG] SESSION STATUS RECEIVED: '{session_status}'")
+    user_transcript = assembly_data.get("transcript", "")
+    reply_streamer = _CrisisSafeReplyStreamer()
+    parts = []
+    stream_usage = None
+
+    try:
+        print(f"[DEBUG] Calling OpenAI (streaming) with transcript: {user_transcript[:100]}...")
+        messages = _build_reply_messages(
+            assembly_data, deepface_data, rolling_summary, user_answers,
+            score_range, current_qid, current_question, next_question,
+            previous_bot_reply=previous_bot_reply, session_status=session_status,
+            include_score=include_score, summary_notes=summary_notes)
+
+        started_at = time.perf_counter()
+        stream = client.chat.completions.create(
+            model=REPLY_MODEL,
+            temperature=0.2,
+            messages=messages,
+            response_format=response_format(_reply_schema(session_status, include_score)),
+            stream=True,
+            # The last chunk carries the usage of the whole completion (and no choices)
+            stream_options={"include_usage": True}
+        )
+        for chunk in stream:
+            if chunk.usage is not None:
+                stream_usage = chunk.usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            parts.append(delta)
+            text = reply_streamer.feed(delta)
+            if text:
+                yield "bot_reply", text
+        if usage is not None:
+            usage.record("3a", REPLY_MODEL, stream_usage, time.perf_counter() - started_at,
+                         messages=messages, output="".join(parts))
+
+    except Exception as e:
+        print(f"[ERROR] OpenAI API exception: {e}")
+        yield "result", _reply_error_fallback(session_status)
+        return
+
+    yield "result", _parse_reply_output("".join(parts), user_transcript, session_status, include_score)
+
+async def stream_rolling_info_and_get_reply_async(
+        assembly_data, deepface_data, rolling_summary, user_answers,
+        score_range, current_qid, current_question, next_question,
+        previous_bot_reply=None, session_status="active", include_score=False, summary_notes=None, usage=None):
+    """Async version of stream_rolling_info_and_get_reply for the ASGI app. Same events."""
+
+    print(f"[DEBUG] SESSION STATUS RECEIVED: '{session_status}'")
+    user_transcript = assembly_data.get("transcript", "")
+    reply_streamer = _CrisisSafeReplyStreamer()
+    parts = []
+    stream_usage = None
+
+    try:
+        print(f"[DEBUG] Calling OpenAI (streaming) with transcript: {user_transcript[:100]}...")
+        messages = _build_reply_messages(
+            assembly_data, deepface_data, rolling_summary, user_answers,
+            score_range, current_qid, current_question, next_question,
+            previous_bot_reply=previous_bot_reply, session_status=session_status,
+            include_score=include_score, summary_notes=summary_notes)
+
+        started_at = time.perf_counter()
+        stream = await async_client.chat.completions.create(
+            model=REPLY_MODEL,
+            temperature=0.2,
+            messages=messages,
+            response_format=response_format(_reply_schema(session_status, include_score)),
+            stream=True,
+            # The last chunk carries the usage of the whole completion (and no choices)
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            if chunk.usage is not None:
+                stream_usage = chunk.usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            parts.append(delta)
+            text = reply_streamer.feed(delta)
+            if text:
+                yield "bot_reply", text
+        if usage is not None:
+            usage.record("3a", REPLY_MODEL, stream_usage, time.perf_counter() - started_at,
+                         messages=messages, output="".join(parts))
+
+    except Exception as e:
+        print(f"[ERROR] OpenAI API exception: {e}")
+        yield "result", _reply_error_fallback(session_status)
+        return
+
+    yield "result", _parse_reply_output("".join(parts), user_transcript, session_status, include_score)
+
+def _build_score_messages(transcript, rolling_summary, current_question, score_range, summary_budget=None):
+    """
+    Builds the chat messages for step 3b, the user's response last.
+    summary_budget overrides SUMMARY_TOKEN_BUDGET (0 = no limit).
+    """
+    message = f"""
+QUESTION:
+{current_question}
+
+SCORE RANGE:
+{score_range}
+
+CONTEXT ON USER'S CONVERSATION SO FAR:
+{fit_summary(rolling_summary, summary_budget)}
+
+USER RESPONSE:
+{transcript}
+"""
+    return [
+        {"role": "system", "content": GET_QS_SCORE + SCORE_JSON_FORMAT},
+        {"role": "user", "content": message}
+    ]
+
+def _parse_score_output(raw):
+    """Validates the 3b completion against ScoreOutput, falling back to an unanswered score on a mismatch."""
+    print("\n" + "="*80)
+    print("[DEBUG] FULL RAW RESPONSE FOR 3B:")
+    print(raw)
+    print("="*80 + "\n")
+
+    try:
+        parsed = ScoreOutput.model_validate_json(raw).model_dump()
+    except ValidationError as e:
+        print(f"[WARNING] 3B response does not match its schema, using fallback response: {e}")
+        return {
+            "score": 0,
+            "is_question_answered": False
+        }
+
+    if parsed["score"] is None:
+        parsed["score"] = 0
+    return parsed
+
+def pop_combined_score(model_output):
+    """
+    Splits the combined-mode score fields off a 3a output, in the shape
+    get_current_question_score returns. None if the output carries no score
+    (two-call mode, or a fallback reply), so the caller can score separately.
+    """
+    if "score" not in model_output and "is_question_answered" not in model_output:
+        return None
+    score = model_output.pop("score", None)
+    is_question_answered = model_output.pop("is_question_answered", None)
+    if not is_question_answered:
+        return {"score": 0, "is_question_answered": False}
+    if score is None:
+        print("[WARNING] Combined reply answered the question without a score, scoring separately")
+        return None
+    return {"score": score, "is_question_answered": True}
+
+def get_current_question_score(transcript, rolling_summary, current_question, score_range, usage=None):
+    """
+    usage: TurnUsage ledger the call's tokens and latency are recorded in (stage "3b")
+
+    @return
+    {
+        "score": ...,
+        "is_question_answered": True/False
+    }
+    """
+
+    try:
         # TODO: determine right temperature for 3b + remove max_tokens?
+        started_at = time.perf_counter()
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=SCORE_MODEL,
             temperature=0.0,
-            messages=[
-                {"role": "system", "content": GET_QS_SCORE},
-                {"role": "user", "content": message}
-            ]
+            messages=_build_score_messages(transcript, rolling_summary, current_question, score_range),
+            response_format=response_format(ScoreOutput)
         )
+        if usage is not None:
+            usage.record("3b", SCORE_MODEL, response.usage, time.perf_counter() - started_at)
+
+        raw = response.choices[0].message.content or ""
+        return _parse_score_output(raw)
+
+    except Exception as e:
+        print(f"[ERROR] OpenAI API exception: {e}")
 
-        # CLEAN DATA
-        raw = response.choices[0].message.content.strip()
-        print("\n" + "="*80)
-        print("[DEBUG] FULL RAW RESPONSE FOR 3B:")
-        print(raw)
-        print("="*80 + "\n")
-
-        # Remove markdown code blocks if present
-        cleaned = raw
-        if "```json" in raw or "```" in raw:
-            print("[DEBUG] Removing markdown code blocks...")
-            cleaned = re.sub(r'```json\s*', '', raw)
-            cleaned = re.sub(r'```\s*', '', cleaned)
-            cleaned = cleaned.strip()
-
-        # Try to extract JSON
-        match = re.search(r'\{[\s\S]*\}', cleaned)
-
-        if match:
-            json_str = match.group(0)
-            print(f"[DEBUG] Extracted JSON length: {len(json_str)} chars")
-            
-            try:
-                parsed = json.loads(json_str)
-                print("[DEBUG] JSON parsed successfully")
-                
-                # Validate structure
-                if not parsed.get("score"):
-                    print("[WARNING] Missing score field")
-                    parsed["score"] = 0
-
-                if not parsed.get("is_question_answered"):
-                    print("[WARNING] Missing is_question_answered field")
-                    parsed["is_question_answered"] = False
-
-                return parsed
-                
-            except json.JSONDecodeError as e:
-                print(f"[DEBUG] JSON parse failed: {e}")
-                print(f"[DEBUG] Attempting json_repair...")
-                
-                try:
-                    repaired = repair_json(json_str)
-                    parsed = json.loads(repaired)
-                    print("[DEBUG] JSON repaired successfully")
-                    
-                    return parsed
-                except Exception as repair_error:
-                    print(f"[DEBUG] Repair failed: {repair_error}")
-        else:
-            print("[DEBUG] NO JSON found in response")
-        
-        # Fallback based on mode
-        print("[WARNING] Using fallback response")
         return {
             "score": 0,
             "is_question_answered": False
         }
-        
+
+def submit_question_score(transcript, rolling_summary, current_question, score_range, usage=None):
+    """Starts get_current_question_score on a worker thread and returns its Future."""
+    return _score_executor.submit(
+        get_current_question_score, transcript, rolling_summary, current_question, score_range, usage)
+
+async def get_current_question_score_async(transcript, rolling_summary, current_question, score_range, usage=None):
+    """Async version of get_current_question_score for the ASGI app. Same return shape."""
+
+    try:
+        started_at = time.perf_counter()
+        response = await async_client.chat.completions.create(
+            model=SCORE_MODEL,
+            temperature=0.0,
+            messages=_build_score_messages(transcript, rolling_summary, current_question, score_range),
+            response_format=response_format(ScoreOutput)
+        )
+        if usage is not None:
+            usage.record("3b", SCORE_MODEL, response.usage, time.perf_counter() - started_at)
+
+        raw = response.choices[0].message.content or ""
+        return _parse_score_output(raw)
+
     except Exception as e:
         print(f"[ERROR] OpenAI API exception: {e}")
-        
+
         return {
             "score": 0,
             "is_question_answered": False
@@ -0,0 +1,94 @@
+import os
+import shutil
+import threading
+import subprocess
+
+import numpy as np
+
+from app.services.frame_sampler import VIDEO_SAMPLES_PER_SECOND, VIDEO_MAX_SAMPLED_FRAMES, SampleClock
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+def ffmpeg_available():
+    return shutil.which(FFMPEG_BINARY) is not None
+
+def _read_ppm_frame(stream):
+    """
+    Reads one binary PPM image ("P6\\n<w> <h>\\n255\\n" + RGB bytes) from ffmpeg's output.
+    Returns a BGR frame, or None at end of stream.
+    """
+    tokens = []
+    token = b""
+    while len(tokens) < 4:
+        byte = stream.read(1)
+        if not byte:
+            return None
+        if byte.isspace():
+            if token:
+                tokens.append(token)
+                token = b""
+        else:
+            token += byte
+
+    width, height = int(tokens[1]), int(tokens[2])
+    data = stream.read(width * height * 3)
+    if len(data) < width * height * 3:
+        return None
+    rgb = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+    return np.ascontiguousarray(rgb[:, :, ::-1])
+
+def _feed_stdin(process, chunks):
+    """Pushes downloaded chunks into ffmpeg as they arrive."""
+    try:
+        for chunk in chunks:
+            process.stdin.write(chunk)
+    except (BrokenPipeError, ValueError):
+        # ffmpeg exited early (undecodable input, or the consumer stopped reading)
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+
+def stream_frames(chunks, samples_per_second=None, max_frames=None):
+    """
+    Decodes a clip from an iterable of byte chunks while it is still arriving.
+    ffmpeg reads the bytes from stdin and emits only the sampled frames (fps filter),
+    so each frame can go to inference as soon as it is decoded.
+    Needs a streamable container: the WebM clips MediaRecorder produces are.
+    The clip's length isn't known while it streams, so max_frames never stops the
+    decoder: past the budget, frames are thinned by a doubling stride (SampleClock).
+
+    Yields (frame_index, timestamp_seconds, frame) like frame_sampler.sample_frames.
+    """
+    samples_per_second = samples_per_second or VIDEO_SAMPLES_PER_SECOND
+    max_frames = VIDEO_MAX_SAMPLED_FRAMES if max_frames is None else max_frames
+
+    process = subprocess.Popen(
+        [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+         "-i", "pipe:0",
+         "-vf", f"fps={samples_per_second}",
+         "-f", "image2pipe", "-vcodec", "ppm", "pipe:1"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    feeder = threading.Thread(target=_feed_stdin, args=(process, chunks), name="ffmpeg-feed", daemon=True)
+    feeder.start()
+
+    clock = SampleClock(1.0 / samples_per_second, max_frames, open_ended=True)
+    frame_index = 0
+    try:
+        while True:
+            frame = _read_ppm_frame(process.stdout)
+            if frame is None:
+                break
+            timestamp = frame_index / samples_per_second
+            if clock.due(timestamp):
+                yield frame_index, timestamp, frame
+                clock.taken(timestamp)
+            frame_index += 1
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
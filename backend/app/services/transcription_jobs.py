@@ -0,0 +1,216 @@
+import os
+import hmac
+import time
+import asyncio
+import threading
+from typing import NamedTuple, Optional
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+
+from app.services.assembly_ai import submit_transcript, get_transcript, poll_transcript, poll_transcript_async, \
+    audio_result_from_transcript, upload_file, EMPTY_AUDIO_RESULT
+from app.services.audio_extract import extract_audio, AUDIO_EXTRACTION
+from app.services.media_fetch import download_media, release_media, FetchedMedia
+
+# Public URL of the webhook route (e.g. https://api.example.com/transcription/webhook).
+# When unset, submitted jobs are polled on a background thread instead.
+TRANSCRIPTION_WEBHOOK_URL = os.getenv("TRANSCRIPTION_WEBHOOK_URL", "")
+# Shared secret AssemblyAI echoes back in the webhook's X-Webhook-Secret header
+TRANSCRIPTION_WEBHOOK_SECRET = os.getenv("TRANSCRIPTION_WEBHOOK_SECRET", "")
+# Seconds a turn waits for the webhook before polling the job itself
+TRANSCRIPTION_WEBHOOK_GRACE = float(os.getenv("TRANSCRIPTION_WEBHOOK_GRACE", "30"))
+# Jobs that are never claimed or never resolved are forgotten after this many seconds
+TRANSCRIPTION_JOB_TTL = float(os.getenv("TRANSCRIPTION_JOB_TTL", "900"))
+
+class TranscriptionJob(NamedTuple):
+    video_url: str
+    transcript_id: str
+    future: Future  # resolves to the analyze_audio result
+    submitted_at: float
+    # The downloaded clip, held until a turn claims the job and takes over the reference
+    media: Optional[FetchedMedia] = None
+
+# Jobs waiting to be claimed by a turn, by clip
+_jobs_by_url = {}
+# Jobs waiting for their webhook, by transcript id. A claimed job stays here until
+# its future resolves, since the webhook often arrives after the turn claimed it.
+_jobs_by_id = {}
+_jobs_lock = threading.Lock()
+
+def _forget_expired_jobs():
+    """Drops jobs past TRANSCRIPTION_JOB_TTL, claimed or not. Caller holds _jobs_lock."""
+    now = time.monotonic()
+    for job in [job for job in _jobs_by_id.values() if now - job.submitted_at > TRANSCRIPTION_JOB_TTL]:
+        del _jobs_by_id[job.transcript_id]
+    # Resolved jobs already left _jobs_by_id, so unclaimed ones are found by clip
+    for job in [job for job in _jobs_by_url.values() if now - job.submitted_at > TRANSCRIPTION_JOB_TTL]:
+        del _jobs_by_url[job.video_url]
+        # Never claimed: no turn took over the clip
+        if job.media is not None:
+            release_media(job.media)
+
+def _forget_resolved_job(job):
+    """Done callback of a job's future: no webhook can change it anymore."""
+    with _jobs_lock:
+        if _jobs_by_id.get(job.transcript_id) is job:
+            del _jobs_by_id[job.transcript_id]
+
+def _settle(job, result):
+    """Hands a result fetched by a waiting turn to the job's future, unless the webhook got there first."""
+    try:
+        job.future.set_result(result)
+    except InvalidStateError:
+        pass
+
+def _resolve(job, fetch_result):
+    """Sets the job's result from fetch_result(); whichever of webhook or poller gets there first wins."""
+    try:
+        result = fetch_result()
+    except Exception as e:
+        result, error = None, e
+    else:
+        error = None
+    try:
+        if error is None:
+            job.future.set_result(result)
+        else:
+            job.future.set_exception(error)
+    except InvalidStateError:
+        pass
+
+def _upload_audio(video_url):
+    """
+    Downloads the clip into the media cache and uploads only its audio track
+    (or the clip itself if extraction fails) to AssemblyAI.
+    Returns (media, audio_url); if the download fails, media is None and
+    AssemblyAI is given video_url to fetch the clip itself.
+    """
+    try:
+        media = download_media(video_url)
+    except Exception as e:
+        print(f"[WARNING] Could not download clip for transcription, submitting its URL: {e}")
+        return None, video_url
+
+    audio_path = extract_audio(media.path) if AUDIO_EXTRACTION else None
+    try:
+        return media, upload_file(audio_path or media.path)
+    except Exception:
+        release_media(media)
+        raise
+    finally:
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+
+def start_transcription(video_url):
+    """
+    Queues the transcription of a clip as soon as it is uploaded, without waiting for the transcript.
+    The clip is downloaded once here and kept in the media cache for /analyze_turn,
+    which later claims the job (and the downloaded clip) by video_url.
+    Completion arrives through the webhook route, or a background poller when
+    TRANSCRIPTION_WEBHOOK_URL is unset.
+    Returns the TranscriptionJob (an existing one if this clip was already submitted).
+    """
+    with _jobs_lock:
+        existing = _jobs_by_url.get(video_url)
+    if existing is not None:
+        return existing
+
+    media, audio_url = _upload_audio(video_url)
+    try:
+        transcript_id = submit_transcript(
+            audio_url, TRANSCRIPTION_WEBHOOK_URL or None, TRANSCRIPTION_WEBHOOK_SECRET or None
+        )
+    except Exception:
+        if media is not None:
+            release_media(media)
+        raise
+    job = TranscriptionJob(video_url, transcript_id, Future(), time.monotonic(), media)
+    with _jobs_lock:
+        _forget_expired_jobs()
+        existing = _jobs_by_url.get(video_url)
+        if existing is not None:
+            # Lost a race with a concurrent submission of the same clip; its job is the one turns will claim
+            if media is not None:
+                release_media(media)
+            return existing
+        _jobs_by_url[video_url] = job
+        _jobs_by_id[transcript_id] = job
+    job.future.add_done_callback(lambda _: _forget_resolved_job(job))
+    print(f"[DEBUG] Transcription job {transcript_id} submitted")
+
+    if not TRANSCRIPTION_WEBHOOK_URL:
+        threading.Thread(
+            target=_resolve, args=(job, lambda: poll_transcript(transcript_id)),
+            name="transcription-poll", daemon=True
+        ).start()
+    return job
+
+def handle_transcription_webhook(payload, auth_header=None):
+    """
+    Handles AssemblyAI's completion callback ({"transcript_id": ..., "status": ...}).
+    The transcript is fetched on a background thread so the webhook returns right away.
+    Raises PermissionError on a wrong secret; returns False for unknown or unfinished jobs.
+    """
+    if TRANSCRIPTION_WEBHOOK_SECRET and not hmac.compare_digest(auth_header or "", TRANSCRIPTION_WEBHOOK_SECRET):
+        raise PermissionError("Invalid webhook secret")
+
+    transcript_id = (payload or {}).get("transcript_id")
+    with _jobs_lock:
+        job = _jobs_by_id.get(transcript_id)
+    if job is None:
+        print(f"[WARNING] Webhook for unknown transcription job {transcript_id}")
+        return False
+    if payload.get("status") not in ("completed", "error"):
+        return False
+
+    threading.Thread(
+        target=_resolve, args=(job, lambda: audio_result_from_transcript(get_transcript(transcript_id))),
+        name="transcription-webhook", daemon=True
+    ).start()
+    return True
+
+def claim_transcription(video_url):
+    """
+    Returns the job started for this clip, or None if it was never submitted.
+    A clip can only be claimed once; the job still receives its webhook.
+    The caller takes over job.media (when set) and must release_media() it.
+    """
+    with _jobs_lock:
+        return _jobs_by_url.pop(video_url, None)
+
+def wait_for_transcription(job):
+    """
+    Waits for a claimed job and returns the same dict analyze_audio does.
+    If the webhook hasn't arrived within TRANSCRIPTION_WEBHOOK_GRACE the job is polled directly.
+    """
+    try:
+        if TRANSCRIPTION_WEBHOOK_URL:
+            try:
+                return job.future.result(timeout=TRANSCRIPTION_WEBHOOK_GRACE or None)
+            except FutureTimeoutError:
+                print(f"[WARNING] No webhook for transcription job {job.transcript_id}, polling it")
+                result = poll_transcript(job.transcript_id)
+                _settle(job, result)
+                return result
+        return job.future.result()
+    except Exception as e:
+        print(f"[ERROR] AssemblyAI failed: {e}")
+        return dict(EMPTY_AUDIO_RESULT)
+
+async def wait_for_transcription_async(job):
+    """Async counterpart of wait_for_transcription for the ASGI app."""
+    try:
+        if TRANSCRIPTION_WEBHOOK_URL:
+            try:
+                # shield: a timeout must not cancel the job's future, the webhook may still resolve it
+                return await asyncio.wait_for(
+                    asyncio.shield(asyncio.wrap_future(job.future)), timeout=TRANSCRIPTION_WEBHOOK_GRACE or None
+                )
+            except asyncio.TimeoutError:
+                print(f"[WARNING] No webhook for transcription job {job.transcript_id}, polling it")
+                result = await poll_transcript_async(job.transcript_id)
+                _settle(job, result)
+                return result
+        return await asyncio.wrap_future(job.future)
+    except Exception as e:
+        print(f"[ERROR] AssemblyAI failed: {e}")
+        return dict(EMPTY_AUDIO_RESULT)
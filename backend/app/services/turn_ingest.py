@@ -0,0 +1,222 @@
+import os
+import re
+import time
+import queue
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from app.services.assembly_ai import transcribe_audio
+from app.services.audio_extract import extract_audio
+from app.services.deepface_service import analyze_video, analyze_video_stream
+from app.services.stream_decoder import ffmpeg_available
+
+# A new audio segment is sent to transcription every this many seconds of recording
+INGEST_SEGMENT_SECONDS = float(os.getenv("INGEST_SEGMENT_SECONDS", "10"))
+# Segments end this far behind the newest chunk, so the cut never lands in half-written data
+INGEST_SEGMENT_MARGIN = float(os.getenv("INGEST_SEGMENT_MARGIN", "1.0"))
+# Sessions without a new chunk for this long are discarded
+INGEST_SESSION_TTL = float(os.getenv("INGEST_SESSION_TTL", "600"))
+# /ingest is unauthenticated, so every session is capped in memory and disk use
+INGEST_MAX_CHUNK_BYTES = int(os.getenv("INGEST_MAX_CHUNK_BYTES", str(8 * 1024 * 1024)))
+INGEST_MAX_SESSION_BYTES = int(os.getenv("INGEST_MAX_SESSION_BYTES", str(200 * 1024 * 1024)))
+INGEST_MAX_SESSIONS = int(os.getenv("INGEST_MAX_SESSIONS", "64"))
+# Chunks this far ahead of the next expected one are refused instead of buffered
+INGEST_MAX_SEQ_AHEAD = int(os.getenv("INGEST_MAX_SEQ_AHEAD", "32"))
+
+_INGEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+_segment_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INGEST_WORKERS", "4")),
+    thread_name_prefix="ingest-segment"
+)
+
+_sessions = {}
+# ingest_id -> when /analyze_turn claimed it. Chunks that arrive later (client
+# retries, a slow final request) are rejected instead of opening a new session.
+_claimed_ids = {}
+_sessions_lock = threading.Lock()
+
+class IngestLimitExceeded(Exception):
+    """A chunk was refused by one of the INGEST_MAX_* limits. status_code is 413 or 429."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+def check_chunk_size(size):
+    """Raises IngestLimitExceeded (413) for a chunk over INGEST_MAX_CHUNK_BYTES; routes call it before reading the body."""
+    if size and size > INGEST_MAX_CHUNK_BYTES:
+        raise IngestLimitExceeded(f"Chunk is larger than {INGEST_MAX_CHUNK_BYTES} bytes", 413)
+
+def _transcribe_segment(path, start, end):
+    """
+    Transcribes [start, end) of the recording so far. None if the segment couldn't be extracted;
+    transcription errors are raised so the turn falls back to the whole recording.
+    """
+    audio_path = extract_audio(path, start=start, end=end)
+    if audio_path is None:
+        return None
+    try:
+        return transcribe_audio(audio_path)
+    finally:
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+
+class IngestSession:
+    """
+    One turn recorded in chunks (MediaRecorder timeslices of a single WebM stream).
+    Chunks are appended to a local file in sequence order and fed to the streaming
+    decoder, so DeepFace runs while the user is still talking. Every
+    INGEST_SEGMENT_SECONDS the audio recorded so far is cut into a segment and
+    transcribed in the background. After the final chunk only the last segment is left.
+    """
+
+    def __init__(self, ingest_id):
+        self.ingest_id = ingest_id
+        fd, self.path = tempfile.mkstemp(suffix=".webm")
+        self.file = os.fdopen(fd, "wb")
+        self.lock = threading.Lock()
+        self.next_seq = 0
+        self.pending = {}
+        # Bytes written plus bytes waiting in pending
+        self.received_bytes = 0
+        self.segment_start = 0.0
+        self.segment_futures = []
+        self.finished = threading.Event()
+        self.updated_at = time.monotonic()
+        self.chunk_queue = queue.Queue()
+        self.video_future = Future()
+        # Marked running so a stage timeout can't cancel it while the decoder still uses the file
+        self.video_future.set_running_or_notify_cancel()
+        # Dedicated thread: it lives as long as the recording and must never wait for a pool slot
+        threading.Thread(target=self._analyze_video, name="ingest-video", daemon=True).start()
+
+    def _chunks(self):
+        while True:
+            chunk = self.chunk_queue.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def _analyze_video(self):
+        try:
+            emotions, timeline = analyze_video_stream(self._chunks(), include_timeline=True)
+            if not emotions and self.finished.wait(INGEST_SESSION_TTL):
+                print("[WARNING] Streaming decode produced no frames, analyzing the recorded file instead")
+                emotions, timeline = analyze_video(self.path, include_timeline=True)
+            self.video_future.set_result((emotions, timeline))
+        except Exception as e:
+            self.video_future.set_exception(e)
+
+    def add_chunk(self, seq, data, elapsed, final=False):
+        """
+        Accepts chunk number seq (0-based) ending at elapsed seconds of recording.
+        Chunks may arrive out of order; they are applied in sequence. Retries of an
+        already applied chunk are ignored.
+        Raises ValueError for a seq more than INGEST_MAX_SEQ_AHEAD past the next expected
+        chunk and IngestLimitExceeded (413) once the session passes INGEST_MAX_SESSION_BYTES.
+        """
+        with self.lock:
+            if self.finished.is_set() or seq < self.next_seq:
+                return
+            if seq > self.next_seq + INGEST_MAX_SEQ_AHEAD:
+                raise ValueError(f"Chunk {seq} is too far ahead of chunk {self.next_seq}")
+            # A retried pending chunk replaces the earlier copy
+            received_bytes = self.received_bytes + len(data) - len(self.pending.get(seq, (b"",))[0])
+            if received_bytes > INGEST_MAX_SESSION_BYTES:
+                raise IngestLimitExceeded(f"Recording is larger than {INGEST_MAX_SESSION_BYTES} bytes", 413)
+            self.received_bytes = received_bytes
+            self.pending[seq] = (data, elapsed, final)
+            while self.next_seq in self.pending:
+                data, elapsed, final = self.pending.pop(self.next_seq)
+                self.next_seq += 1
+                self._append(data, elapsed, final)
+            self.updated_at = time.monotonic()
+
+    def _append(self, data, elapsed, final):
+        if data:
+            self.file.write(data)
+            self.file.flush()
+            if not self.video_future.done():
+                self.chunk_queue.put(data)
+
+        if final:
+            self.file.close()
+            self.chunk_queue.put(None)
+            self._submit_segment(None)
+            self.finished.set()
+            return
+
+        cut = elapsed - INGEST_SEGMENT_MARGIN
+        if INGEST_SEGMENT_SECONDS and cut - self.segment_start >= INGEST_SEGMENT_SECONDS:
+            self._submit_segment(cut)
+
+    def _submit_segment(self, end):
+        self.segment_futures.append(
+            _segment_executor.submit(_transcribe_segment, self.path, self.segment_start, end)
+        )
+        if end is not None:
+            self.segment_start = end
+
+    def discard(self):
+        """Stops feeding the decoder and deletes the recorded file."""
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+                self.chunk_queue.put(None)
+            self.finished.set()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def _discard_expired_sessions():
+    """
+    Drops sessions that stopped receiving chunks and were never claimed, and
+    forgets claimed ids past INGEST_SESSION_TTL. Caller holds _sessions_lock.
+    """
+    now = time.monotonic()
+    for ingest_id in [i for i, claimed_at in _claimed_ids.items() if now - claimed_at > INGEST_SESSION_TTL]:
+        del _claimed_ids[ingest_id]
+    for session in [s for s in _sessions.values() if now - s.updated_at > INGEST_SESSION_TTL]:
+        del _sessions[session.ingest_id]
+        print(f"[WARNING] Discarding abandoned ingest session {session.ingest_id}")
+        threading.Thread(target=session.discard, daemon=True).start()
+
+def ingest_available():
+    """Chunked ingestion needs ffmpeg for both the streaming decoder and the audio segments."""
+    return ffmpeg_available()
+
+def add_ingest_chunk(ingest_id, seq, data, elapsed, final=False):
+    """
+    Appends one recorded chunk to the turn's ingest session, creating the session on first use.
+    Raises ValueError for a malformed ingest id or seq, or a turn that was already claimed for analysis,
+    and IngestLimitExceeded when a chunk, the session or the number of open sessions is over its limit.
+    """
+    if not _INGEST_ID_PATTERN.match(ingest_id or ""):
+        raise ValueError("Invalid ingest id")
+    if seq < 0:
+        raise ValueError("Negative chunk number")
+    check_chunk_size(len(data))
+    with _sessions_lock:
+        # Swept on every chunk, so abandoned sessions go even when no new turn starts
+        _discard_expired_sessions()
+        if ingest_id in _claimed_ids:
+            raise ValueError("Ingest session was already claimed for analysis")
+        session = _sessions.get(ingest_id)
+        if session is None:
+            if len(_sessions) >= INGEST_MAX_SESSIONS:
+                raise IngestLimitExceeded("Too many turns are being ingested", 429)
+            session = _sessions[ingest_id] = IngestSession(ingest_id)
+    session.add_chunk(seq, data, elapsed, final)
+
+def claim_ingest_session(ingest_id):
+    """
+    Removes and returns the ingest session for a turn, or None if the turn wasn't ingested in chunks.
+    Later chunks for the same id are rejected.
+    """
+    if not ingest_id:
+        return None
+    with _sessions_lock:
+        _discard_expired_sessions()
+        _claimed_ids[ingest_id] = time.monotonic()
+        return _sessions.pop(ingest_id, None)
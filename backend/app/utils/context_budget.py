@@ -0,0 +1,166 @@
+import os
+import re
+from app.utils.num_tokens import num_tokens_from_string
+
+# Token budget for the rolling summary sent to the LLM (0 = no limit).
+# The newest sentences that fit are sent as they are, the older ones as short
+# per-question notes; the stored summary keeps all of them in full.
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "800"))
+# Token budget for those notes (0 = no limit). When it is exceeded the oldest notes go
+# first, but each question keeps its earliest note, the one a contradiction is checked against.
+SUMMARY_NOTES_TOKEN_BUDGET = int(os.getenv("SUMMARY_NOTES_TOKEN_BUDGET", "400"))
+# Words kept of an older summary sentence
+SUMMARY_NOTE_WORDS = int(os.getenv("SUMMARY_NOTE_WORDS", "20"))
+# Token budget for the user answers sent to step 3a (0 = no limit).
+# The newest answers are sent in full, the older ones as short per-question notes.
+ANSWERS_TOKEN_BUDGET = int(os.getenv("ANSWERS_TOKEN_BUDGET", "1000"))
+# Words of evidence kept in a per-question note
+NOTE_EVIDENCE_WORDS = int(os.getenv("NOTE_EVIDENCE_WORDS", "12"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[a-z]{4,}")
+# Words every summary sentence uses; they say nothing about which question it belongs to
+_NOTE_STOP_WORDS = {"user", "users", "they", "them", "their", "that", "this", "with", "have", "been",
+                    "says", "said", "reports", "reported", "mentions", "mentioned", "about"}
+
+def split_summary(summary, budget=None):
+    """
+    Splits the rolling summary into (older, recent) at a sentence boundary, where
+    recent is the longest run of trailing sentences within budget tokens (at least
+    one sentence). older is "" when the whole summary fits.
+    """
+    budget = SUMMARY_TOKEN_BUDGET if budget is None else budget
+    if not summary or not budget or num_tokens_from_string(summary) <= budget:
+        return "", summary or ""
+
+    starts = [0] + [m.end() for m in _SENTENCE_END.finditer(summary)]
+    ends = starts[1:] + [len(summary)]
+    cut = starts[-1]
+    used = num_tokens_from_string(summary[cut:])
+    for start, end in zip(reversed(starts[:-1]), reversed(ends[:-1])):
+        used += num_tokens_from_string(summary[start:end])
+        if used > budget:
+            break
+        cut = start
+    return summary[:cut].rstrip(), summary[cut:]
+
+def fit_summary(summary, budget=None):
+    """The part of the rolling summary that is sent to the LLM."""
+    return split_summary(summary, budget)[1]
+
+def join_summary(older, updated_summary):
+    """Puts the sentences that were only sent as notes back in front of the summary the LLM returned."""
+    if not older:
+        return updated_summary
+    if not updated_summary:
+        return older
+    return f"{older}\n{updated_summary}"
+
+def _shorten(text, max_words):
+    words = (text or "").split()
+    short = " ".join(words[:max_words])
+    return short + "..." if len(words) > max_words else short
+
+def _stems(text):
+    """Crude word stems for matching summary sentences to answers: "sleeping" and "sleep" share "sleep"."""
+    return {word[:5] for word in _WORD.findall((text or "").lower()) if word not in _NOTE_STOP_WORDS}
+
+def _group_notes(notes):
+    grouped = {}
+    for question_id, note in notes:
+        grouped.setdefault(question_id, []).append(note)
+    return [{"question_id": question_id, "notes": " ".join(texts)} for question_id, texts in grouped.items()]
+
+def _droppable_note(notes):
+    """Index of the oldest note that isn't the first one of its question, else of the oldest note."""
+    seen = set()
+    for i, (question_id, _) in enumerate(notes):
+        if question_id in seen:
+            return i
+        seen.add(question_id)
+    return 0
+
+def summary_notes(older_summary, user_answers=None, budget=None):
+    """
+    Older summary sentences as per-question notes: [{"question_id", "notes"}], in the
+    order the questions were first mentioned. Each sentence is shortened and filed
+    under the stored answer it shares the most words with (question_id None if none).
+    Tokens are counted on the same str() form the prompt uses.
+    """
+    if not older_summary:
+        return []
+    budget = SUMMARY_NOTES_TOKEN_BUDGET if budget is None else budget
+    answer_stems = [(a.get("question_id"), _stems(f"{a.get('question')} {a.get('answer')} {a.get('evidence')}"))
+                    for a in user_answers or []]
+
+    notes = []
+    for sentence in _SENTENCE_END.split(older_summary.strip()):
+        stems = _stems(sentence)
+        matches = [(len(stems & answer), qid) for qid, answer in answer_stems if stems & answer]
+        question_id = max(matches, key=lambda match: match[0])[1] if matches else None
+        notes.append((question_id, _shorten(sentence, SUMMARY_NOTE_WORDS)))
+
+    dropped = 0
+    while budget and len(notes) > 1 and num_tokens_from_string(str(_group_notes(notes))) > budget:
+        notes.pop(_droppable_note(notes))
+        dropped += 1
+    if dropped:
+        print(f"[DEBUG] Dropped {dropped} of {dropped + len(notes)} summary notes to fit {budget} tokens")
+    return _group_notes(notes)
+
+def compact_answer(answer):
+    """Per-question note for an older answer: the question text is dropped (the id names it) and the evidence shortened."""
+    return {
+        "question_id": answer.get("question_id"),
+        "answer": answer.get("answer"),
+        "evidence": _shorten(answer.get("evidence"), NOTE_EVIDENCE_WORDS),
+        "contradictory": answer.get("contradictory", False)
+    }
+
+def budget_user_answers(user_answers, current_qid=None, budget=None):
+    """
+    Returns (answers to send, ids of the answers sent as notes). Every answer is
+    sent, most of them as notes once the budget is exceeded: the answer to the
+    current question and then the newest answers are sent in full while they fit.
+    Tokens are counted on the same str() form the prompt uses.
+    """
+    budget = ANSWERS_TOKEN_BUDGET if budget is None else budget
+    if not user_answers or not budget or num_tokens_from_string(str(user_answers)) <= budget:
+        return list(user_answers), set()
+
+    to_send = [compact_answer(a) for a in user_answers]
+    used = sum(num_tokens_from_string(str(note)) for note in to_send)
+    compacted_ids = {a.get("question_id") for a in user_answers}
+
+    # Current question first, then newest to oldest; stop at the first answer that doesn't fit
+    order = sorted(range(len(user_answers)),
+                   key=lambda i: (user_answers[i].get("question_id") != current_qid, -i))
+    for i in order:
+        answer = user_answers[i]
+        extra = num_tokens_from_string(str(answer)) - num_tokens_from_string(str(to_send[i]))
+        if used + extra > budget and answer.get("question_id") != current_qid:
+            break
+        to_send[i] = answer
+        used += extra
+        compacted_ids.discard(answer.get("question_id"))
+
+    print(f"[DEBUG] Sending {len(compacted_ids)} of {len(user_answers)} user answers as notes ({used} tokens)")
+    return to_send, compacted_ids
+
+def restore_compacted_answers(user_answers, updated_answers, compacted_ids):
+    """
+    The LLM may echo the notes it was sent in updated_user_answers. An echoed note
+    that leaves the answer unchanged is replaced by the stored full answer, so
+    compaction never overwrites the evidence in Firestore.
+    """
+    if not compacted_ids:
+        return updated_answers
+    stored = {a.get("question_id"): a for a in user_answers}
+    restored = []
+    for answer in updated_answers:
+        original = stored.get(answer.get("question_id"))
+        unchanged = original is not None and answer.get("question_id") in compacted_ids \
+            and answer.get("answer") == original.get("answer") \
+            and bool(answer.get("contradictory")) == bool(original.get("contradictory"))
+        restored.append(original if unchanged else answer)
+    return restored
@@ -0,0 +1,117 @@
+import re
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+class JsonStringFieldStreamer:
+    """
+    Pulls the value of one string field out of a JSON document that arrives in
+    pieces (a streamed completion), so the text can be shown before the document
+    is complete. feed() returns the newly decoded part of the value, if any.
+    Escapes split across pieces are held back until they are complete.
+    """
+
+    def __init__(self, field):
+        self.key = f'"{field}"'
+        self.buffer = ""
+        self.state = "search"  # search -> value -> done
+
+    def feed(self, text):
+        if self.state == "done":
+            return ""
+        self.buffer += text
+
+        if self.state == "search":
+            index = self.buffer.find(self.key)
+            if index < 0:
+                # Keep just enough to catch a key split across pieces
+                self.buffer = self.buffer[-len(self.key):]
+                return ""
+            after = self.buffer[index + len(self.key):]
+            match = re.match(r'\s*:\s*"', after)
+            if match is None:
+                if re.fullmatch(r"\s*(:\s*)?", after):
+                    self.buffer = self.buffer[index:]
+                else:
+                    # The field exists but isn't a string (e.g. null)
+                    self.state = "done"
+                return ""
+            self.buffer = after[match.end():]
+            self.state = "value"
+
+        return self._decode_value()
+
+    def _decode_value(self):
+        out = []
+        buffer = self.buffer
+        i = 0
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.state = "done"
+                i += 1
+                break
+            if char != "\\":
+                out.append(char)
+                i += 1
+                continue
+
+            if i + 1 >= len(buffer):
+                break
+            if buffer[i + 1] != "u":
+                out.append(_ESCAPES.get(buffer[i + 1], buffer[i + 1]))
+                i += 2
+                continue
+
+            if i + 6 > len(buffer):
+                break
+            code = int(buffer[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                # High surrogate: wait for its low half (\uDC00-\uDFFF) to build one character
+                if i + 12 > len(buffer):
+                    break
+                low = int(buffer[i + 8:i + 12], 16) if buffer[i + 6:i + 8] == "\\u" else 0
+                if 0xDC00 <= low < 0xE000:
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+                code = 0xFFFD
+            out.append(chr(code))
+            i += 6
+
+        self.buffer = buffer[i:]
+        return "".join(out)
+
+_LITERALS = {"true": True, "false": False, "null": None}
+# What may follow the key while its literal is still arriving
+_PARTIAL_LITERAL = re.compile(r"\s*(:\s*(t(r(ue?)?)?|f(a(l(se?)?)?)?|n(u(ll?)?)?)?)?")
+
+class JsonLiteralFieldReader:
+    """
+    Reads a true/false/null field out of a JSON document that arrives in pieces.
+    feed() sets done once the value is known; value is then True, False or None
+    (also None when the field holds something else).
+    """
+
+    def __init__(self, field):
+        self.key = f'"{field}"'
+        self.buffer = ""
+        self.done = False
+        self.value = None
+
+    def feed(self, text):
+        if self.done:
+            return
+        self.buffer += text
+        index = self.buffer.find(self.key)
+        if index < 0:
+            self.buffer = self.buffer[-len(self.key):]
+            return
+        after = self.buffer[index + len(self.key):]
+        match = re.match(r"\s*:\s*(true|false|null)", after)
+        if match is not None:
+            self.value = _LITERALS[match.group(1)]
+            self.done = True
+        elif _PARTIAL_LITERAL.fullmatch(after):
+            self.buffer = self.buffer[index:]
+        else:
+            self.done = True
@@ -0,0 +1,77 @@
+from functools import lru_cache
+from typing import List, Optional
+from pydantic import BaseModel
+
+# Output schemas for the gpt-4o calls, enforced by OpenAI structured outputs.
+# Field order is the order the model writes them in. The crisis flags come first:
+# the streamed bot_reply is only forwarded once is_emergency is known to be false.
+# bot_reply comes next so it reaches the client before the summary and answers.
+
+class UserAnswer(BaseModel):
+    question_id: str
+    question: str
+    evidence: str
+    answer: str
+    contradictory: bool
+
+class Contradictions(BaseModel):
+    contradictory: bool
+    contradicting_question_ids: List[str]
+    reason: str
+
+class ReplyOutput(BaseModel):
+    """Step 3a output for an active (diagnostic) session."""
+    is_emergency: bool
+    trigger_word: str
+    bot_reply: str
+    updated_summary: str
+    needs_followup: bool
+    updated_user_answers: List[UserAnswer]
+    contradictions: Contradictions
+
+class CombinedReplyOutput(ReplyOutput):
+    """Step 3a output with the step 3b score (COMBINED_REPLY_SCORING)."""
+    is_question_answered: bool
+    score: Optional[int]
+
+class FreeTalkReplyOutput(BaseModel):
+    """Step 3a output for a resumed (free talk) session."""
+    is_emergency: bool
+    trigger_word: str
+    bot_reply: str
+    updated_summary: str
+
+class ScoreOutput(BaseModel):
+    """Step 3b output."""
+    is_question_answered: bool
+    score: Optional[int]
+
+def _make_strict(schema):
+    """Applies the strict-mode rules in place: every property required, no extra properties."""
+    schema.pop("title", None)
+    schema.pop("description", None)
+    if schema.get("type") == "object":
+        properties = schema.get("properties", {})
+        schema["additionalProperties"] = False
+        schema["required"] = list(properties)
+        for sub_schema in properties.values():
+            _make_strict(sub_schema)
+    if "items" in schema:
+        _make_strict(schema["items"])
+    for sub_schema in schema.get("anyOf", []):
+        _make_strict(sub_schema)
+    for sub_schema in schema.get("$defs", {}).values():
+        _make_strict(sub_schema)
+    return schema
+
+@lru_cache(maxsize=None)
+def response_format(model):
+    """The response_format argument that makes a chat completion follow model's JSON schema (built once per model)."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "strict": True,
+            "schema": _make_strict(model.model_json_schema())
+        }
+    }
@@ -6,13 +6,14 @@ If you detect explicit self-harm or suicidal intent ONLY (simply referring to de
 set "is_emergency": true, "trigger_word": "[word]".
 
 ### PRIORITY 2: CONTRADICTION DETECTION (CRITICAL)
-- Compare the current message against the 'CURRENT ROLLING SUMMARY' and 'USER ANSWERS SO FAR'.
+- Compare the current message against the 'CURRENT ROLLING SUMMARY', the 'EARLIER SUMMARY NOTES' (when given) and 'USER ANSWERS SO FAR'.
 - If the user's new statement directly conflicts with a past answer or summary:
     1. Set "contradictory": true for that specific entry in 'updated_user_answers'.
-    2. Include all past related question IDs in "contradicting_question_ids".
-    3. Provide a brief "reason" for the mismatch.
-    4. Set 'needs_followup' to True.
-- If no conflict exists, "contradicting_question_ids" must be an empty list [].
+    2. Set "contradictory": true in "contradictions".
+    3. Include all past related question IDs in "contradicting_question_ids".
+    4. Provide a brief "reason" for the mismatch.
+    5. Set 'needs_followup' to True.
+- If no conflict exists, "contradictions" must have "contradictory": false and an empty "contradicting_question_ids" list [].
 
 ### PRIORITY 3: THE DATA GATE (needs_followup)
 - Set "needs_followup": false if the user provides ANY narrative or frequency.
@@ -0,0 +1,13 @@
+from app.utils.open_ai_prompt_3a import OPENAI_PROMPT_3A
+
+# Combined mode (COMBINED_REPLY_SCORING=1): step 3a's prompt plus the GET_QS_SCORE task,
+# so one completion returns the reply and the score of the current question
+OPENAI_PROMPT_3A_3B = OPENAI_PROMPT_3A.replace("\nReturn JSON in the format provided.\n", "") + """
+### PRIORITY 6: SCORING THE CURRENT QUESTION
+- ONLY if "needs_followup" is false AND "contradictory" is false:
+    1. Map the user's message to a numeric "score" within 'METRICS TO SCORE USER'S ANSWER', using the frequency/intensity of symptoms the user described (use the rolling summary as context).
+    2. If the frequency/intensity NEEDED in the score range is not provided, set "is_question_answered" to false and "score" to null, else set "is_question_answered" to true.
+- Otherwise set "is_question_answered" to false and "score" to null.
+
+Return JSON in the format provided.
+"""
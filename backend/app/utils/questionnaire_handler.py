@@ -24,6 +24,19 @@ QUESTIONNAIRES = {
     "PCL-5": json.load(open(f'{CSV_PATH}/pcl5.json'))
 }
 
+def _format_questionnaire_definitions():
+    """Every question with its id and each scale's response options, as prompt text."""
+    lines = []
+    for scale_name, scale in QUESTIONNAIRES.items():
+        options = ", ".join(f"{o['value']} = {o['label']}" for o in scale["response_options"])
+        lines.append(f"{scale_name} ({scale['time_window']}; response options: {options})")
+        lines.extend(f"{scale_name}_Q{q['id']}: {q['text']}" for q in scale["questions"])
+        lines.append("")
+    return "\n".join(lines).strip()
+
+# Static text, so it can sit in the cached prefix of the step 3a prompt
+QUESTIONNAIRE_DEFINITIONS = _format_questionnaire_definitions()
+
 def get_questionnaire_score_range(qid):
     """ Example
     Input: 'PHQ-9_Q3'
@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+
+from app.utils.num_tokens import num_tokens_from_messages, num_tokens_from_string
+
+# USD per 1M tokens: (input, cached input, output)
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+# Session totals not updated for this many seconds are forgotten
+USAGE_SESSION_TTL = float(os.getenv("USAGE_SESSION_TTL", "21600"))
+
+_FIELDS = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "seconds", "cost_usd")
+
+_session_totals = {}
+_session_lock = threading.Lock()
+
+def _empty_totals():
+    return dict.fromkeys(_FIELDS, 0)
+
+def _add(totals, other):
+    for field in _FIELDS:
+        totals[field] += other[field]
+
+def _rounded(totals):
+    """JSON-ready totals, with the share of prompt tokens served from OpenAI's prompt cache."""
+    cache_hit_rate = totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0
+    return dict(totals, seconds=round(totals["seconds"], 3), cost_usd=round(totals["cost_usd"], 6),
+                cache_hit_rate=round(cache_hit_rate, 3))
+
+def call_cost(model, prompt_tokens, completion_tokens, cached_tokens):
+    """USD cost of one completion, 0 for a model without a price."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return 0
+    input_price, cached_price, output_price = prices
+    return ((prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+            + completion_tokens * output_price) / 1_000_000
+
+class TurnUsage:
+    """
+    Token, cost and latency ledger of one /analyze_turn request, per LLM stage
+    ("3a", "3b"). Thread-safe: a speculative 3b call records from its worker thread.
+    """
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, model, usage, seconds, messages=None, output=""):
+        """
+        Adds one completion. usage is the response's usage object; without it
+        (e.g. a stream that ended early) tokens are estimated from messages and output.
+        """
+        if usage is not None:
+            prompt_tokens = usage.prompt_tokens or 0
+            completion_tokens = usage.completion_tokens or 0
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        else:
+            prompt_tokens = num_tokens_from_messages(messages) if messages else 0
+            completion_tokens = num_tokens_from_string(output or "")
+            cached_tokens = 0
+
+        call = {
+            "calls": 1,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "seconds": seconds,
+            "cost_usd": call_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        }
+        with self.lock:
+            _add(self.stages.setdefault(stage, _empty_totals()), call)
+
+    def summary(self):
+        """{"stages": {stage: totals}, "total": totals}, JSON-ready."""
+        with self.lock:
+            total = _empty_totals()
+            for totals in self.stages.values():
+                _add(total, totals)
+            return {
+                "stages": {stage: _rounded(totals) for stage, totals in self.stages.items()},
+                "total": _rounded(total)
+            }
+
+    def finish(self):
+        """
+        Adds this turn to its session's totals and returns
+        {"turn": <summary>, "session": <session totals or None without a session id>}.
+        """
+        turn = self.summary()
+        total = turn["total"]
+        print(f"[DEBUG] Turn LLM usage: {total['prompt_tokens']} prompt tokens "
+              f"({total['cached_tokens']} cached, {100 * total['cache_hit_rate']:.0f}%), "
+              f"{total['completion_tokens']} completion tokens, {total['seconds']:.2f}s, ${total['cost_usd']:.4f}")
+        return {"turn": turn, "session": record_session_usage(self.session_id, turn)}
+
+def _forget_expired_sessions():
+    """Drops session totals past USAGE_SESSION_TTL. Caller holds _session_lock."""
+    now = time.monotonic()
+    for session_id in [s for s, totals in _session_totals.items() if now - totals["updated_at"] > USAGE_SESSION_TTL]:
+        del _session_totals[session_id]
+
+def record_session_usage(session_id, turn_summary):
+    """Adds a turn summary to the in-process totals of its session and returns them. None without a session id."""
+    if not session_id:
+        return None
+    with _session_lock:
+        _forget_expired_sessions()
+        session = _session_totals.setdefault(session_id, {"turns": 0, "stages": {}, "updated_at": 0})
+        session["turns"] += 1
+        session["updated_at"] = time.monotonic()
+        for stage, totals in turn_summary["stages"].items():
+            _add(session["stages"].setdefault(stage, _empty_totals()), totals)
+
+        total = _empty_totals()
+        for totals in session["stages"].values():
+            _add(total, totals)
+        return {
+            "turns": session["turns"],
+            "stages": {stage: _rounded(totals) for stage, totals in session["stages"].items()},
+            "total": _rounded(total)
+        }
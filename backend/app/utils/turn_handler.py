@@ -0,0 +1,319 @@
+import os
+import re
+import json
+import numpy as np
+from app.utils.questionnaire_handler import \
+    get_question_data, \
+    get_questionnaire_score_range, append_question_to_unanswered_list, \
+    mark_question_answered, get_overlapping_updates, \
+    update_question_tracker, deduplicate_user_answers
+from app.utils.response_guardrails import get_natural_question
+from app.utils.token_usage import TurnUsage
+from app.utils.context_budget import split_summary, join_summary, summary_notes, budget_user_answers, \
+    restore_compacted_answers
+
+CRISIS_REPLY = "It sounds like you might be in distress. Please reach out to immediate help:\n\nNational Suicide Prevention Lifeline: 988 (US)\nCrisis Text Line: Text HOME to 741741\n\nYou're not alone."
+# Include the per-clip emotion time series in the response as "deepface_timeline"
+RETURN_EMOTION_TIMELINE = os.getenv("RETURN_EMOTION_TIMELINE", "0") == "1"
+
+# Start step 3b together with 3a (scored against the incoming summary) and drop it on follow-up/contradiction
+SPECULATIVE_SCORING = os.getenv("SPECULATIVE_SCORING", "0") == "1"
+# One gpt-4o completion returns the reply and the step 3b score (no separate scoring call)
+COMBINED_REPLY_SCORING = os.getenv("COMBINED_REPLY_SCORING", "0") == "1"
+
+END_OF_SESSION_REPLY = "We've covered all the specific areas I wanted to check on today. Thank you for being so open with me. You can now view your session summary."
+
+def prepare_data_for_json(data):
+    """Recursively converts NumPy/custom numeric types to standard Python types."""
+    if isinstance(data, dict):
+        return {k: prepare_data_for_json(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [prepare_data_for_json(v) for v in data]
+    elif isinstance(data, np.floating):
+        return float(data)
+    elif isinstance(data, np.integer):
+        return int(data)
+    elif isinstance(data, np.ndarray):
+        return data.tolist()
+    return data
+
+def format_sse(event, data):
+    """One Server-Sent Events message with a JSON data line."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def parse_turn_request(data):
+    """
+    Pulls the session-specific state out of the /analyze_turn payload
+    and resolves the current/next question for this turn.
+    """
+    # Retrieval of session-specific state from payload
+    incoming_tracker = data.get("question_tracker") or {}
+    current_qid = incoming_tracker.get("current_qs_id")
+    next_qid = incoming_tracker.get("next_qs_id")
+
+    rolling_summary = data.get("rolling_summary") or ""
+    user_answers = data.get("user_answers") or []
+    # Keep what step 3a is sent within its token budget; older summary sentences are sent as notes
+    older_summary, prompt_summary = split_summary(rolling_summary)
+    prompt_answers, compacted_answer_ids = budget_user_answers(user_answers, current_qid)
+
+    return {
+        "session_id": data.get("session_id"),
+        # Ledger of the turn's LLM calls, returned in the response metadata
+        "usage": TurnUsage(data.get("session_id")),
+        "video_url": data.get("video_url", ""),
+        # Set when the clip was also streamed in chunks while recording (/ingest)
+        "ingest_id": data.get("ingest_id"),
+        "rolling_summary": rolling_summary,
+        "user_answers": user_answers,
+        "older_summary": older_summary,
+        "prompt_summary": prompt_summary,
+        "summary_notes": summary_notes(older_summary, user_answers),
+        "prompt_answers": prompt_answers,
+        "compacted_answer_ids": compacted_answer_ids,
+        "existing_scores": data.get("diagnostic_scores") or {},
+        "session_status": data.get("session_status", "active"),
+        "last_bot_reply": data.get("last_bot_reply", None),
+        "previously_in_crisis": data.get('crisis_detected', False),
+        "sufficient_data": data.get("sufficientDataCollected", False),
+        "incoming_tracker": incoming_tracker,
+        "incoming_unanswered": data.get("unanswered_question_ids") or [],
+        "current_qid": current_qid,
+        "next_qid": next_qid,
+        "current_question_text": get_question_data(current_qid),
+        "next_question_text": get_question_data(next_qid),
+        "score_range": get_questionnaire_score_range(current_qid)
+    }
+
+def get_reply_kwargs(turn, assembly_data, deepface_data):
+    """Keyword arguments for update_rolling_info_and_get_reply (step 3a)."""
+    return {
+        "assembly_data": assembly_data,
+        "deepface_data": deepface_data,
+        "rolling_summary": turn["prompt_summary"],
+        "summary_notes": turn["summary_notes"],
+        "user_answers": turn["prompt_answers"],
+        "score_range": turn["score_range"],
+        "current_qid": turn["current_qid"],
+        "current_question": turn["current_question_text"],
+        "next_question": turn["next_question_text"],
+        "previous_bot_reply": turn["last_bot_reply"],
+        "session_status": turn["session_status"],
+        # Free talk has no question to score
+        "include_score": COMBINED_REPLY_SCORING and turn["session_status"] != "resumed"
+    }
+
+def is_contradictory(model_output):
+    """
+    Whether the 3a reply reports a contradiction: its "contradictory" flag, or any
+    contradicting question id (the model sometimes lists ids without setting the flag).
+    """
+    contradictions = model_output.get("contradictions") or {}
+    return bool(contradictions.get("contradictory") or contradictions.get("contradicting_question_ids"))
+
+def needs_scoring(model_output):
+    """Step 3b only runs when the reply moved on: no follow-up and no contradiction."""
+    needs_followup = model_output.get("needs_followup", False)
+    return not needs_followup and not is_contradictory(model_output)
+
+def build_turn_response(turn, assembly_data, deepface_data, model_output, score_output, deepface_timeline=None):
+    """
+    Applies the 3a/3b model outputs to the session state (scores, tracker,
+    guardrails) and returns the JSON payload to be stored in Firestore.
+    score_output is {} when scoring was skipped.
+    deepface_timeline is the emotion time series from the video stage, if any.
+    """
+    transcript = assembly_data.get("transcript")
+    session_status = turn["session_status"]
+    previously_in_crisis = turn["previously_in_crisis"]
+    existing_scores = turn["existing_scores"]
+    incoming_unanswered = turn["incoming_unanswered"]
+    current_qid = turn["current_qid"]
+    next_qid = turn["next_qid"]
+    next_question_text = turn["next_question_text"]
+
+    crisis_detected = previously_in_crisis
+
+    updated_summary = model_output.get("updated_summary") or ""
+    updated_answers = restore_compacted_answers(
+        turn["user_answers"], model_output.get("updated_user_answers") or [], turn["compacted_answer_ids"])
+
+    # 3a only rewrote the newest part of the summary; the older sentences it saw as notes are kept as they were
+    rolling_summary = join_summary(turn["older_summary"], updated_summary)
+    user_answers = deduplicate_user_answers(turn["user_answers"], updated_answers)
+
+    bot_reply = model_output.get("bot_reply", "")
+
+    is_emergency = model_output.get("is_emergency") or False
+    trigger_word = model_output.get("trigger_word") or ""
+    if not previously_in_crisis and is_emergency:
+        bot_reply = CRISIS_REPLY
+        crisis_detected = True
+
+    contradictions = model_output.get("contradictions") or {}
+    contradictory = is_contradictory(model_output)
+    contradicting_ids = contradictions.get("contradicting_question_ids") or []
+
+    needs_followup = model_output.get("needs_followup", False)
+    is_answered = score_output.get("is_question_answered", False)
+    current_score = score_output.get("score", 0)
+
+    # Step 4: update scores
+    score_updates_for_firestore = {}
+    current_unanswered = list(incoming_unanswered)
+    current_tracker = dict(turn["incoming_tracker"])
+
+    # RULE 1: Progress only if answered, NO follow-up needed, AND NO contradictions detected.
+    if is_answered and not needs_followup and not contradictory:
+        current_unanswered = mark_question_answered(current_qid, current_unanswered)
+        score_updates_for_firestore[current_qid] = current_score
+
+        # Handle overlaps
+        overlaps, current_unanswered = get_overlapping_updates(current_qid, current_score, current_unanswered)
+        if isinstance(overlaps, dict):
+            score_updates_for_firestore.update(overlaps)
+        current_tracker = update_question_tracker(current_unanswered)
+        print(f"[DEBUG] Question {current_qid} marked as answered. Moving to next.")
+    else:
+        # RULE 2: If unanswered, contradictory, or needs follow-up, stay on current question.
+        print(f"[DEBUG] STAYING ON QUESTION {current_qid} FOR FOLLOW-UP/CONTRADICTION")
+
+    # RULE 3: Handle contradictory question IDs
+    for q_id in contradicting_ids:
+        # If it's the current question, we've already handled staying on it via RULE 2.
+        # If it's a DIFFERENT question that was contradicted, move it to the unanswered queue.
+        if q_id != current_qid:
+            current_unanswered = append_question_to_unanswered_list(q_id, current_unanswered)
+            print(f"[DEBUG] Question {q_id} was contradicted. Moving back to unanswered queue.")
+
+            # Reset existing score in Firestore for the contradicted question
+            prev_val = existing_scores.get(q_id, 0)
+            if prev_val != 0:
+                score_updates_for_firestore[q_id] = -prev_val
+
+    # Final Check: Are we out of questions?
+    current_qid = current_tracker.get("current_qs_id")
+    if not current_qid and session_status != "resumed" and (len(incoming_unanswered)-1) <= 0:
+        final_session_status = "ended-complete"
+        sufficient_data = True
+        if is_emergency:
+            bot_reply = END_OF_SESSION_REPLY + CRISIS_REPLY + "\n\n"
+        else:
+            bot_reply = END_OF_SESSION_REPLY
+    else:
+        final_session_status = session_status
+        sufficient_data = turn["sufficient_data"]
+
+    # Step 5: Mode indicator
+    mode_indicator = "free talk" if session_status == "resumed" else "diagnostic"
+
+    #TODO: Need to use openAI to check this, the hard-coded trauma keywords are missing a lot of loopholes and it's dangerous.
+    # Step 7: Format response for Firestore
+    # Trauma detection logic
+    transcript_lower = transcript.lower()
+    trauma_keywords = [
+        'died', 'death', 'passed away', 'funeral', 'lost my', 'lost a', 'killed', 'kill myself'
+        'abuse', 'abused', 'assault', 'assaulted', 'rape', 'raped', 'molest',
+        'accident', 'crash', 'injured', 'hurt badly', 'hospitalized',
+        'attacked', 'violence', 'witnessed', 'saw someone die', 'saw someone get',
+        'war', 'combat', 'deployed', 'shot at', 'explosion',
+        'disaster', 'hurricane', 'earthquake', 'fire', 'flood', 'tornado',
+        'trauma', 'traumatic', 'ptsd', 'traumatized',
+        'overdose', 'suicide attempt', 'tried to kill', 'attempted suicide'
+    ]
+
+    trauma_mentioned = any(keyword in transcript_lower for keyword in trauma_keywords)
+    has_pcl5_scores = any('PCL5' in key for key in score_updates_for_firestore.keys())
+    trauma_detected = trauma_mentioned or has_pcl5_scores
+
+    # Sentiment and Alignment
+    audio_sentiment = assembly_data.get("sentiment", "NEUTRAL").lower()
+    audio_confidence = assembly_data.get("sentiment_confidence", 0)
+    if deepface_timeline and deepface_timeline.get("faces_analyzed"):
+        # Already reduced by the video stage, no second pass over the scores
+        dominant_emotion = deepface_timeline["dominant_emotion"]
+    else:
+        emotions = deepface_data if isinstance(deepface_data, dict) else {}
+        dominant_emotion = max(emotions.items(), key=lambda x: x[1])[0] if emotions else "neutral"
+
+    negative_emotions = {"sad", "angry", "fear", "disgust"}
+    positive_emotions = {"happy", "surprise"}
+
+    if audio_confidence < 0.6:
+        alignment = "mismatched"
+    elif (audio_sentiment == "negative" and dominant_emotion in negative_emotions) or \
+         (audio_sentiment == "positive" and dominant_emotion in positive_emotions):
+        alignment = "aligned"
+    else:
+        alignment = "neutral" if audio_sentiment == "neutral" else "mismatched"
+
+    confidence_level = "high" if audio_confidence >= 0.8 else "medium" if audio_confidence >= 0.6 else "low"
+
+    # GUARDRAIL AGAINST BOT HALLUCINATION REPLIES
+    # When to force the next question
+    # If needs_followup is False and it's not the end of the session, we MUST have a question.
+    if not needs_followup and not contradictory and not is_emergency and final_session_status != "ended-complete":
+        bot_reply_lower = bot_reply.lower()
+        # 1.Get the core symptom text and split into words longer than 3 chars
+        raw_symptom_text = next_question_text.split(":")[-1].strip().lower()
+        keywords = [word for word in re.sub(r'[^\w\s]', '', raw_symptom_text).split() if len(word) > 3]
+
+        # 2. Check how many keywords matched (Need at least 2 for a 'Positive Match')
+        match_count = sum(1 for word in keywords if word in bot_reply_lower)
+
+        # 3. Identify stalling phrases
+        stalling_phrases = ["explore this further", "clear picture", "ensure we have", "understand better"]
+        has_stalling_phrase = any(p in bot_reply_lower for p in stalling_phrases)
+
+        # 4. Only override if:
+        # -The bot didn't mention the core topic (low match_count)
+        # -OR it used a known stalling phrase
+        # -OR it didn't end with a question mark
+        ends_with_question = bot_reply.strip().endswith("?")
+        if (match_count < 2 and len(keywords) >= 2) or has_stalling_phrase or not ends_with_question:
+            print(f"[GUARDRAIL] Intervention needed. Keywords found: {match_count}/{len(keywords)}")
+
+            perfect_question = get_natural_question(next_qid, next_question_text)
+            if next_qid == None:
+                final_session_status = "ended-complete"
+                sufficient_data = True
+            sentences = re.split(r'(?<=[.!?]) +', bot_reply)
+            empathy_part = sentences[0] if sentences else "I understand."
+            bot_reply = f"{empathy_part} {perfect_question}"
+        else:
+            print(f"[GUARDRAIL] Pass. AI correctly transitioned.")
+
+    if contradictory:
+        # If the bot tried to move on during a contradiction, force it back
+        if next_question_text.lower() in bot_reply.lower():
+            print(f"[GUARDRAIL] Bot tried to move on during contradiction. Forcing resolution.")
+            bot_reply = f"I want to make sure I'm following you correctly. {contradictions.get('reason', 'Earlier we discussed something different.')} Which of these feels more accurate for you lately?"
+
+    response_payload = {
+        "text": bot_reply,
+        "diagnostic_scores": score_updates_for_firestore,
+        "metadata": {
+            "conversation_type": mode_indicator,
+            "crisis_detected": crisis_detected,
+            "audio_video_alignment": alignment,
+            "confidence_level": confidence_level,
+            "video_frames_used": deepface_timeline.get("frames_used", 0) if deepface_timeline else 0,
+            "video_stop_reason": deepface_timeline.get("stop_reason") if deepface_timeline else None,
+            "token_usage": turn["usage"].finish()
+        },
+        "user_answers": user_answers,
+        "rolling_summary": rolling_summary,
+        "assemblyAI_output": assembly_data,
+        "deepface_output": deepface_data,
+        "diagnostic_match": len(score_updates_for_firestore) > 0,
+        "emergency": True if (is_emergency and not previously_in_crisis) else False,
+        "trauma_detected": trauma_detected,
+        "session_status": final_session_status,
+        "sufficientDataCollected": sufficient_data,
+        "question_tracker": current_tracker,
+        "unanswered_question_ids": current_unanswered
+    }
+    if RETURN_EMOTION_TIMELINE and deepface_timeline:
+        response_payload["deepface_timeline"] = deepface_timeline
+
+    return response_payload
@@ -0,0 +1,59 @@
+import os
+import glob
+import time
+
+import cv2
+import numpy as np
+
+from app.services.frame_sampler import sample_frames
+from app.services.emotion_model import EMOTION_LABELS, detect_faces, preprocess_face, predict_emotions
+
+VIDEO_EXTENSIONS = (".webm", ".mp4", ".mov", ".mkv")
+
+def find_clips(clip_dir):
+    """Every video file directly inside clip_dir, sorted by name."""
+    return sorted(
+        path for path in glob.glob(os.path.join(clip_dir, "*"))
+        if path.lower().endswith(VIDEO_EXTENSIONS)
+    )
+
+def load_sampled_frames(clip_path):
+    """Decodes a clip once with the production sampler so every variant sees the same frames."""
+    cap = cv2.VideoCapture(clip_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video file: {clip_path}")
+    try:
+        return [frame for _, _, frame in sample_frames(cap, video_path=clip_path)]
+    finally:
+        cap.release()
+
+def score_clip(frames, max_side=None, detector_backend=None):
+    """
+    Runs detect_faces -> preprocess_face -> predict_emotions on every frame (no tracking).
+    Returns (averaged emotions, seconds spent, frames with a detected face).
+    """
+    started_at = time.perf_counter()
+    face_inputs = []
+    frames_with_face = 0
+    for frame in frames:
+        faces = detect_faces(frame, max_side=max_side, detector_backend=detector_backend)
+        if any(face.get("confidence", 0) > 0 for face in faces):
+            frames_with_face += 1
+        face_inputs.extend(preprocess_face(face["face"]) for face in faces)
+    scores = predict_emotions(face_inputs)
+    elapsed = time.perf_counter() - started_at
+
+    emotions = {}
+    if len(scores):
+        emotions = dict(zip(EMOTION_LABELS, np.round(scores.mean(axis=0), 4).tolist()))
+    return emotions, elapsed, frames_with_face
+
+def dominant(emotions):
+    return max(emotions.items(), key=lambda x: x[1])[0] if emotions else None
+
+def mean_abs_diff(emotions, reference):
+    """Average absolute difference in percentage points over the emotions both dicts share."""
+    keys = set(emotions) & set(reference)
+    if not keys:
+        return None
+    return sum(abs(emotions[k] - reference[k]) for k in keys) / len(keys)
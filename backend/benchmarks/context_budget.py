@@ -0,0 +1,53 @@
+"""
+Prompt size per turn across a recorded session, with and without the context
+token budget (SUMMARY_TOKEN_BUDGET / ANSWERS_TOKEN_BUDGET). No API calls.
+
+Usage (from backend/):
+    python -m benchmarks.context_budget session.jsonl
+
+session.jsonl holds the session's /analyze_turn JSON payloads in order, one per
+line, each with the "transcript" of that turn. Prints the step 3a and 3b prompt
+tokens of every turn for the full context and for what the budget sends.
+"""
+import sys
+import json
+import argparse
+
+from app.utils.turn_handler import parse_turn_request, get_reply_kwargs
+from app.services.openai_client import _build_reply_messages, _build_score_messages
+from app.utils.num_tokens import num_tokens_from_messages
+from benchmarks.report import print_table
+
+def prompt_tokens(turn, assembly_data, budgeted):
+    """Step 3a and 3b prompt tokens of a turn; budgeted=False sends the stored context in full."""
+    kwargs = get_reply_kwargs(turn, assembly_data, {})
+    if not budgeted:
+        kwargs.update(rolling_summary=turn["rolling_summary"], summary_notes=None, user_answers=turn["user_answers"])
+    score_messages = _build_score_messages(
+        assembly_data["transcript"], turn["rolling_summary"], turn["current_question_text"], turn["score_range"],
+        summary_budget=None if budgeted else 0)
+    return num_tokens_from_messages(_build_reply_messages(**kwargs)), num_tokens_from_messages(score_messages)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("session_path")
+    args = parser.parse_args(argv)
+
+    rows = []
+    with open(args.session_path) as f:
+        for number, line in enumerate((l for l in f if l.strip()), start=1):
+            record = json.loads(line)
+            turn = parse_turn_request(record)
+            assembly_data = {"transcript": record["transcript"], "sentiment": "NEUTRAL", "sentiment_confidence": 0.0}
+            full_3a, full_3b = prompt_tokens(turn, assembly_data, budgeted=False)
+            budget_3a, budget_3b = prompt_tokens(turn, assembly_data, budgeted=True)
+            rows.append([number, len(turn["user_answers"]), len(turn["compacted_answer_ids"]),
+                         full_3a, budget_3a, full_3b, budget_3b])
+    if not rows:
+        print(f"No turns in {args.session_path}")
+        return 1
+    print_table(["turn", "answers", "as notes", "3a full", "3a budgeted", "3b full", "3b budgeted"], rows)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Accuracy/latency trade-off of downscaling frames before face detection.
+
+Usage (from backend/):
+    python -m benchmarks.detection_resolution <clip_dir> [--sizes 0,1080,720,640,480,360]
+
+For every detection size, each clip's sampled frames go through
+detect_faces -> preprocess_face -> predict_emotions. Results are compared
+with the full-resolution run (size 0): mean absolute difference of the
+averaged emotions, dominant-emotion agreement and face detection rate.
+"""
+import sys
+import argparse
+
+import numpy as np
+
+from app.services.emotion_model import warm_up_models
+from benchmarks.common import find_clips, load_sampled_frames, score_clip, dominant, mean_abs_diff
+from benchmarks.report import print_table
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clip_dir")
+    parser.add_argument("--sizes", default="0,1080,720,640,480,360",
+                        help="comma-separated max sides to test, 0 = full resolution (the reference)")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    if 0 not in sizes:
+        sizes.insert(0, 0)
+    clips = find_clips(args.clip_dir)
+    if not clips:
+        print(f"No clips found in {args.clip_dir}")
+        return 1
+
+    warm_up_models()
+    totals = {size: {"seconds": 0.0, "frames": 0, "with_face": 0, "diffs": [], "agree": 0} for size in sizes}
+    for clip in clips:
+        frames = load_sampled_frames(clip)
+        reference = None
+        for size in sizes:
+            emotions, elapsed, with_face = score_clip(frames, max_side=size)
+            if size == 0:
+                reference = emotions
+            total = totals[size]
+            total["seconds"] += elapsed
+            total["frames"] += len(frames)
+            total["with_face"] += with_face
+            diff = mean_abs_diff(emotions, reference) if reference else None
+            if diff is not None:
+                total["diffs"].append(diff)
+            total["agree"] += int(dominant(emotions) == dominant(reference))
+        print(f"[DEBUG] {clip}: {len(frames)} sampled frames")
+
+    rows = []
+    for size in sizes:
+        total = totals[size]
+        frames = max(total["frames"], 1)
+        rows.append([
+            "full" if size == 0 else size,
+            f"{1000 * total['seconds'] / frames:.1f}",
+            f"{frames / total['seconds']:.1f}" if total["seconds"] else "-",
+            f"{100 * total['with_face'] / frames:.1f}%",
+            f"{np.mean(total['diffs']):.2f}" if total["diffs"] else "-",
+            f"{100 * total['agree'] / len(clips):.0f}%"
+        ])
+    print()
+    print_table(["max side", "ms/frame", "frames/s", "face found", "emotion MAD (pp)", "dominant agrees"], rows)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
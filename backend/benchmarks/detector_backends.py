@@ -0,0 +1,121 @@
+"""
+Compares DeepFace face detector backends on a directory of sample clips.
+
+Usage (from backend/):
+    python -m benchmarks.detector_backends <clip_dir> [--backends opencv,ssd,mtcnn,retinaface]
+
+Each backend runs in its own Python process so peak RSS covers only that
+detector (plus the shared Emotion model). Every clip's sampled frames go through
+detect_faces -> preprocess_face -> predict_emotions without tracking, at the
+configured VIDEO_DETECTION_MAX_SIDE. The first backend is the reference for
+dominant-emotion agreement. Set the winner with VIDEO_DETECTOR_BACKEND.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from benchmarks.common import find_clips, dominant
+from benchmarks.report import print_table
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None when the platform doesn't report it."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return None
+
+def run_backend(detector_backend, clips):
+    """Worker side: benchmarks one backend in this process and returns a JSON-able result."""
+    import numpy as np
+    from app.services.emotion_model import detect_faces, warm_up_models
+    from benchmarks.common import load_sampled_frames, score_clip
+
+    # Build the detector and Emotion model before anything is timed
+    warm_up_models()
+    detect_faces(np.zeros((224, 224, 3), dtype=np.uint8), detector_backend=detector_backend)
+
+    result = {"clips": {}, "seconds": 0.0, "frames": 0, "with_face": 0}
+    for clip in clips:
+        frames = load_sampled_frames(clip)
+        emotions, elapsed, with_face = score_clip(frames, detector_backend=detector_backend)
+        result["clips"][clip] = emotions
+        result["seconds"] += elapsed
+        result["frames"] += len(frames)
+        result["with_face"] += with_face
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def spawn_backend(detector_backend, clip_dir):
+    """Runs run_backend in a fresh interpreter and returns its result, or None if it failed."""
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.detector_backends", clip_dir, "--worker", detector_backend],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        stdout=subprocess.PIPE, text=True
+    )
+    if completed.returncode != 0:
+        print(f"[ERROR] Detector backend {detector_backend} failed (exit code {completed.returncode})")
+        return None
+    # The worker prints its result as the last stdout line; DeepFace may log above it
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clip_dir")
+    parser.add_argument("--backends", default="opencv,ssd,mtcnn,retinaface",
+                        help="comma-separated DeepFace detector backends; the first is the reference")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    clips = find_clips(args.clip_dir)
+    if not clips:
+        print(f"No clips found in {args.clip_dir}")
+        return 1
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, clips)))
+        return 0
+
+    backends = [b.strip().lower() for b in args.backends.split(",") if b.strip()]
+    results = {}
+    for backend in backends:
+        print(f"[DEBUG] Benchmarking detector backend {backend} on {len(clips)} clips")
+        results[backend] = spawn_backend(backend, args.clip_dir)
+
+    reference = results.get(backends[0])
+    rows = []
+    for backend in backends:
+        result = results[backend]
+        if result is None:
+            rows.append([backend, "failed", "-", "-", "-", "-"])
+            continue
+        frames = max(result["frames"], 1)
+        agreement = "-"
+        if reference is not None:
+            agree = sum(
+                dominant(result["clips"][clip]) == dominant(reference["clips"][clip]) for clip in clips
+            )
+            agreement = f"{100 * agree / len(clips):.0f}%"
+        rows.append([
+            backend,
+            f"{frames / result['seconds']:.1f}" if result["seconds"] else "-",
+            f"{1000 * result['seconds'] / frames:.1f}",
+            f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] is not None else "-",
+            f"{100 * result['with_face'] / frames:.1f}%",
+            agreement
+        ])
+    print()
+    print_table(["backend", "frames/s", "ms/frame", "peak RSS (MB)", "face found", f"dominant agrees w/ {backends[0]}"], rows)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
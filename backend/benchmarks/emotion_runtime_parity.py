@@ -0,0 +1,97 @@
+"""
+Parity and speed check of an exported emotion model against the Keras model.
+
+Usage (from backend/):
+    python -m benchmarks.emotion_runtime_parity onnx models/emotion.onnx <clip_dir> [--tolerance 2.0]
+
+Faces are detected once per sampled frame, then the same preprocessed crops go
+through both models. Reports per-face and per-clip differences (percentage
+points), dominant-emotion agreement and throughput. Exits with 1 when the
+clip-level emotions drift more than --tolerance or a dominant emotion flips,
+so it can gate a model export.
+"""
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from app.services.emotion_model import EMOTION_LABELS, get_emotion_model, detect_faces, preprocess_face
+from app.services.emotion_runtime import load_runtime_model
+from benchmarks.common import find_clips, load_sampled_frames
+from benchmarks.report import print_table
+
+def percentages(model, face_inputs, batch_size=32):
+    """(N, 7) percentages like emotion_model.predict_emotions, plus the seconds it took."""
+    batch = np.asarray(face_inputs, dtype=np.float32)
+    started_at = time.perf_counter()
+    predictions = np.concatenate([
+        np.asarray(model.predict_on_batch(batch[start:start + batch_size]))
+        for start in range(0, len(batch), batch_size)
+    ])
+    elapsed = time.perf_counter() - started_at
+    return 100 * predictions / predictions.sum(axis=1, keepdims=True), elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("runtime", choices=["onnx", "tflite"])
+    parser.add_argument("model_path")
+    parser.add_argument("clip_dir")
+    parser.add_argument("--tolerance", type=float, default=2.0,
+                        help="largest allowed clip-level difference of any emotion, in percentage points")
+    args = parser.parse_args(argv)
+
+    clips = find_clips(args.clip_dir)
+    if not clips:
+        print(f"No clips found in {args.clip_dir}")
+        return 1
+
+    reference_model = get_emotion_model().model
+    runtime_model = load_runtime_model(args.runtime, args.model_path)
+    # Warm both so graph construction / session setup isn't timed
+    dummy = np.zeros((1, 48, 48, 1), dtype=np.float32)
+    reference_model.predict_on_batch(dummy)
+    runtime_model.predict_on_batch(dummy)
+
+    rows = []
+    failed = False
+    timings = {"keras": 0.0, args.runtime: 0.0}
+    total_faces = 0
+    for clip in clips:
+        face_inputs = [
+            preprocess_face(face["face"])
+            for frame in load_sampled_frames(clip)
+            for face in detect_faces(frame)
+        ]
+        if not face_inputs:
+            continue
+        reference, reference_seconds = percentages(reference_model, face_inputs)
+        candidate, candidate_seconds = percentages(runtime_model, face_inputs)
+        timings["keras"] += reference_seconds
+        timings[args.runtime] += candidate_seconds
+        total_faces += len(face_inputs)
+
+        per_face = np.abs(candidate - reference).max(axis=1)
+        clip_diff = float(np.abs(candidate.mean(axis=0) - reference.mean(axis=0)).max())
+        reference_dominant = EMOTION_LABELS[int(np.argmax(reference.mean(axis=0)))]
+        candidate_dominant = EMOTION_LABELS[int(np.argmax(candidate.mean(axis=0)))]
+        face_agreement = float(np.mean(np.argmax(candidate, axis=1) == np.argmax(reference, axis=1)))
+        ok = clip_diff <= args.tolerance and reference_dominant == candidate_dominant
+        failed = failed or not ok
+        rows.append([
+            clip.split("/")[-1], len(face_inputs),
+            f"{per_face.max():.2f}", f"{clip_diff:.2f}",
+            f"{100 * face_agreement:.0f}%",
+            f"{reference_dominant}/{candidate_dominant}",
+            "ok" if ok else "DRIFT"
+        ])
+
+    print_table(["clip", "faces", "max face diff", "clip diff", "face argmax agrees", "dominant keras/" + args.runtime, ""], rows)
+    if total_faces:
+        print()
+        for name, seconds in timings.items():
+            print(f"{name}: {1000 * seconds / total_faces:.3f} ms/face")
+    return 1 if failed or not rows else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Accuracy/latency trade-off of tracking the face between sampled frames.
+
+Usage (from backend/):
+    python -m benchmarks.face_tracking <clip_dir> [--redetect-every 5,10,20]
+
+Each clip's sampled frames are scored once with detect_faces on every frame
+(the reference, VIDEO_FACE_TRACKING=0) and once per FaceTracker setting.
+Results are compared with the reference: mean absolute difference of the
+averaged emotions, dominant-emotion agreement and full detections per frame.
+"""
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from app.services.emotion_model import EMOTION_LABELS, preprocess_face, predict_emotions, warm_up_models
+from app.services.face_tracker import FaceTracker
+from benchmarks.common import find_clips, load_sampled_frames, score_clip, dominant, mean_abs_diff
+from benchmarks.report import print_table
+
+def score_clip_tracked(frames, redetect_every):
+    """score_clip with a FaceTracker in front of detection. Returns (emotions, seconds, full detections)."""
+    started_at = time.perf_counter()
+    tracker = FaceTracker(redetect_every=redetect_every)
+    face_inputs = []
+    for frame in frames:
+        face_inputs.extend(preprocess_face(face["face"]) for face in tracker.faces(frame))
+    scores = predict_emotions(face_inputs)
+    elapsed = time.perf_counter() - started_at
+
+    emotions = {}
+    if len(scores):
+        emotions = dict(zip(EMOTION_LABELS, np.round(scores.mean(axis=0), 4).tolist()))
+    return emotions, elapsed, tracker.detections
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clip_dir")
+    parser.add_argument("--redetect-every", default="5,10,20",
+                        help="comma-separated TRACKING_REDETECT_EVERY values to test (0 = never force)")
+    args = parser.parse_args(argv)
+
+    variants = [None] + [int(n) for n in args.redetect_every.split(",")]
+    clips = find_clips(args.clip_dir)
+    if not clips:
+        print(f"No clips found in {args.clip_dir}")
+        return 1
+
+    warm_up_models()
+    totals = {variant: {"seconds": 0.0, "frames": 0, "detections": 0, "diffs": [], "agree": 0} for variant in variants}
+    for clip in clips:
+        frames = load_sampled_frames(clip)
+        reference = None
+        for variant in variants:
+            if variant is None:
+                emotions, elapsed, _ = score_clip(frames)
+                detections = len(frames)
+                reference = emotions
+            else:
+                emotions, elapsed, detections = score_clip_tracked(frames, variant)
+            total = totals[variant]
+            total["seconds"] += elapsed
+            total["frames"] += len(frames)
+            total["detections"] += detections
+            diff = mean_abs_diff(emotions, reference) if reference else None
+            if diff is not None:
+                total["diffs"].append(diff)
+            total["agree"] += int(dominant(emotions) == dominant(reference))
+        print(f"[DEBUG] {clip}: {len(frames)} sampled frames")
+
+    rows = []
+    for variant in variants:
+        total = totals[variant]
+        frames = max(total["frames"], 1)
+        rows.append([
+            "detect every frame" if variant is None else f"track, redetect every {variant}",
+            f"{1000 * total['seconds'] / frames:.1f}",
+            f"{total['detections'] / frames:.2f}",
+            f"{np.mean(total['diffs']):.2f}" if total["diffs"] else "-",
+            f"{100 * total['agree'] / len(clips):.0f}%"
+        ])
+    print()
+    print_table(["variant", "ms/frame", "detections/frame", "emotion MAD (pp)", "dominant agrees"], rows)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
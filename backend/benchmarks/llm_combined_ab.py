@@ -0,0 +1,124 @@
+"""
+A/B comparison of the two-call LLM stage (3a reply, then 3b score) with the
+combined single-call mode (COMBINED_REPLY_SCORING=1). Calls the OpenAI API.
+
+Usage (from backend/):
+    python -m benchmarks.llm_combined_ab turns.jsonl [--repeats 1]
+
+turns.jsonl holds one recorded turn per line: the /analyze_turn JSON payload
+plus "transcript" (and optionally "sentiment", "sentiment_confidence" and
+"deepface_output"). Only active (diagnostic) turns are compared.
+
+Reports how often both paths agree on needs_followup, on whether the question
+was answered and on the score, plus latency and prompt tokens per turn.
+"""
+import sys
+import json
+import time
+import argparse
+
+from app.utils.turn_handler import parse_turn_request, get_reply_kwargs, needs_scoring
+from app.services.openai_client import update_rolling_info_and_get_reply, get_current_question_score, \
+    pop_combined_score, _build_reply_messages, _build_score_messages
+from app.utils.num_tokens import num_tokens_from_messages
+from benchmarks.report import print_table
+
+def load_turns(path):
+    turns = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            turn = parse_turn_request(record)
+            if turn["session_status"] == "resumed":
+                continue
+            assembly_data = {
+                "transcript": record["transcript"],
+                "sentiment": record.get("sentiment", "NEUTRAL"),
+                "sentiment_confidence": record.get("sentiment_confidence", 0.0)
+            }
+            turns.append((turn, assembly_data, record.get("deepface_output") or {}))
+    return turns
+
+def run_two_call(turn, assembly_data, deepface_data):
+    kwargs = dict(get_reply_kwargs(turn, assembly_data, deepface_data), include_score=False)
+    started_at = time.perf_counter()
+    model_output = update_rolling_info_and_get_reply(**kwargs)
+    tokens = num_tokens_from_messages(_build_reply_messages(**kwargs))
+    score_output = {"score": 0, "is_question_answered": False}
+    if needs_scoring(model_output):
+        score_args = (
+            assembly_data["transcript"], model_output.get("updated_summary") or "",
+            turn["current_question_text"], turn["score_range"]
+        )
+        score_output = get_current_question_score(*score_args)
+        tokens += num_tokens_from_messages(_build_score_messages(*score_args))
+    return model_output, score_output, time.perf_counter() - started_at, tokens
+
+def run_combined(turn, assembly_data, deepface_data):
+    kwargs = dict(get_reply_kwargs(turn, assembly_data, deepface_data), include_score=True)
+    started_at = time.perf_counter()
+    model_output = update_rolling_info_and_get_reply(**kwargs)
+    score_output = pop_combined_score(model_output) or {"score": 0, "is_question_answered": False}
+    if not needs_scoring(model_output):
+        score_output = {"score": 0, "is_question_answered": False}
+    return model_output, score_output, time.perf_counter() - started_at, num_tokens_from_messages(_build_reply_messages(**kwargs))
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("turns_path")
+    parser.add_argument("--repeats", type=int, default=1, help="run every turn this many times per path")
+    args = parser.parse_args(argv)
+
+    turns = load_turns(args.turns_path)
+    if not turns:
+        print(f"No active turns in {args.turns_path}")
+        return 1
+
+    stats = {"followup": 0, "answered": 0, "score": 0, "both_answered": 0, "score_diffs": []}
+    timings = {"two_call": [], "combined": []}
+    tokens = {"two_call": [], "combined": []}
+    runs = 0
+    for turn, assembly_data, deepface_data in turns:
+        for _ in range(args.repeats):
+            a_output, a_score, a_seconds, a_tokens = run_two_call(turn, assembly_data, deepface_data)
+            b_output, b_score, b_seconds, b_tokens = run_combined(turn, assembly_data, deepface_data)
+            runs += 1
+            timings["two_call"].append(a_seconds)
+            timings["combined"].append(b_seconds)
+            tokens["two_call"].append(a_tokens)
+            tokens["combined"].append(b_tokens)
+
+            stats["followup"] += int(bool(a_output.get("needs_followup")) == bool(b_output.get("needs_followup")))
+            a_answered, b_answered = bool(a_score["is_question_answered"]), bool(b_score["is_question_answered"])
+            stats["answered"] += int(a_answered == b_answered)
+            if a_answered and b_answered:
+                stats["both_answered"] += 1
+                stats["score"] += int(a_score["score"] == b_score["score"])
+                stats["score_diffs"].append(abs((a_score["score"] or 0) - (b_score["score"] or 0)))
+            print(f"[DEBUG] {turn['current_qid']}: two-call score {a_score}, combined score {b_score}")
+
+    both = max(stats["both_answered"], 1)
+    print()
+    print_table(["metric", "value"], [
+        ["turns x repeats", runs],
+        ["needs_followup agrees", f"{100 * stats['followup'] / runs:.0f}%"],
+        ["is_question_answered agrees", f"{100 * stats['answered'] / runs:.0f}%"],
+        ["score agrees (both answered)", f"{100 * stats['score'] / both:.0f}% of {stats['both_answered']}"],
+        ["mean |score diff|", f"{_mean(stats['score_diffs']):.2f}" if stats["score_diffs"] else "-"]
+    ])
+    print()
+    rows = []
+    for path in ("two_call", "combined"):
+        mean_tokens = _mean(tokens[path])
+        rows.append([path, f"{_mean(timings[path]):.2f}", f"{mean_tokens:.0f}" if mean_tokens is not None else "-"])
+    print_table(["path", "mean seconds/turn", "mean prompt tokens/turn"], rows)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Checks how much of each LLM prompt is a byte-stable prefix that OpenAI's prompt
+cache can serve (it caches prefixes of 1024+ tokens, in 128-token steps).
+
+Usage (from backend/):
+    python -m benchmarks.prompt_prefix session.jsonl [--live]
+
+session.jsonl holds the session's /analyze_turn JSON payloads in order, one per
+line, each with the "transcript" of that turn (same format as
+benchmarks.context_budget). Without --live nothing is sent: the shared prefix of
+the step 3a and 3b messages across all turns is measured offline. With --live
+every turn's 3a and 3b calls are made and the cached tokens OpenAI reports are
+printed per turn (the first call of a prefix is always a miss).
+"""
+import os
+import sys
+import json
+import argparse
+
+from app.utils.turn_handler import parse_turn_request, get_reply_kwargs
+from app.utils.token_usage import TurnUsage
+from app.utils.num_tokens import num_tokens_from_messages, num_tokens_from_string
+from app.services.openai_client import _build_reply_messages, _build_score_messages, \
+    update_rolling_info_and_get_reply, get_current_question_score
+from benchmarks.report import print_table
+
+# Smallest prompt OpenAI caches
+MIN_CACHED_PROMPT_TOKENS = 1024
+
+def load_session(path):
+    turns = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            assembly_data = {"transcript": record["transcript"], "sentiment": "NEUTRAL", "sentiment_confidence": 0.0}
+            turns.append((parse_turn_request(record), assembly_data))
+    return turns
+
+def _serialize(messages):
+    """Messages in the order the provider sees them, for prefix comparison."""
+    return "".join(f"<{m['role']}>{m['content']}" for m in messages)
+
+def shared_prefix_tokens(prompts):
+    """Tokens of the longest prefix all serialized prompts share."""
+    prefix = os.path.commonprefix(prompts)
+    return num_tokens_from_string(prefix) if prefix else 0
+
+def offline_rows(turns):
+    stages = {"3a": [], "3b": []}
+    for turn, assembly_data in turns:
+        stages["3a"].append(_build_reply_messages(**get_reply_kwargs(turn, assembly_data, {})))
+        stages["3b"].append(_build_score_messages(
+            assembly_data["transcript"], turn["rolling_summary"], turn["current_question_text"], turn["score_range"]))
+    rows = []
+    for stage, prompts in stages.items():
+        mean_tokens = sum(num_tokens_from_messages(m) for m in prompts) / len(prompts)
+        prefix = shared_prefix_tokens([_serialize(m) for m in prompts])
+        cacheable = prefix if prefix >= MIN_CACHED_PROMPT_TOKENS else 0
+        rows.append([stage, f"{mean_tokens:.0f}", prefix, f"{100 * cacheable / mean_tokens:.0f}%"])
+    return rows
+
+def live_rows(turns):
+    rows = []
+    for number, (turn, assembly_data) in enumerate(turns, start=1):
+        usage = TurnUsage()
+        model_output = update_rolling_info_and_get_reply(**get_reply_kwargs(turn, assembly_data, {}), usage=usage)
+        get_current_question_score(
+            assembly_data["transcript"], model_output.get("updated_summary") or turn["rolling_summary"],
+            turn["current_question_text"], turn["score_range"], usage=usage)
+        stages = usage.summary()["stages"]
+        for stage in ("3a", "3b"):
+            totals = stages.get(stage)
+            if totals:
+                rows.append([number, stage, totals["prompt_tokens"], totals["cached_tokens"],
+                             f"{100 * totals['cache_hit_rate']:.0f}%"])
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("session_path")
+    parser.add_argument("--live", action="store_true", help="call the OpenAI API and report cached tokens")
+    args = parser.parse_args(argv)
+
+    turns = load_session(args.session_path)
+    if not turns:
+        print(f"No turns in {args.session_path}")
+        return 1
+    if args.live:
+        print_table(["turn", "stage", "prompt tokens", "cached tokens", "hit rate"], live_rows(turns))
+    else:
+        print_table(["stage", "mean prompt tokens", "shared prefix tokens", "cacheable share"], offline_rows(turns))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
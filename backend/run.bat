@@ -1,3 +1,3 @@
 @echo off
-flask --app app.main run --host=0.0.0.0 --port=8000
+flask --app "app.main:create_app()" run --host=0.0.0.0 --port=8000
 pause
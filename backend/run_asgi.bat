@@ -0,0 +1,3 @@
+@echo off
+uvicorn app.asgi:app --host=0.0.0.0 --port=8000
+pause
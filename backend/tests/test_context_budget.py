@@ -0,0 +1,65 @@
+import os
+import pytest
+
+pytest.importorskip("tiktoken")
+pytest.importorskip("openai")
+pytest.importorskip("pydantic")
+
+from app.utils.num_tokens import get_encoding
+
+try:
+    get_encoding()
+except Exception as e:
+    # tiktoken downloads the encoding on first use
+    pytest.skip(f"o200k_base encoding unavailable: {e}", allow_module_level=True)
+
+# The OpenAI clients are built at import; no request is made here
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.utils.context_budget import split_summary, summary_notes
+from app.services.openai_client import _build_reply_messages
+
+USER_ANSWERS = [
+    {"question_id": "PHQ9_3", "question": "Trouble falling or staying asleep, or sleeping too much?",
+     "evidence": "I sleep well, eight hours every night", "answer": "Not at all", "contradictory": False},
+    {"question_id": "PHQ9_4", "question": "Feeling tired or having little energy?",
+     "evidence": "I get tired in the afternoons at work", "answer": "Several days", "contradictory": False},
+]
+
+EARLY_SENTENCE = "User said they sleep well, about eight hours every night."
+LATER_SENTENCES = " ".join(
+    f"In turn {n} the user talked about work deadlines, their commute and weekend plans with friends."
+    for n in range(2, 40)
+)
+
+def test_contradiction_with_an_early_turn_is_still_sent():
+    rolling_summary = f"{EARLY_SENTENCE} {LATER_SENTENCES}"
+    older, recent = split_summary(rolling_summary, budget=200)
+    assert EARLY_SENTENCE not in recent
+
+    # Far fewer tokens than the older sentences take: most of them are dropped
+    notes = summary_notes(older, USER_ANSWERS, budget=150)
+    assert notes[0]["question_id"] == "PHQ9_3"
+    assert "sleep well" in notes[0]["notes"]
+
+    messages = _build_reply_messages(
+        {"transcript": "I haven't slept more than four hours a night for weeks."}, {},
+        recent, USER_ANSWERS, "0-3", "PHQ9_4", "Feeling tired or having little energy?", "",
+        summary_notes=notes)
+    prompt = messages[-1]["content"]
+    assert "EARLIER SUMMARY NOTES" in prompt
+    assert "sleep well, about eight hours every night" in prompt
+
+def test_notes_budget_drops_the_oldest_notes_but_the_first_of_each_question():
+    older, _ = split_summary(LATER_SENTENCES, budget=100)
+    notes = summary_notes(older, USER_ANSWERS, budget=150)
+    assert len(notes) == 1
+    assert notes[0]["notes"].startswith("In turn 2 ")
+    assert "In turn 3 " not in notes[0]["notes"]
+    # The newest of the older sentences are kept
+    assert notes[0]["notes"].endswith(older.split("In turn ")[-1])
+
+def test_summary_within_budget_has_no_notes():
+    older, recent = split_summary(EARLY_SENTENCE, budget=200)
+    assert summary_notes(older, USER_ANSWERS) == []
+    assert recent == EARLY_SENTENCE
@@ -0,0 +1,23 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("deepface")
+
+from app.services import deepface_service, emotion_series
+from app.services.deepface_service import analyze_frames
+
+def _frames(count):
+    for index in range(count):
+        yield index, index * 0.5, np.zeros((48, 48, 3), dtype=np.uint8)
+
+def test_no_face_early_stop_still_reports_frames_used(monkeypatch):
+    monkeypatch.setattr(deepface_service, "VIDEO_EMOTION_MODE", "batched")
+    monkeypatch.setattr(deepface_service, "VIDEO_FACE_TRACKING", False)
+    monkeypatch.setattr(emotion_series, "VIDEO_MAX_FACELESS_FRAMES", 3)
+    # DeepFace's whole-frame stand-in when enforce_detection is off
+    monkeypatch.setattr(deepface_service, "detect_faces", lambda frame: [{"face": frame, "confidence": 0}])
+
+    emotions, timeline = analyze_frames(_frames(20), adaptive=True)
+    assert emotions == {}
+    assert timeline == {"faces_analyzed": 0, "frames_used": 3, "stop_reason": "no_face"}
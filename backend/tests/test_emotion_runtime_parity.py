@@ -0,0 +1,83 @@
+import importlib.util
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("tensorflow")
+pytest.importorskip("deepface")
+
+from app.services.emotion_model import get_emotion_model
+from app.services.emotion_runtime import load_runtime_model
+from tools.export_emotion_model import export_onnx, export_tflite
+
+# Float exports only differ from Keras by rounding
+MAX_ABS_DIFF = 1e-4
+# Full int8 models are off by a few quantization steps of the 0-1 scores
+INT8_MAX_ABS_DIFF = 0.1
+
+def _has_module(name):
+    return importlib.util.find_spec(name) is not None
+
+@pytest.fixture(scope="module")
+def keras_model():
+    try:
+        return get_emotion_model().model
+    except Exception as e:
+        # First use downloads DeepFace's weights
+        pytest.skip(f"Emotion model unavailable: {e}")
+
+@pytest.fixture(scope="module")
+def faces():
+    return np.random.default_rng(0).random((16, 48, 48, 1), dtype=np.float32)
+
+def _assert_parity(runtime_model, keras_model, faces):
+    expected = keras_model.predict_on_batch(faces)
+    actual = runtime_model.predict_on_batch(faces)
+    assert actual.shape == expected.shape
+    assert np.abs(actual - expected).max() < MAX_ABS_DIFF
+    assert (actual.argmax(axis=1) == expected.argmax(axis=1)).all()
+
+@pytest.mark.skipif(not (_has_module("onnxruntime") and _has_module("tf2onnx")),
+                    reason="needs requirements-emotion-runtimes.txt")
+def test_onnx_runtime_matches_keras(tmp_path, keras_model, faces):
+    model_path = str(tmp_path / "emotion.onnx")
+    export_onnx(keras_model, model_path)
+    _assert_parity(load_runtime_model("onnx", model_path), keras_model, faces)
+
+@pytest.fixture(scope="module")
+def tflite_path(tmp_path_factory, keras_model):
+    model_path = str(tmp_path_factory.mktemp("tflite") / "emotion.tflite")
+    export_tflite(keras_model, model_path)
+    return model_path
+
+def test_tflite_runtime_matches_keras(tflite_path, keras_model, faces):
+    # Runs on tflite_runtime when installed, else on tensorflow.lite
+    _assert_parity(load_runtime_model("tflite", tflite_path), keras_model, faces)
+
+def test_int8_tflite_runtime_matches_keras(tmp_path, keras_model, faces):
+    model_path = str(tmp_path / "emotion-int8.tflite")
+    calibration = np.random.default_rng(1).random((64, 48, 48, 1), dtype=np.float32)
+    export_tflite(keras_model, model_path, calibration_faces=calibration)
+    model = load_runtime_model("tflite", model_path)
+
+    # Inputs and outputs are int8 tensors, converted by the runtime model
+    expected = keras_model.predict_on_batch(faces)
+    actual = model.predict_on_batch(faces)
+    assert actual.dtype == np.float32
+    assert np.abs(actual - expected).max() < INT8_MAX_ABS_DIFF
+    assert (actual.argmax(axis=1) == expected.argmax(axis=1)).mean() >= 0.8
+
+def test_tflite_runtime_is_safe_to_share_between_threads(tflite_path, faces):
+    model = load_runtime_model("tflite", tflite_path)
+    # Each thread uses its own batch size, so a shared interpreter would be resized under the others
+    batches = [faces[:size] for size in (1, 3, 5, 8, 13, 16)]
+    expected = [model.predict_on_batch(batch) for batch in batches]
+
+    def _score(i):
+        return [model.predict_on_batch(batches[i]) for _ in range(20)]
+
+    with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+        results = list(executor.map(_score, range(len(batches))))
+    for i, outputs in enumerate(results):
+        for output in outputs:
+            np.testing.assert_allclose(output, expected[i], atol=MAX_ABS_DIFF)
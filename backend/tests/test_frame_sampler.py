@@ -0,0 +1,58 @@
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from app.services import frame_sampler
+from app.services.frame_sampler import sample_frames, SampleClock
+
+class FakeCapture:
+    """A 30 fps clip that, like MediaRecorder WebM, reports no frame count."""
+
+    def __init__(self, seconds, fps=30.0, frame_count=0):
+        self.total = int(seconds * fps)
+        self.fps = fps
+        self.frame_count = frame_count
+        self.index = -1
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.frame_count
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return max(self.index, 0) * 1000.0 / self.fps
+        return 0
+
+    def grab(self):
+        if self.index + 1 >= self.total:
+            return False
+        self.index += 1
+        return True
+
+    def retrieve(self):
+        return True, self.index
+
+def test_clip_without_frame_count_is_sampled_to_the_end(monkeypatch):
+    monkeypatch.setattr(frame_sampler, "probe_duration", lambda path: None)
+    samples = list(sample_frames(FakeCapture(seconds=180), samples_per_second=1.0, max_frames=60,
+                                 mode="grab", video_path="clip.webm"))
+    timestamps = [timestamp for _, timestamp, _ in samples]
+
+    assert timestamps[-1] > 170
+    # Thinned, not capped: 60 at 1 s, 30 at 2 s, then 4 s steps to the end
+    assert 60 < len(samples) < 120
+
+def test_probed_duration_spreads_the_budget(monkeypatch):
+    monkeypatch.setattr(frame_sampler, "probe_duration", lambda path: 180.0)
+    samples = list(sample_frames(FakeCapture(seconds=180), samples_per_second=1.0, max_frames=60,
+                                 mode="grab", video_path="clip.webm"))
+
+    assert len(samples) == 60
+    assert samples[-1][1] > 170
+
+def test_known_duration_stops_at_the_budget():
+    clock = SampleClock(interval=1.0, max_frames=3)
+    for timestamp in range(3):
+        assert clock.due(timestamp)
+        clock.taken(timestamp)
+    assert clock.done()
@@ -0,0 +1,24 @@
+import os
+import pytest
+
+pytest.importorskip("tiktoken")
+pytest.importorskip("openai")
+pytest.importorskip("pydantic")
+
+from app.utils.num_tokens import get_encoding, num_tokens_from_string
+
+try:
+    get_encoding()
+except Exception as e:
+    # tiktoken downloads the encoding on first use
+    pytest.skip(f"o200k_base encoding unavailable: {e}", allow_module_level=True)
+
+# The OpenAI clients are built at import; no request is made here
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.services.openai_client import _REPLY_SYSTEM_PROMPTS
+from benchmarks.prompt_prefix import MIN_CACHED_PROMPT_TOKENS
+
+@pytest.mark.parametrize("mode", ["active", "active_with_score"])
+def test_diagnostic_system_prompt_can_be_cached(mode):
+    assert num_tokens_from_string(_REPLY_SYSTEM_PROMPTS[mode]) >= MIN_CACHED_PROMPT_TOKENS
@@ -0,0 +1,46 @@
+import os
+import json
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("pydantic")
+# The OpenAI clients are built at import; no request is made here
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.services import openai_client
+from app.services.openai_client import stream_rolling_info_and_get_reply
+
+def _output(is_emergency):
+    return {
+        "is_emergency": is_emergency,
+        "trigger_word": "end it all" if is_emergency else "",
+        "bot_reply": "Thank you for telling me. How have you been sleeping?",
+        "updated_summary": "User feels low.",
+        "needs_followup": False,
+        "updated_user_answers": [],
+        "contradictions": {"contradictory": False, "contradicting_question_ids": [], "reason": ""}
+    }
+
+def _fake_stream(output, piece_size=7):
+    raw = json.dumps(output)
+    for i in range(0, len(raw), piece_size):
+        yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=raw[i:i + piece_size]))])
+
+def _events(monkeypatch, output):
+    create = lambda **kwargs: _fake_stream(output)
+    monkeypatch.setattr(openai_client, "client",
+                        SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    return list(stream_rolling_info_and_get_reply(
+        {"transcript": "I want to end it all"}, {}, "", [], "0-3", "PHQ-9_Q9", "question", "next question"))
+
+def test_reply_is_streamed_once_the_turn_is_not_an_emergency(monkeypatch):
+    events = _events(monkeypatch, _output(is_emergency=False))
+    streamed = "".join(value for kind, value in events if kind == "bot_reply")
+    assert streamed == "Thank you for telling me. How have you been sleeping?"
+    assert events[-1][0] == "result"
+
+def test_emergency_reply_is_never_streamed(monkeypatch):
+    events = _events(monkeypatch, _output(is_emergency=True))
+    assert [kind for kind, _ in events] == ["result"]
+    assert events[-1][1]["is_emergency"] is True
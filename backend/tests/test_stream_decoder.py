@@ -0,0 +1,33 @@
+import io
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from app.services import stream_decoder
+from app.services.stream_decoder import stream_frames
+
+class FakeFfmpeg:
+    """Stands in for the ffmpeg process: emits one tiny PPM frame per sampled second."""
+
+    def __init__(self, frames):
+        self.stdin = io.BytesIO()
+        self.stdout = io.BytesIO(b"".join(b"P6\n2 2\n255\n" + bytes(12) for _ in range(frames)))
+        self.killed = False
+
+    def poll(self):
+        return None
+
+    def kill(self):
+        self.killed = True
+
+    def wait(self):
+        return 0
+
+def test_long_stream_is_thinned_not_cut_off(monkeypatch):
+    monkeypatch.setattr(stream_decoder.subprocess, "Popen", lambda *args, **kwargs: FakeFfmpeg(frames=180))
+    samples = list(stream_frames(iter([b"chunk"]), samples_per_second=1.0, max_frames=60))
+    timestamps = [timestamp for _, timestamp, _ in samples]
+
+    assert timestamps[-1] > 170
+    assert 60 < len(samples) < 120
@@ -0,0 +1,69 @@
+import threading
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("assemblyai")
+
+from app.services import transcription_jobs
+from app.services.media_fetch import FetchedMedia
+from app.services.transcription_jobs import start_transcription, claim_transcription, \
+    handle_transcription_webhook, wait_for_transcription
+
+AUDIO_RESULT = {"transcript": "I slept badly this week", "emotions": []}
+CLIP = FetchedMedia(path="/tmp/media/clip.webm", sha256="abc", size=1000, is_temporary=True)
+
+@pytest.fixture
+def webhook_mode(monkeypatch):
+    monkeypatch.setattr(transcription_jobs, "TRANSCRIPTION_WEBHOOK_URL", "https://api.example.com/transcription/webhook")
+    monkeypatch.setattr(transcription_jobs, "TRANSCRIPTION_WEBHOOK_SECRET", "")
+    monkeypatch.setattr(transcription_jobs, "TRANSCRIPTION_WEBHOOK_GRACE", 5.0)
+    monkeypatch.setattr(transcription_jobs, "_jobs_by_url", {})
+    monkeypatch.setattr(transcription_jobs, "_jobs_by_id", {})
+    monkeypatch.setattr(transcription_jobs, "download_media", lambda video_url: CLIP)
+    monkeypatch.setattr(transcription_jobs, "extract_audio", lambda path: None)
+    monkeypatch.setattr(transcription_jobs, "upload_file", lambda path: "https://cdn.assemblyai.com/upload/" + path)
+    monkeypatch.setattr(transcription_jobs, "submit_transcript", lambda *args: "tr-1")
+    monkeypatch.setattr(transcription_jobs, "get_transcript", lambda transcript_id: transcript_id)
+    monkeypatch.setattr(transcription_jobs, "audio_result_from_transcript", lambda transcript: dict(AUDIO_RESULT))
+
+    def _no_polling(transcript_id):
+        raise AssertionError("the webhook should have resolved the job")
+    monkeypatch.setattr(transcription_jobs, "poll_transcript", _no_polling)
+
+def test_webhook_after_claim_resolves_the_job(webhook_mode):
+    start_transcription("https://cdn.example.com/turn.webm")
+    job = claim_transcription("https://cdn.example.com/turn.webm")
+    assert job is not None
+    assert claim_transcription("https://cdn.example.com/turn.webm") is None
+
+    # The turn is already waiting when AssemblyAI calls back
+    threading.Timer(0.1, handle_transcription_webhook, args=({"transcript_id": "tr-1", "status": "completed"},)).start()
+    assert wait_for_transcription(job) == AUDIO_RESULT
+    assert "tr-1" not in transcription_jobs._jobs_by_id
+
+def test_webhook_for_unknown_job_is_not_handled(webhook_mode):
+    assert handle_transcription_webhook({"transcript_id": "tr-unknown", "status": "completed"}) is False
+
+def test_wrong_webhook_secret_is_rejected(webhook_mode, monkeypatch):
+    monkeypatch.setattr(transcription_jobs, "TRANSCRIPTION_WEBHOOK_SECRET", "s3cret")
+    with pytest.raises(PermissionError):
+        handle_transcription_webhook({"transcript_id": "tr-1", "status": "completed"}, "wrong")
+    with pytest.raises(PermissionError):
+        handle_transcription_webhook({"transcript_id": "tr-1", "status": "completed"}, None)
+
+def test_downloaded_clip_is_uploaded_and_handed_to_the_turn(webhook_mode, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(transcription_jobs, "submit_transcript", lambda audio_url, *args: submitted.append(audio_url) or "tr-1")
+    start_transcription("https://cdn.example.com/turn.webm")
+    # AssemblyAI transcribes the upload instead of fetching the clip from storage again
+    assert submitted == ["https://cdn.assemblyai.com/upload/" + CLIP.path]
+    assert claim_transcription("https://cdn.example.com/turn.webm").media == CLIP
+
+def test_unclaimed_job_releases_its_clip_when_it_expires(webhook_mode, monkeypatch):
+    released = []
+    monkeypatch.setattr(transcription_jobs, "release_media", released.append)
+    monkeypatch.setattr(transcription_jobs, "TRANSCRIPTION_JOB_TTL", 0)
+    start_transcription("https://cdn.example.com/turn.webm")
+    start_transcription("https://cdn.example.com/other.webm")
+    assert released == [CLIP]
+    assert claim_transcription("https://cdn.example.com/turn.webm") is None
@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("tiktoken")
+
+from app.utils.turn_handler import parse_turn_request, needs_scoring, build_turn_response
+
+def _turn():
+    return parse_turn_request({
+        "session_status": "active",
+        "question_tracker": {"current_qs_id": "PHQ-9_Q3", "next_qs_id": "PHQ-9_Q4"},
+        "unanswered_question_ids": ["PHQ-9_Q3", "PHQ-9_Q4", "PHQ-9_Q5"],
+        "diagnostic_scores": {"PHQ-9_Q1": 2}
+    })
+
+def _model_output(contradictions):
+    return {
+        "is_emergency": False,
+        "trigger_word": "",
+        "bot_reply": "Earlier you said you enjoy your hobbies, now you say nothing interests you. Which feels more accurate lately?",
+        "updated_summary": "User now reports losing interest in hobbies.",
+        "needs_followup": False,
+        "updated_user_answers": [],
+        "contradictions": contradictions
+    }
+
+@pytest.mark.parametrize("contradictions", [
+    {"contradictory": True, "contradicting_question_ids": ["PHQ-9_Q1"], "reason": "Interest in hobbies changed."},
+    # Ids without the flag still count
+    {"contradictory": False, "contradicting_question_ids": ["PHQ-9_Q1"], "reason": "Interest in hobbies changed."},
+])
+def test_contradiction_keeps_the_question_and_reopens_the_contradicted_one(contradictions):
+    model_output = _model_output(contradictions)
+    assert not needs_scoring(model_output)
+
+    payload = build_turn_response(
+        _turn(), {"transcript": "Nothing interests me anymore"}, {}, model_output,
+        {"is_question_answered": True, "score": 2})
+    assert payload["question_tracker"]["current_qs_id"] == "PHQ-9_Q3"
+    assert "PHQ-9_Q3" not in payload["diagnostic_scores"]
+    assert "PHQ-9_Q1" in payload["unanswered_question_ids"]
+    assert payload["diagnostic_scores"]["PHQ-9_Q1"] == -2
+
+def test_no_contradiction_needs_scoring():
+    model_output = _model_output({"contradictory": False, "contradicting_question_ids": [], "reason": ""})
+    assert needs_scoring(model_output)
+
+def test_video_metadata_survives_a_clip_without_faces():
+    payload = build_turn_response(
+        _turn(), {"transcript": "I don't know"}, {}, _model_output({}),
+        {"is_question_answered": False}, {"faces_analyzed": 0, "frames_used": 5, "stop_reason": "no_face"})
+    assert payload["metadata"]["video_frames_used"] == 5
+    assert payload["metadata"]["video_stop_reason"] == "no_face"
@@ -0,0 +1,109 @@
+import time
+import pytest
+from concurrent.futures import Future
+
+pytest.importorskip("cv2")
+pytest.importorskip("deepface")
+pytest.importorskip("httpx")
+pytest.importorskip("assemblyai")
+
+from app.services import turn_ingest, media_analysis
+from app.services.turn_ingest import add_ingest_chunk, claim_ingest_session, IngestLimitExceeded
+
+RealIngestSession = turn_ingest.IngestSession
+
+class FakeSession:
+    def __init__(self, ingest_id, updated_at):
+        self.ingest_id = ingest_id
+        self.updated_at = updated_at
+        self.chunks = []
+        self.discarded = False
+
+    def add_chunk(self, seq, data, elapsed, final=False):
+        self.chunks.append(seq)
+
+    def discard(self):
+        self.discarded = True
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    monkeypatch.setattr(turn_ingest, "_sessions", {})
+    monkeypatch.setattr(turn_ingest, "_claimed_ids", {})
+    monkeypatch.setattr(turn_ingest, "IngestSession", lambda ingest_id: FakeSession(ingest_id, time.monotonic()))
+
+def test_chunk_after_claim_is_rejected():
+    claim_ingest_session("turn-0001")
+    with pytest.raises(ValueError):
+        add_ingest_chunk("turn-0001", 7, b"late", 12.0, final=True)
+    assert "turn-0001" not in turn_ingest._sessions
+
+def test_every_chunk_sweeps_abandoned_sessions(monkeypatch):
+    monkeypatch.setattr(turn_ingest, "INGEST_SESSION_TTL", 60)
+    abandoned = FakeSession("turn-0002", time.monotonic() - 120)
+    turn_ingest._sessions["turn-0002"] = abandoned
+    turn_ingest._sessions["turn-0003"] = FakeSession("turn-0003", time.monotonic())
+
+    add_ingest_chunk("turn-0003", 1, b"chunk", 2.0)
+    assert "turn-0002" not in turn_ingest._sessions
+    assert "turn-0003" in turn_ingest._sessions
+
+def test_too_many_open_sessions_are_refused(monkeypatch):
+    monkeypatch.setattr(turn_ingest, "INGEST_MAX_SESSIONS", 1)
+    add_ingest_chunk("turn-0004", 0, b"chunk", 1.0)
+    with pytest.raises(IngestLimitExceeded) as error:
+        add_ingest_chunk("turn-0005", 0, b"chunk", 1.0)
+    assert error.value.status_code == 429
+    # Chunks of an open session are still accepted
+    add_ingest_chunk("turn-0004", 1, b"chunk", 2.0)
+
+def test_oversized_chunk_is_refused(monkeypatch):
+    monkeypatch.setattr(turn_ingest, "INGEST_MAX_CHUNK_BYTES", 4)
+    with pytest.raises(IngestLimitExceeded) as error:
+        add_ingest_chunk("turn-0006", 0, b"chunk", 1.0)
+    assert error.value.status_code == 413
+    assert "turn-0006" not in turn_ingest._sessions
+
+def _drain(chunks, include_timeline):
+    for _ in chunks:
+        pass
+    return {"neutral": 1.0}, None
+
+@pytest.fixture
+def real_session(monkeypatch):
+    monkeypatch.setattr(turn_ingest, "analyze_video_stream", _drain)
+    monkeypatch.setattr(turn_ingest, "INGEST_SEGMENT_SECONDS", 0)
+    session = RealIngestSession("turn-0007")
+    yield session
+    session.discard()
+
+def test_chunk_far_ahead_is_refused(real_session, monkeypatch):
+    monkeypatch.setattr(turn_ingest, "INGEST_MAX_SEQ_AHEAD", 4)
+    real_session.add_chunk(4, b"ahead", 5.0)
+    with pytest.raises(ValueError):
+        real_session.add_chunk(5, b"too far", 6.0)
+    assert list(real_session.pending) == [4]
+
+def test_session_over_its_byte_budget_is_refused(real_session, monkeypatch):
+    monkeypatch.setattr(turn_ingest, "INGEST_MAX_SESSION_BYTES", 10)
+    real_session.add_chunk(0, b"12345", 1.0)
+    # Buffered out-of-order chunks count too, and a retry doesn't count twice
+    real_session.add_chunk(2, b"123", 3.0)
+    real_session.add_chunk(2, b"123", 3.0)
+    with pytest.raises(IngestLimitExceeded) as error:
+        real_session.add_chunk(1, b"123", 2.0)
+    assert error.value.status_code == 413
+    assert real_session.received_bytes == 8
+
+def test_failed_segment_falls_back_to_the_whole_recording(monkeypatch):
+    failed, done = Future(), Future()
+    failed.set_exception(RuntimeError("AssemblyAI is down"))
+    done.set_result({"transcript": "first segment"})
+
+    class IngestedTurn:
+        path = "/tmp/turn.webm"
+        segment_futures = [done, failed]
+
+    transcribed = []
+    monkeypatch.setattr(media_analysis, "_transcribe", lambda job, path: transcribed.append(path) or {"transcript": "whole"})
+    assert media_analysis._transcribe_ingested(IngestedTurn()) == {"transcript": "whole"}
+    assert transcribed == ["/tmp/turn.webm"]
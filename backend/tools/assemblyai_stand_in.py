@@ -0,0 +1,87 @@
+"""
+Local stand-in for the parts of the AssemblyAI REST API the backend uses
+(/v2/upload, /v2/transcript, /v2/transcript/<id>), including webhook callbacks.
+Lets the transcription job flow be exercised without an API key or network.
+
+Usage (from backend/):
+    python -m tools.assemblyai_stand_in [--port 8010] [--delay 3]
+
+then start the API with
+    ASSEMBLYAI_BASE_URL=http://localhost:8010
+    TRANSCRIPTION_WEBHOOK_URL=http://localhost:8000/transcription/webhook   (optional)
+
+Every job completes after --delay seconds with a canned transcript.
+"""
+import sys
+import time
+import uuid
+import argparse
+import threading
+
+import requests
+from flask import Flask, request, jsonify
+
+CANNED_TEXT = "I have been feeling a bit tired lately but mostly okay."
+
+app = Flask(__name__)
+_transcripts = {}
+_delay = [3.0]
+
+def _complete(transcript_id):
+    transcript = _transcripts[transcript_id]
+    transcript.update({
+        "status": "completed",
+        "text": CANNED_TEXT,
+        "sentiment_analysis_results": [
+            {"text": CANNED_TEXT, "sentiment": "NEUTRAL", "confidence": 0.81}
+        ]
+    })
+    webhook_url = transcript.get("webhook_url")
+    if not webhook_url:
+        return
+    headers = {}
+    if transcript.get("webhook_auth_header_name"):
+        headers[transcript["webhook_auth_header_name"]] = transcript.get("webhook_auth_header_value") or ""
+    try:
+        requests.post(webhook_url, json={"transcript_id": transcript_id, "status": "completed"}, headers=headers, timeout=10)
+    except requests.RequestException as e:
+        print(f"[WARNING] Webhook to {webhook_url} failed: {e}")
+
+@app.route("/v2/upload", methods=["POST"])
+def upload():
+    return jsonify({"upload_url": f"stand-in://uploads/{uuid.uuid4()} ({len(request.get_data())} bytes)"})
+
+@app.route("/v2/transcript", methods=["POST"])
+def submit():
+    body = request.get_json() or {}
+    transcript_id = str(uuid.uuid4())
+    _transcripts[transcript_id] = {
+        "id": transcript_id,
+        "status": "queued",
+        "audio_url": body.get("audio_url"),
+        "webhook_url": body.get("webhook_url"),
+        "webhook_auth_header_name": body.get("webhook_auth_header_name"),
+        "webhook_auth_header_value": body.get("webhook_auth_header_value"),
+        "submitted_at": time.time()
+    }
+    threading.Timer(_delay[0], _complete, args=(transcript_id,)).start()
+    return jsonify(_transcripts[transcript_id])
+
+@app.route("/v2/transcript/<transcript_id>")
+def get(transcript_id):
+    transcript = _transcripts.get(transcript_id)
+    if transcript is None:
+        return jsonify({"error": "Transcript not found"}), 404
+    return jsonify({k: v for k, v in transcript.items() if not k.startswith("webhook_auth")})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--delay", type=float, default=3.0, help="seconds until each job completes")
+    args = parser.parse_args(argv)
+    _delay[0] = args.delay
+    app.run(port=args.port, threaded=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
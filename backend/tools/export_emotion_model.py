@@ -0,0 +1,68 @@
+"""
+Exports DeepFace's Emotion model for the CPU runtimes in app/services/emotion_runtime.py.
+
+Usage (from backend/, with TensorFlow and requirements-emotion-runtimes.txt installed):
+    python -m tools.export_emotion_model onnx models/emotion.onnx [--quantize]
+    python -m tools.export_emotion_model tflite models/emotion.tflite [--quantize]
+
+--quantize stores the weights as int8 (dynamic-range quantization); inputs and
+outputs stay float32, so the runtime code path is the same either way.
+Check the result with python -m benchmarks.emotion_runtime_parity before deploying it.
+"""
+import os
+import sys
+import argparse
+
+from app.services.emotion_model import get_emotion_model
+
+def export_onnx(model, output_path, quantize=False):
+    import tensorflow as tf
+    import tf2onnx
+
+    float_path = output_path + ".fp32.onnx" if quantize else output_path
+    spec = (tf.TensorSpec((None, 48, 48, 1), tf.float32, name="face"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=float_path)
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(float_path, output_path, weight_type=QuantType.QInt8)
+        os.remove(float_path)
+
+def export_tflite(model, output_path, quantize=False, calibration_faces=None):
+    """
+    calibration_faces, (N, 48, 48, 1) preprocessed face crops, makes the model fully
+    int8: weights, activations, inputs and outputs. TFLiteEmotionModel converts at the edges.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize or calibration_faces is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if calibration_faces is not None:
+        converter.representative_dataset = lambda: ([face[None].astype("float32")] for face in calibration_faces)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("runtime", choices=["onnx", "tflite"])
+    parser.add_argument("output_path")
+    parser.add_argument("--quantize", action="store_true", help="store weights as int8")
+    args = parser.parse_args(argv)
+
+    output_dir = os.path.dirname(args.output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    model = get_emotion_model().model
+    if args.runtime == "onnx":
+        export_onnx(model, args.output_path, args.quantize)
+    else:
+        export_tflite(model, args.output_path, args.quantize)
+    print(f"[DEBUG] Exported Emotion model to {args.output_path} ({os.path.getsize(args.output_path) / 1e6:.2f} MB)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
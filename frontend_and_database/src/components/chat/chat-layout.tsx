@@ -8,7 +8,7 @@ import { cn } from '@/lib/utils';
 import { useToast } from '@/hooks/use-toast';
 import { useUser, useFirestore, useMemoFirebase, useDoc, useCollection } from '@/firebase';
 import { collection, query, orderBy, doc } from 'firebase/firestore';
-import { uploadFileToFirebase, sendFileUrlToPythonAPI, sendStatusUpdates } from '@/lib/client-actions';
+import { uploadFileToFirebase, startTranscription, sendFileUrlToPythonAPI, sendStatusUpdates } from '@/lib/client-actions';
 import { postChatMessage, enablePCL5Assessment, updateQuestionScores } from '@/lib/actions';
 import { useVideoRecording } from '@/hooks/useVideoRecording';
 import { RecordingOverlay } from './RecordingOverlay';
@@ -76,8 +76,10 @@ export function ChatLayout({ sessionId, sessionName }: { sessionId: string; sess
     }
   }, [initialMessages]);
 
-  const handleRecordingStop = async (blob: Blob) => {
+  const handleRecordingStop = async (blob: Blob, ingestId: string | null) => {
     if (!blob) return;
+    // Local placeholder that shows the reply while it streams in; the stored message replaces it
+    const draftReplyId = `streaming-${Date.now()}`;
 
     if (sessionStatus === 'active' && (!sessionData?.question_tracker || !sessionData?.unanswered_question_ids)) {
       toast({
@@ -103,6 +105,12 @@ export function ChatLayout({ sessionId, sessionName }: { sessionId: string; sess
         throw new Error(uploadResult.message || 'File upload failed.');
       }
 
+      // Queue transcription now unless the chunks already went to the backend during recording;
+      // the turn request below picks up the running job
+      if (!ingestId) {
+        await startTranscription(uploadResult.url);
+      }
+
       const assistantMessages = messages.filter(m => m.role === 'assistant');
       const lastBotReply = assistantMessages.length > 0 
         ? assistantMessages[assistantMessages.length - 1].text 
@@ -132,7 +140,17 @@ export function ChatLayout({ sessionId, sessionName }: { sessionId: string; sess
         sessionStatus,
         tracker,
         unanswered,
-        crisis_detected_persistent
+        crisis_detected_persistent,
+        ingestId,
+        (text) => {
+          setMessages(prev => {
+            if (!prev.some(m => m.id === draftReplyId)) {
+              const draft: ChatMessage = { id: draftReplyId, role: 'assistant', text, timestamp: new Date() };
+              return [...prev, draft];
+            }
+            return prev.map(m => (m.id === draftReplyId ? { ...m, text: (m.text ?? '') + text } : m));
+          });
+        }
       );
 
       console.log("📥 [RECEIVED FROM BACKEND]", {
@@ -192,6 +210,7 @@ export function ChatLayout({ sessionId, sessionName }: { sessionId: string; sess
         });
       }
     } finally {
+      setMessages(prev => prev.filter(m => m.id !== draftReplyId));
       setIsSending(false);
       resetRecording();
     }
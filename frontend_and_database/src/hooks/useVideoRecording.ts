@@ -1,7 +1,11 @@
 import { useState, useRef, useCallback, useEffect } from 'react';
 import { useToast } from './use-toast';
+import { sendIngestChunk } from '@/lib/client-actions';
 
-export function useVideoRecording(onRecordingStop: (blob: Blob) => Promise<void>) {
+// Length of each recorded chunk streamed to the backend while the user is talking
+const INGEST_TIMESLICE_MS = 1000;
+
+export function useVideoRecording(onRecordingStop: (blob: Blob, ingestId: string | null) => Promise<void>) {
   const [isRecording, setIsRecording] = useState(false);
   const [recordingTime, setRecordingTime] = useState(0);
   const [isSending, setIsSending] = useState(false);
@@ -12,6 +16,11 @@ export function useVideoRecording(onRecordingStop: (blob: Blob) => Promise<void>
   const streamRef = useRef<MediaStream | null>(null);
   const timerRef = useRef<NodeJS.Timeout | null>(null);
   const videoPreviewRef = useRef<HTMLVideoElement>(null);
+  // Chunked ingestion state: chunks are sent one after another so they arrive in order
+  const ingestSeqRef = useRef(0);
+  const ingestChainRef = useRef<Promise<void>>(Promise.resolve());
+  const ingestOkRef = useRef(true);
+  const recordingStartedAtRef = useRef(0);
 
   useEffect(() => {
     return () => {
@@ -51,18 +60,40 @@ export function useVideoRecording(onRecordingStop: (blob: Blob) => Promise<void>
       });
       
       chunksRef.current = [];
+      const ingestId = crypto.randomUUID();
+      ingestSeqRef.current = 0;
+      ingestChainRef.current = Promise.resolve();
+      ingestOkRef.current = true;
+      recordingStartedAtRef.current = performance.now();
+
+      // Queues a chunk behind the previous ones; after one failure the rest are skipped
+      // and the turn is analyzed from the uploaded clip instead
+      const queueIngest = (chunk: Blob | null, final: boolean) => {
+        const seq = ingestSeqRef.current++;
+        const elapsedSeconds = (performance.now() - recordingStartedAtRef.current) / 1000;
+        ingestChainRef.current = ingestChainRef.current.then(async () => {
+          if (!ingestOkRef.current) return;
+          ingestOkRef.current = await sendIngestChunk(ingestId, seq, chunk, elapsedSeconds, final);
+        });
+      };
+
       mediaRecorder.ondataavailable = (e) => {
-        if (e.data.size > 0) chunksRef.current.push(e.data);
+        if (e.data.size > 0) {
+          chunksRef.current.push(e.data);
+          queueIngest(e.data, false);
+        }
       };
       
       mediaRecorder.onstop = async () => {
+        queueIngest(null, true);
+        await ingestChainRef.current;
         if (chunksRef.current.length > 0) {
           const blob = new Blob(chunksRef.current, { type: 'video/webm' });
-          await onRecordingStop(blob);
+          await onRecordingStop(blob, ingestOkRef.current ? ingestId : null);
         }
       };
       
-      mediaRecorder.start();
+      mediaRecorder.start(INGEST_TIMESLICE_MS);
       mediaRecorderRef.current = mediaRecorder;
       setRecordingTime(0);
       
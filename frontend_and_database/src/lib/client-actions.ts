@@ -76,6 +76,105 @@ export async function uploadFileToFirebase(file: File, userId: string) {
   }
 }
 
+/**
+ * Asks the backend to start transcribing an uploaded clip right away.
+ * /analyze_turn then only awaits the running job instead of queueing it.
+ * Failures are logged and ignored: /analyze_turn transcribes the clip itself.
+ *
+ * @param video_url The download URL returned by uploadFileToFirebase
+ */
+export async function startTranscription(video_url: string) {
+  try {
+    const response = await fetch("http://localhost:8000/transcription/start", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ video_url }),
+    });
+    if (!response.ok) {
+      console.warn("Transcription could not be started early:", await response.text());
+    }
+  } catch (error) {
+    console.warn("Transcription could not be started early:", error);
+  }
+}
+
+/**
+ * Streams one MediaRecorder chunk to the backend while the user is still recording,
+ * so audio and video analysis can start before the clip is complete.
+ *
+ * @param ingest_id Id shared by every chunk of one recording (sent again with /analyze_turn)
+ * @param seq 0-based chunk number
+ * @param chunk The recorded chunk, or null for the final marker
+ * @param elapsed_seconds Seconds recorded up to the end of this chunk
+ * @param final True on the last request of the recording
+ * @returns Whether the backend accepted the chunk
+ */
+export async function sendIngestChunk(
+  ingest_id: string,
+  seq: number,
+  chunk: Blob | null,
+  elapsed_seconds: number,
+  final: boolean
+) {
+  try {
+    const params = new URLSearchParams({
+      seq: String(seq),
+      t: elapsed_seconds.toFixed(3),
+      final: final ? "1" : "0",
+    });
+    const response = await fetch(`http://localhost:8000/ingest/${ingest_id}?${params}`, {
+      method: "POST",
+      headers: { "Content-Type": "application/octet-stream" },
+      body: chunk ?? new Blob([]),
+    });
+    return response.ok;
+  } catch (error) {
+    console.warn("Chunk upload failed, the turn will be analyzed from the full clip:", error);
+    return false;
+  }
+}
+
+/**
+ * Reads the Server-Sent Events of /analyze_turn/stream: passes every "bot_reply"
+ * piece to onReplyDelta and resolves with the final "turn_complete" payload.
+ */
+async function readTurnStream(response: Response, onReplyDelta: (text: string) => void) {
+  const reader = response.body!.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let payload: any = null;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of rawEvent.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      if (!data) continue;
+
+      if (event === "bot_reply") {
+        onReplyDelta(JSON.parse(data).text);
+      } else if (event === "turn_complete") {
+        payload = JSON.parse(data);
+      }
+    }
+  }
+
+  if (!payload) throw new Error("Backend error: stream ended before the turn completed");
+  return payload;
+}
+
 export async function sendFileUrlToPythonAPI(
   session_id: string, 
   user_id: string, 
@@ -87,7 +186,9 @@ export async function sendFileUrlToPythonAPI(
   session_status: string,
   question_tracker: any,
   unanswered_question_ids: string[],
-  crisis_detected: boolean
+  crisis_detected: boolean,
+  ingest_id: string | null = null,
+  onReplyDelta?: (text: string) => void
 ) {
   try {
     if (!question_tracker || !unanswered_question_ids) {
@@ -98,6 +199,7 @@ export async function sendFileUrlToPythonAPI(
     console.log("Unanswered qs being sent:", unanswered_question_ids);
 
     const payload = {
+      session_id, // Per-session token usage on the backend
       video_url, // Backend expects "video_url"
       user_answers,
       rolling_summary,
@@ -106,12 +208,15 @@ export async function sendFileUrlToPythonAPI(
       session_status,
       question_tracker,
       unanswered_question_ids,
-      crisis_detected
+      crisis_detected,
+      ingest_id
     };
 
     console.log("DEBUG: Sending Payload to Python:", payload);
 
-    const response = await fetch("http://localhost:8000/analyze_turn", {
+    // With onReplyDelta the reply is streamed as it is generated (Server-Sent Events)
+    const endpoint = onReplyDelta ? "analyze_turn/stream" : "analyze_turn";
+    const response = await fetch(`http://localhost:8000/${endpoint}`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify(payload),
@@ -129,7 +234,7 @@ export async function sendFileUrlToPythonAPI(
     
     if (!response.ok) throw new Error(`Backend error: ${await response.text()}`);
       
-    const data = await response.json();
+    const data = onReplyDelta ? await readTurnStream(response, onReplyDelta) : await response.json();
     console.log('✅ Backend response:', data);
     const sessionRef = doc(db, `users/${user_id}/sessions/${session_id}`);
     